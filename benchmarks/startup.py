@@ -0,0 +1,126 @@
+"""Startup-time benchmark for the Streamlit app.
+
+Each measurement runs in a fresh interpreter so module imports are cold:
+
+* ``import:<module>`` - importing one app module on its own;
+* ``first_session`` - the first script run of main.py (a container cold start);
+* ``new_session`` - a further session in the same process (new-session latency).
+
+None of these may load the modules in ``DEFERRED_MODULES``: pycoustic (with its
+parsers and weather client) and pgeocode are imported only once a log is
+parsed. The run fails if any of them is found in ``sys.modules``. pyarrow is
+not in the list because Streamlit itself imports it.
+
+    python benchmarks/startup.py --repeat 5 --output startup.json
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "streamlitproject2")
+MODULES = ["st_config", "page_1", "page_2", "page_3", "page_4"]
+DEFERRED_MODULES = [
+    "pycoustic",
+    "pycoustic.weather",
+    "pycoustic.parsers.nor140_overview_xlsx",
+    "pycoustic.parsers.nor145_multi_th",
+    "pgeocode",
+]
+
+_IMPORT_PROBE = """
+import json, sys, time
+sys.path.insert(0, {app_dir!r})
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "deferred": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+_SESSION_PROBE = """
+import json, sys, time
+sys.path.insert(0, {app_dir!r})
+from streamlit.testing.v1 import AppTest
+timings = {{}}
+for label in ("first_session", "new_session"):
+    started = time.perf_counter()
+    at = AppTest.from_file({main!r}, default_timeout=120)
+    at.run()
+    timings[label] = time.perf_counter() - started
+    if at.exception:
+        raise SystemExit(f"main.py raised: {{at.exception[0].value}}")
+timings["modules"] = sorted(m for m in sys.modules if m.startswith("page_"))
+timings["deferred"] = [m for m in {deferred!r} if m in sys.modules]
+print(json.dumps(timings))
+"""
+
+
+def _probe(code: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _summary(name: str, runs: list[float]) -> dict:
+    return {
+        "name": name,
+        "runs_s": [round(value, 4) for value in runs],
+        "median_s": round(statistics.median(runs), 4),
+        "min_s": round(min(runs), 4),
+    }
+
+
+def _check_deferred(name: str, probe: dict) -> dict:
+    if probe["deferred"]:
+        raise SystemExit(f"{name} loaded modules that should be imported lazily: {', '.join(probe['deferred'])}")
+    return probe
+
+
+def run(repeat: int) -> dict:
+    results = []
+    for module in MODULES:
+        code = _IMPORT_PROBE.format(app_dir=APP_DIR, module=module, deferred=DEFERRED_MODULES)
+        runs = [_check_deferred(f"import {module}", _probe(code))["seconds"] for _ in range(repeat)]
+        results.append(_summary(f"import:{module}", runs))
+
+    code = _SESSION_PROBE.format(app_dir=APP_DIR, main=os.path.join(APP_DIR, "main.py"), deferred=DEFERRED_MODULES)
+    sessions = [_check_deferred("main.py", _probe(code)) for _ in range(repeat)]
+    results.append(_summary("first_session", [item["first_session"] for item in sessions]))
+    results.append(_summary("new_session", [item["new_session"] for item in sessions]))
+
+    return {
+        "suite": "startup",
+        "created": dt.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "pages_loaded_at_start": sessions[-1]["modules"],
+        "results": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure cold-start and new-session latency of the app.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement (default 5).")
+    parser.add_argument("--output", default="startup-benchmark.json", help="JSON file to write results to.")
+    args = parser.parse_args(argv)
+
+    report = run(args.repeat)
+    with open(args.output, "w", encoding="utf-8") as out:
+        json.dump(report, out, indent=2)
+    for result in report["results"]:
+        print(f"{result['name']:<20} median {result['median_s']:.3f} s  min {result['min_s']:.3f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
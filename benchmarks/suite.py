@@ -0,0 +1,206 @@
+"""End-to-end survey benchmark on synthetic logs.
+
+Generates a survey with benchmarks/synthetic.py, then times each stage the app
+runs on it, in process and in order:
+
+* ``import`` - parsing every log file (``parse_log_file``);
+* ``survey:<table>`` - each Data Loader summary table, called as the page calls it;
+* ``peak_picker`` - the k highest Lmax A peaks of the first log;
+* ``resample:<t>`` - the Visualisation page's ``as_interval`` resampling of every log;
+* ``combined_csv`` - the combined sectioned CSV export.
+
+A stage that raises is recorded with its error instead of timings:
+
+    python benchmarks/suite.py --logs 4 --duration 7D --rate 60 --repeat 3 --output survey.json
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from importlib import metadata
+
+from startup import APP_DIR, _summary
+from synthetic import add_workload_arguments, write_survey
+
+sys.path.insert(0, APP_DIR)
+
+import pycoustic as pc  # noqa: E402
+
+from leq_index import survey_table  # noqa: E402
+from log_arrays import set_survey_periods  # noqa: E402
+from st_config import (  # noqa: E402
+    _combined_sections,
+    default_times,
+    parse_log_file,
+    summary_table_calls,
+    write_csv_sections,
+)
+
+SETTINGS = {
+    "lmax_n": 10,
+    "lmax_t": 2,
+    "modal_param": ("L90", "A"),
+    "day_t": "60min",
+    "evening_t": "60min",
+    "night_t": "15min",
+    "averaging": "log",
+}
+RESAMPLE_INTERVALS = ("15min", "1h")
+PEAK_K = 10
+
+
+class _Stages:
+    """Collects per-stage run times across repeats, keeping the first error of a failing stage."""
+
+    def __init__(self) -> None:
+        self.runs: dict[str, list[float]] = {}
+        self.errors: dict[str, str] = {}
+
+    def time(self, name: str, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            self.errors.setdefault(name, f"{type(exc).__name__}: {exc}")
+            self.runs.setdefault(name, [])
+            return None
+        self.runs.setdefault(name, []).append(time.perf_counter() - started)
+        return result
+
+    def results(self) -> list[dict]:
+        results = []
+        for name, runs in self.runs.items():
+            if name in self.errors:
+                results.append({"name": name, "error": self.errors[name]})
+            else:
+                results.append(_summary(name, runs))
+        return results
+
+
+def _parse_all(paths: list[str]) -> dict:
+    logs = {}
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for prof_name, log in parse_log_file(path):
+            logs[stem if prof_name is None else f"{stem} - {prof_name}"] = log
+    return logs
+
+
+def _build_survey(logs: dict) -> pc.Survey:
+    survey = pc.Survey()
+    for name, log in logs.items():
+        survey.add_log(data=log, name=name)
+    set_survey_periods(survey, default_times)
+    return survey
+
+
+def _resample_all(logs: dict, t: str) -> None:
+    for log in logs.values():
+        log.as_interval(t=t, averaging=SETTINGS["averaging"], ln_averaging=SETTINGS["averaging"])
+
+
+def _combined_csv(tables: dict) -> int:
+    sections = _combined_sections(
+        tables.get("broadband_df"),
+        tables.get("leq_df"),
+        tables.get("lmax_df"),
+        tables.get("modal_df"),
+        tables.get("counts"),
+        day_start=default_times["day"],
+        evening_start=default_times["evening"],
+        night_start=default_times["night"],
+        lmax_n=SETTINGS["lmax_n"],
+        lmax_t=SETTINGS["lmax_t"],
+        modal_param=SETTINGS["modal_param"],
+        day_t=SETTINGS["day_t"],
+        evening_t=SETTINGS["evening_t"],
+        night_t=SETTINGS["night_t"],
+    )
+    with write_csv_sections(sections) as buffer:
+        return len(buffer.read())
+
+
+def run(paths: list[str], repeat: int) -> tuple[list[dict], dict]:
+    calls = summary_table_calls(
+        lmax_n=SETTINGS["lmax_n"],
+        lmax_t=f"{SETTINGS['lmax_t']}min",
+        modal_param=SETTINGS["modal_param"],
+        day_t=SETTINGS["day_t"],
+        evening_t=SETTINGS["evening_t"],
+        night_t=SETTINGS["night_t"],
+        averaging=SETTINGS["averaging"],
+    )
+    stages = _Stages()
+    sizes: dict = {}
+    for _ in range(repeat):
+        logs = stages.time("import", _parse_all, paths)
+        if not logs:
+            break
+        survey = stages.time("survey:build", _build_survey, logs)
+        if survey is None:
+            break
+
+        tables = {}
+        for key, (method, kwargs) in calls.items():
+            tables[key] = stages.time(f"survey:{method}", survey_table, survey, method, **kwargs)
+
+        first = next(iter(logs))
+        stages.time("peak_picker", survey.peak_picker, log_name=first, pivot_col=("Lmax", "A"), k=PEAK_K)
+        for t in RESAMPLE_INTERVALS:
+            stages.time(f"resample:{t}", _resample_all, logs, t)
+        sizes["combined_csv_bytes"] = stages.time("combined_csv", _combined_csv, tables)
+        sizes["rows_per_log"] = {name: int(len(log.get_data())) for name, log in logs.items()}
+    return stages.results(), sizes
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Time each survey stage of the app on synthetic logs.")
+    add_workload_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage (default 3).")
+    parser.add_argument("--workdir", default=None, help="Directory for the generated logs (default: a temporary directory).")
+    parser.add_argument("--output", default="survey-benchmark.json", help="JSON file to write results to.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="pycoustic-bench-") as scratch:
+        workdir = args.workdir or scratch
+        paths = write_survey(
+            workdir, logs=args.logs, duration=args.duration, rate_s=args.rate, bands=args.bands, seed=args.seed,
+        )
+        input_bytes = sum(os.path.getsize(path) for path in paths)
+        results, sizes = run(paths, args.repeat)
+
+    report = {
+        "suite": "survey",
+        "created": dt.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pycoustic": metadata.version("pycoustic"),
+        "repeat": args.repeat,
+        "workload": {
+            "logs": args.logs,
+            "duration": args.duration,
+            "rate_s": args.rate,
+            "bands": args.bands,
+            "seed": args.seed,
+            "input_bytes": input_bytes,
+            **sizes,
+        },
+        "settings": SETTINGS,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as out:
+        json.dump(report, out, indent=2, default=str)
+    for result in results:
+        if "error" in result:
+            print(f"{result['name']:<28} failed: {result['error']}")
+        else:
+            print(f"{result['name']:<28} median {result['median_s']:.3f} s  min {result['min_s']:.3f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
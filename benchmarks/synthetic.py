@@ -0,0 +1,126 @@
+"""Synthetic survey logs in the app's CSV template layout.
+
+Levels follow a day/night cycle with random noise and short loud events, so
+every survey table and the peak picker have realistic work to do:
+
+    python benchmarks/synthetic.py OUT_DIR --logs 4 --duration 7D --rate 60 --bands 8
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+OCTAVE_BANDS = [63, 125, 250, 500, 1000, 2000, 4000, 8000]
+THIRD_OCTAVE_BANDS = [
+    20, 25, 31.5, 40, 50, 63, 80, 100, 125, 160, 200, 250, 315, 400, 500, 630,
+    800, 1000, 1250, 1600, 2000, 2500, 3150, 4000, 5000, 6300, 8000, 10000, 12500, 16000, 20000,
+]
+FAMILIES = ("Leq", "Lmax", "L90")
+
+
+def band_centres(count: int) -> list[float]:
+    """Octave bands (as in TEMPLATE_COLUMNS) for up to 8 bands, else a run of third-octave bands centred on 1 kHz."""
+    if count <= len(OCTAVE_BANDS):
+        return OCTAVE_BANDS[:count]
+    if count > len(THIRD_OCTAVE_BANDS):
+        raise ValueError(f"at most {len(THIRD_OCTAVE_BANDS)} bands are supported, got {count}")
+    start = min(max(THIRD_OCTAVE_BANDS.index(1000) - count // 2, 0), len(THIRD_OCTAVE_BANDS) - count)
+    return THIRD_OCTAVE_BANDS[start:start + count]
+
+
+def _label(band: float) -> str:
+    return f"{band:g}"
+
+
+def log_columns(bands: int = len(OCTAVE_BANDS)) -> list[str]:
+    """Column headers for a log with ``bands`` bands; 8 bands gives exactly TEMPLATE_COLUMNS."""
+    centres = band_centres(bands)
+    return ["Time"] + [f"{family} A" for family in FAMILIES] + [
+        f"{family} {_label(band)}" for family in FAMILIES for band in centres
+    ]
+
+
+def log_frame(
+        *,
+        duration: str = "7D",
+        rate_s: int = 60,
+        bands: int = len(OCTAVE_BANDS),
+        start: str = "2024-01-01",
+        seed: int = 0,
+) -> pd.DataFrame:
+    """One synthetic log with a "Time" column formatted as the app's template expects."""
+    rng = np.random.default_rng(seed)
+    periods = int(pd.Timedelta(duration) / pd.Timedelta(seconds=rate_s))
+    if periods < 1:
+        raise ValueError("duration must cover at least one sample")
+    times = pd.date_range(start, periods=periods, freq=pd.Timedelta(seconds=rate_s))
+
+    hours = (times.hour + times.minute / 60).to_numpy()
+    diurnal = 42.0 + 10.0 * np.clip(np.sin((hours - 5.0) / 24.0 * 2 * np.pi) + 0.3, 0.0, None)
+    events = rng.random(periods) < 0.002
+    leq_a = diurnal + rng.normal(0.0, 2.0, periods) + events * rng.uniform(10.0, 25.0, periods)
+    lmax_a = leq_a + rng.exponential(6.0, periods)
+    l90_a = leq_a - np.abs(rng.normal(4.0, 1.5, periods))
+
+    centres = np.array(band_centres(bands), dtype="float64")
+    # A broad spectrum peaking around 250 Hz, scaled with the A-weighted level.
+    shape = -3.0 * np.log2(centres / 250.0) ** 2 / 4.0
+    offsets = shape + rng.normal(0.0, 1.0, (periods, len(centres)))
+
+    columns = {"Time": times.strftime("%Y/%m/%d %H:%M" if rate_s % 60 == 0 else "%Y/%m/%d %H:%M:%S")}
+    for family, level in zip(FAMILIES, (leq_a, lmax_a, l90_a)):
+        columns[f"{family} A"] = level
+    for family, level in zip(FAMILIES, (leq_a, lmax_a, l90_a)):
+        spectrum = level[:, None] + offsets
+        for idx, band in enumerate(centres):
+            columns[f"{family} {_label(band)}"] = spectrum[:, idx]
+
+    df = pd.DataFrame(columns)
+    value_cols = df.columns[1:]
+    df[value_cols] = df[value_cols].round(1)
+    return df
+
+
+def write_survey(
+        directory: str,
+        *,
+        logs: int = 4,
+        duration: str = "7D",
+        rate_s: int = 60,
+        bands: int = len(OCTAVE_BANDS),
+        seed: int = 0,
+) -> list[str]:
+    """Write ``logs`` CSV logs to ``directory``, one seed per log; returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for idx in range(logs):
+        path = os.path.join(directory, f"position_{idx + 1:02d}.csv")
+        log_frame(duration=duration, rate_s=rate_s, bands=bands, seed=seed + idx).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def add_workload_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--logs", type=int, default=4, help="Number of logs (default 4).")
+    parser.add_argument("--duration", default="7D", help="Log duration as a pandas timedelta, e.g. 36h or 7D (default 7D).")
+    parser.add_argument("--rate", type=int, default=60, help="Sample interval in seconds (default 60).")
+    parser.add_argument("--bands", type=int, default=len(OCTAVE_BANDS), help="Bands per family (default 8, the template's octave bands).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the first log (default 0).")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Write a synthetic survey of CSV logs in the app's template layout.")
+    parser.add_argument("directory", help="Directory to write the logs to.")
+    add_workload_arguments(parser)
+    args = parser.parse_args(argv)
+
+    paths = write_survey(
+        args.directory, logs=args.logs, duration=args.duration, rate_s=args.rate, bands=args.bands, seed=args.seed,
+    )
+    print(f"Wrote {len(paths)} logs to {args.directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,408 @@
+"""Local HTTP/JSON API over the app's import and survey functions.
+
+    python src/streamlitproject2/api_server.py --port 8765
+
+Endpoints:
+    GET    /health                 server and cache statistics
+    POST   /logs?name=<file name>  upload a CSV/XLSX log as the raw request body
+    DELETE /logs/<id>              release an uploaded log
+    POST   /survey/<table>         compute broadband_summary, leq_spectra,
+                                   lmax_spectra, modal or counts
+
+A survey request body looks like::
+
+    {"logs": [{"id": "<id>", "name": "Position 1"}],
+     "times": {"day": [7, 0], "evening": [23, 0], "night": [23, 0]},
+     "params": {"lmax_n": 10, "lmax_t": "2min"}}
+
+Connections are kept alive between requests, but one that sends nothing for
+``--idle-timeout`` seconds is closed, so idle clients cannot hold every worker.
+
+Parsed logs live in a SharedLogStore keyed by content hash (the same store the
+app uses when the API is started from it), and responses are kept in an LRU
+cache keyed by log ids, periods, table and parameters.
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import pycoustic as pc
+
+from leq_index import survey_table
+from log_arrays import set_survey_periods
+from log_store import LogBudgetError, SharedLogStore, default_budget, session_view
+from st_config import _freeze, default_times, parse_log_file, trace_sizes
+from tracing import span
+
+API_HOLDER = "api"
+SURVEY_TABLES = ("broadband_summary", "leq_spectra", "lmax_spectra", "modal", "counts")
+COLUMN_PARAMS = ("cols", "leq_cols", "max_cols")
+DEFAULT_WORKERS = 4
+DEFAULT_IDLE_TIMEOUT_S = 30.0
+DEFAULT_RESULT_ENTRIES = 256
+MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _json_label(value):
+    # Dates, timestamps and other labels are sent as their string form.
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def frame_to_json(df: pd.DataFrame | None) -> dict | None:
+    """Split-style JSON with every column/index level kept as a list of labels."""
+    if df is None:
+        return None
+
+    def _labels(index: pd.Index) -> list:
+        if isinstance(index, pd.MultiIndex):
+            return [[_json_label(part) for part in label] for label in index]
+        return [[_json_label(label)] for label in index]
+
+    values = df.to_numpy(dtype=object)
+    data = [
+        [None if value is None or (isinstance(value, float) and np.isnan(value)) else _json_label(value) for value in row]
+        for row in values
+    ]
+    return {
+        "columns": _labels(df.columns),
+        "column_names": [_json_label(name) for name in df.columns.names],
+        "index": _labels(df.index),
+        "index_names": [_json_label(name) for name in df.index.names],
+        "data": data,
+    }
+
+
+def _survey_kwargs(params: dict) -> dict:
+    kwargs = dict(params)
+    for key in COLUMN_PARAMS:
+        if kwargs.get(key) is not None:
+            kwargs[key] = [tuple(col) for col in kwargs[key]]
+    if kwargs.get("pivot_col") is not None:
+        kwargs["pivot_col"] = tuple(kwargs["pivot_col"])
+    return kwargs
+
+
+class ResultCache:
+    """Thread-safe LRU of encoded responses."""
+
+    def __init__(self, max_entries: int = DEFAULT_RESULT_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard_log(self, log_id: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if any(entry[0] == log_id for entry in key[0])]:
+                del self._entries[key]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class AnalysisService:
+    """Request-independent logic behind the HTTP handler; safe to call from several threads."""
+
+    def __init__(self, store: SharedLogStore, results: ResultCache | None = None) -> None:
+        self.store = store
+        self.results = results or ResultCache()
+        self._uploads: dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def add_log(self, data: bytes, file_name: str) -> dict:
+        log_id = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if log_id in self._uploads:
+                return self._describe(log_id)
+
+        parses = []
+
+        def _parse() -> tuple:
+            parses.append(log_id)
+            suffix = os.path.splitext(file_name)[1].lower() or ".csv"
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, f"upload{suffix}")
+                with open(path, "wb") as out:
+                    out.write(data)
+                return parse_log_file(path)
+
+        try:
+            with span("import", session=API_HOLDER, file=file_name, bytes=len(data)) as trace:
+                parsed = self.store.acquire(API_HOLDER, log_id, _parse)
+                trace["cache"] = "miss" if parses else "hit"
+                trace.update(trace_sizes(log for _, log in parsed))
+        except LogBudgetError as exc:
+            raise ApiError(507, str(exc))
+        except Exception as exc:
+            raise ApiError(422, f"Could not parse {file_name}: {exc}")
+
+        with self._lock:
+            if log_id in self._uploads:
+                self.store.release(API_HOLDER, log_id)
+            else:
+                self._uploads[log_id] = parsed
+            return self._describe(log_id)
+
+    def _describe(self, log_id: str) -> dict:
+        profiles = []
+        for profile, log in self._uploads[log_id]:
+            data = log.get_data()
+            profiles.append(
+                {
+                    "profile": profile,
+                    "start": str(data.index.min()),
+                    "end": str(data.index.max()),
+                    "rows": int(len(data)),
+                }
+            )
+        return {"id": log_id, "profiles": profiles}
+
+    def remove_log(self, log_id: str) -> None:
+        with self._lock:
+            if self._uploads.pop(log_id, None) is None:
+                raise ApiError(404, f"Unknown log id {log_id}")
+        self.store.release(API_HOLDER, log_id)
+        self.results.discard_log(log_id)
+
+    def _log(self, log_id: str, profile):
+        with self._lock:
+            parsed = self._uploads.get(log_id)
+        if parsed is None:
+            raise ApiError(404, f"Unknown log id {log_id}")
+        for candidate, log in parsed:
+            if candidate == profile or (profile is None and len(parsed) == 1):
+                return log
+        raise ApiError(404, f"Log {log_id} has no profile {profile!r}")
+
+    def survey_table(self, table: str, request: dict) -> tuple[bytes, bool]:
+        """Encoded JSON for ``table``; the flag is True when served from the result cache."""
+        if table not in SURVEY_TABLES:
+            raise ApiError(404, f"Unknown table {table!r}; expected one of {', '.join(SURVEY_TABLES)}")
+        entries = request.get("logs") or []
+        if not entries:
+            raise ApiError(400, "Request must list at least one log.")
+        times = {period: tuple(value) for period, value in (request.get("times") or default_times).items()}
+        params = request.get("params") or {}
+
+        logs = [
+            (entry["id"], entry.get("profile"), entry.get("name") or entry["id"][:12])
+            for entry in entries
+        ]
+        key = (tuple(logs), _freeze(times), table, _freeze(params))
+        with span(f"survey.{table}", session=API_HOLDER, cache="miss") as trace:
+            cached = self.results.get(key)
+            if cached is not None:
+                trace["cache"] = "hit"
+                return cached, True
+
+            survey = pc.Survey()
+            for log_id, profile, name in logs:
+                # Per-request views: applying periods rewrites the Night idx column.
+                survey.add_log(data=session_view(self._log(log_id, profile)), name=name)
+            trace.update(trace_sizes(survey._logs.values()))
+            try:
+                set_survey_periods(survey, times)
+                df = survey_table(survey, table, **_survey_kwargs(params))
+            except TypeError as exc:
+                raise ApiError(400, str(exc))
+            except Exception as exc:
+                raise ApiError(422, f"{table} failed: {exc}")
+
+            body = json.dumps({"table": table, "result": frame_to_json(df)}).encode("utf-8")
+            self.results.put(key, body)
+            return body, False
+
+    def health(self) -> dict:
+        with self._lock:
+            uploads = len(self._uploads)
+        return {
+            "status": "ok",
+            "uploads": uploads,
+            "log_store": self.store.stats(API_HOLDER),
+            "results": self.results.stats(),
+        }
+
+
+def _handler_for(service: AnalysisService, idle_timeout: float) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        server_version = "pycoustic-api"
+        # Socket timeout; a keep-alive connection that stays silent this long is closed.
+        timeout = idle_timeout
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def _send(self, status: int, body: bytes, cache: str | None = None) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if cache is not None:
+                self.send_header("X-Cache", cache)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            self._send(status, json.dumps(payload, default=str).encode("utf-8"))
+
+        def _body(self) -> bytes:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_UPLOAD_BYTES:
+                raise ApiError(413, "Request body too large.")
+            return self.rfile.read(length)
+
+        def _dispatch(self, method: str) -> None:
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            try:
+                if method == "GET" and parts == ["health"]:
+                    self._send_json(200, service.health())
+                elif method == "POST" and parts == ["logs"]:
+                    name = parse_qs(url.query).get("name", ["upload.csv"])[0]
+                    self._send_json(201, service.add_log(self._body(), name))
+                elif method == "DELETE" and len(parts) == 2 and parts[0] == "logs":
+                    service.remove_log(parts[1])
+                    self._send_json(200, {"id": parts[1], "removed": True})
+                elif method == "POST" and len(parts) == 2 and parts[0] == "survey":
+                    try:
+                        request = json.loads(self._body() or b"{}")
+                    except ValueError:
+                        raise ApiError(400, "Request body must be JSON.")
+                    body, hit = service.survey_table(parts[1], request)
+                    self._send(200, body, cache="hit" if hit else "miss")
+                else:
+                    raise ApiError(404, f"No route for {method} {url.path}")
+            except ApiError as exc:
+                self._send_json(exc.status, {"error": str(exc)})
+            except Exception as exc:
+                self._send_json(500, {"error": str(exc)})
+
+        def do_GET(self) -> None:
+            self._dispatch("GET")
+
+        def do_POST(self) -> None:
+            self._dispatch("POST")
+
+        def do_DELETE(self) -> None:
+            self._dispatch("DELETE")
+
+    return Handler
+
+
+class AnalysisServer(HTTPServer):
+    """HTTP server handing each connection to a fixed-size worker pool."""
+
+    def __init__(
+            self,
+            address: tuple[str, int],
+            service: AnalysisService,
+            workers: int = DEFAULT_WORKERS,
+            idle_timeout: float = DEFAULT_IDLE_TIMEOUT_S,
+    ) -> None:
+        super().__init__(address, _handler_for(service, idle_timeout))
+        self.service = service
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="pycoustic-api")
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def process_request(self, request, client_address) -> None:
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def start_server(
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        store: SharedLogStore | None = None,
+        workers: int = DEFAULT_WORKERS,
+        result_entries: int = DEFAULT_RESULT_ENTRIES,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT_S,
+) -> AnalysisServer:
+    """Start serving on a daemon thread and return the server (``port=0`` picks a free port)."""
+    service = AnalysisService(store or SharedLogStore(*default_budget()), ResultCache(result_entries))
+    server = AnalysisServer((host, port), service, workers=workers, idle_timeout=idle_timeout)
+    threading.Thread(target=server.serve_forever, name="pycoustic-api-server", daemon=True).start()
+    return server
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve pycoustic survey computations over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default 8765).")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent request workers.")
+    parser.add_argument("--result-entries", type=int, default=DEFAULT_RESULT_ENTRIES, help="Cached responses to keep.")
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=DEFAULT_IDLE_TIMEOUT_S,
+        help=f"Seconds before a silent connection is closed (default {DEFAULT_IDLE_TIMEOUT_S:g}).",
+    )
+    args = parser.parse_args(argv)
+
+    service = AnalysisService(SharedLogStore(*default_budget()), ResultCache(args.result_entries))
+    server = AnalysisServer((args.host, args.port), service, workers=args.workers, idle_timeout=args.idle_timeout)
+    print(f"Serving pycoustic analysis API on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,351 @@
+"""Headless batch processing of survey directories.
+
+Each directory of CSV/XLSX logs is one survey. Every log file is parsed in its
+own task on a process pool; once a survey's files are parsed, its tables are
+computed in one more task, and its five summary tables are written as
+individual CSVs alongside the combined sectioned CSV from the app:
+
+    python src/streamlitproject2/batch.py SITE_A SITE_B --output results/
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pycoustic as pc
+
+from st_config import (
+    _combined_sections,
+    compute_summary_tables,
+    default_times,
+    parse_log_file,
+    summary_table_calls,
+    write_csv_sections,
+    write_table_csv,
+)
+
+LOG_EXTENSIONS = (".csv", ".xlsx")
+TABLE_FILES = {
+    "broadband_df": "broadband_summary.csv",
+    "leq_df": "leq_spectra.csv",
+    "lmax_df": "lmax_spectra.csv",
+    "modal_df": "modal.csv",
+    "counts": "counts.csv",
+}
+COMBINED_FILE = "all_tables.csv"
+SUMMARY_FILE = "batch_summary.json"
+
+
+def _hhmm(value: str) -> tuple[int, int]:
+    try:
+        parsed = dt.datetime.strptime(value, "%H:%M")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HH:MM, got {value!r}")
+    return parsed.hour, parsed.minute
+
+
+def _column(value: str) -> tuple:
+    """'L90 A' -> ('L90', 'A'); 'L90 125' -> ('L90', 125.0), matching pycoustic's headers."""
+    param, _, band = value.strip().partition(" ")
+    try:
+        return param, float(band)
+    except ValueError:
+        return param, band
+
+
+def find_logs(directory: str) -> list[str]:
+    return sorted(
+        os.path.join(directory, entry)
+        for entry in os.listdir(directory)
+        if entry.lower().endswith(LOG_EXTENSIONS) and os.path.isfile(os.path.join(directory, entry))
+    )
+
+
+def find_sites(directories: list[str], subdirs: bool) -> dict[str, str]:
+    """``{site name: directory}``; names are directory basenames, suffixed if repeated."""
+    candidates = []
+    for directory in directories:
+        if subdirs:
+            candidates.extend(
+                os.path.join(directory, entry)
+                for entry in sorted(os.listdir(directory))
+                if os.path.isdir(os.path.join(directory, entry))
+            )
+        else:
+            candidates.append(directory)
+
+    sites: dict[str, str] = {}
+    for directory in candidates:
+        base = os.path.basename(os.path.normpath(directory)) or "site"
+        name = base
+        suffix = 1
+        while name in sites:
+            name = f"{base}-{suffix}"
+            suffix += 1
+        sites[name] = directory
+    return sites
+
+
+def _write(path: str, buffer) -> dict:
+    with open(path, "wb") as out:
+        shutil.copyfileobj(buffer, out)
+    return {"path": path, "bytes": os.path.getsize(path)}
+
+
+def _compute_site(logs: dict, settings: dict, output_dir: str) -> tuple[dict, list[str]]:
+    """Write the site's table CSVs and combined CSV; returns ({file name: path and size}, errors)."""
+    survey = pc.Survey()
+    for name, log in logs.items():
+        survey.add_log(data=log, name=name)
+
+    calls = summary_table_calls(
+        lmax_n=settings["lmax_n"],
+        lmax_t=f"{settings['lmax_t']}min",
+        modal_param=settings["modal_param"],
+        day_t=settings["day_t"],
+        evening_t=settings["evening_t"],
+        night_t=settings["night_t"],
+        averaging=settings["averaging"],
+    )
+    table_errors: dict[str, str] = {}
+    tables = compute_summary_tables(None, survey, settings["times"], calls, errors=table_errors)
+
+    os.makedirs(output_dir, exist_ok=True)
+    files = {}
+    for key, file_name in TABLE_FILES.items():
+        # A failed table is reported rather than written as an empty file.
+        if tables[key] is None:
+            continue
+        with write_table_csv(tables[key], index=True) as buffer:
+            files[file_name] = _write(os.path.join(output_dir, file_name), buffer)
+
+    sections = _combined_sections(
+        tables["broadband_df"],
+        tables["leq_df"],
+        tables["lmax_df"],
+        tables["modal_df"],
+        tables["counts"],
+        day_start=settings["times"]["day"],
+        evening_start=settings["times"]["evening"],
+        night_start=settings["times"]["night"],
+        lmax_n=settings["lmax_n"],
+        lmax_t=settings["lmax_t"],
+        modal_param=settings["modal_param"],
+        day_t=settings["day_t"],
+        evening_t=settings["evening_t"],
+        night_t=settings["night_t"],
+    )
+    with write_csv_sections(sections) as buffer:
+        files[COMBINED_FILE] = _write(os.path.join(output_dir, COMBINED_FILE), buffer)
+
+    errors = [f"{TABLE_FILES[key]}: {error}" for key, error in table_errors.items()]
+    return files, errors
+
+
+def parse_log(path: str, parsed_dir: str) -> list[tuple[str, str]]:
+    """Parse one log file in a worker process and pickle each Log into ``parsed_dir``.
+
+    Returns ``[(log name, pickle path)]``; the Logs themselves never travel back
+    through the pool, so the parent's memory does not grow with the corpus.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    parsed = []
+    for prof_name, log in parse_log_file(path):
+        fd, pickle_path = tempfile.mkstemp(prefix="log-", suffix=".pickle", dir=parsed_dir)
+        with os.fdopen(fd, "wb") as out:
+            pickle.dump(log, out, protocol=pickle.HIGHEST_PROTOCOL)
+        parsed.append((stem if prof_name is None else f"{stem} - {prof_name}", pickle_path))
+    return parsed
+
+
+def compute_site(
+        site: str,
+        parsed: list[tuple[str, str]],
+        settings: dict,
+        output_dir: str,
+        errors: list[str] = (),
+) -> dict:
+    """Compute and write one site from its pickled Logs, deleting each pickle once loaded.
+
+    Only the summary (file paths and sizes, errors) goes back to the parent.
+    """
+    errors = list(errors)
+    logs = {}
+    for name, pickle_path in parsed:
+        with open(pickle_path, "rb") as source:
+            logs[name] = pickle.load(source)
+        os.remove(pickle_path)
+    if not logs:
+        return {"site": site, "logs": [], "errors": errors or ["No CSV/XLSX logs found."]}
+
+    files, table_errors = _compute_site(logs, settings, output_dir)
+    return {
+        "site": site,
+        "output": output_dir,
+        "logs": list(logs),
+        "files": files,
+        "errors": errors + table_errors,
+    }
+
+
+def process_site(site: str, directory: str, settings: dict, output_dir: str) -> dict:
+    """Parse, compute and write one site in this process, one file after another."""
+    started = time.perf_counter()
+    errors = []
+    parsed = []
+    with tempfile.TemporaryDirectory(prefix="pycoustic-batch-") as parsed_dir:
+        for path in find_logs(directory):
+            try:
+                parsed.extend(parse_log(path, parsed_dir))
+            except Exception as exc:
+                errors.append(f"{os.path.basename(path)}: {exc}")
+        summary = compute_site(site, parsed, settings, output_dir, errors)
+    if "files" in summary:
+        summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def run_batch(
+        sites: dict[str, str],
+        output: str,
+        settings: dict,
+        workers: int | None = None,
+        log=print,
+) -> list[dict]:
+    """Parse every log file as its own task on a process pool, then compute each site once its files are in.
+
+    A site's ``elapsed_s`` is the time from the start of the batch until its files were written.
+    """
+    started = time.perf_counter()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="pycoustic-batch-") as parsed_dir, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        # Per site: files still parsing, (name, pickle path) per file in directory order, parse errors.
+        remaining: dict[str, int] = {}
+        parsed: dict[str, list] = {}
+        errors: dict[str, list[str]] = {}
+        pending = {}
+
+        def _submit_compute(site: str) -> None:
+            logs = [entry for entries in parsed[site] if entries for entry in entries]
+            future = pool.submit(compute_site, site, logs, settings, os.path.join(output, site), errors[site])
+            pending[future] = ("compute", site, None)
+
+        for site, directory in sites.items():
+            paths = find_logs(directory)
+            remaining[site] = len(paths)
+            parsed[site] = [None] * len(paths)
+            errors[site] = []
+            for idx, path in enumerate(paths):
+                pending[pool.submit(parse_log, path, parsed_dir)] = ("parse", site, (idx, path))
+            if not paths:
+                _submit_compute(site)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, site, item = pending.pop(future)
+                if kind == "parse":
+                    idx, path = item
+                    try:
+                        parsed[site][idx] = future.result()
+                    except Exception as exc:
+                        errors[site].append(f"{os.path.basename(path)}: {exc}")
+                    remaining[site] -= 1
+                    if remaining[site] == 0:
+                        _submit_compute(site)
+                    continue
+
+                try:
+                    summary = future.result()
+                except Exception as exc:
+                    summary = {"site": site, "errors": errors[site] + [f"Survey failed: {exc}"]}
+                for error in summary["errors"]:
+                    log(f"[{site}] {error}")
+                if "files" in summary:
+                    summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+                    log(f"[{site}] wrote {len(summary['files'])} files to {summary['output']} in {summary['elapsed_s']} s")
+                results.append(summary)
+
+    return sorted(results, key=lambda item: item["site"])
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Compute pycoustic survey summary tables for directories of CSV/XLSX logs.",
+    )
+    parser.add_argument("directories", nargs="+", help="Directories of logs; each is processed as one survey.")
+    parser.add_argument("-o", "--output", required=True, help="Directory to write results to, one subdirectory per survey.")
+    parser.add_argument("--subdirs", action="store_true", help="Treat each subdirectory of the given directories as a survey.")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--day", type=_hhmm, default=default_times["day"], help="Daytime start, HH:MM (default 07:00).")
+    parser.add_argument("--evening", type=_hhmm, default=default_times["evening"], help="Evening start, HH:MM (default 23:00, i.e. no evening).")
+    parser.add_argument("--night", type=_hhmm, default=default_times["night"], help="Night-time start, HH:MM (default 23:00).")
+    parser.add_argument("--lmax-n", type=int, default=10, help="Nth-highest Lmax (default 10).")
+    parser.add_argument("--lmax-t", type=int, default=2, help="Lmax interval in minutes (default 2).")
+    parser.add_argument("--modal-param", type=_column, default=("L90", "A"), help="Modal/counts column, e.g. 'L90 A' (default).")
+    parser.add_argument("--modal-day-t", type=int, default=60, help="Daytime modal interval in minutes (default 60).")
+    parser.add_argument("--modal-evening-t", type=int, default=60, help="Evening modal interval in minutes (default 60).")
+    parser.add_argument("--modal-night-t", type=int, default=15, help="Night-time modal interval in minutes (default 15).")
+    parser.add_argument("--averaging", choices=["log", "arithmetic"], default="log", help="L90 averaging method (default log).")
+    return parser
+
+
+def settings_from_args(args: argparse.Namespace) -> dict:
+    return {
+        "times": {"day": args.day, "evening": args.evening, "night": args.night},
+        "lmax_n": args.lmax_n,
+        "lmax_t": args.lmax_t,
+        "modal_param": args.modal_param,
+        "day_t": f"{args.modal_day_t}min",
+        "evening_t": f"{args.modal_evening_t}min",
+        "night_t": f"{args.modal_night_t}min",
+        "averaging": args.averaging,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    settings = settings_from_args(args)
+
+    missing = [directory for directory in args.directories if not os.path.isdir(directory)]
+    if missing:
+        print(f"Not a directory: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    sites = find_sites(args.directories, args.subdirs)
+    if not sites:
+        print("No survey directories found.", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    results = run_batch(sites, args.output, settings, workers=args.workers)
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, SUMMARY_FILE), "w", encoding="utf-8") as out:
+        json.dump(
+            {
+                "created": dt.datetime.now().isoformat(timespec="seconds"),
+                "settings": settings,
+                "elapsed_s": round(time.perf_counter() - started, 3),
+                "sites": results,
+            },
+            out,
+            indent=2,
+            default=str,
+        )
+
+    failed = [result["site"] for result in results if result.get("errors")]
+    if failed:
+        print(f"Completed with errors for: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
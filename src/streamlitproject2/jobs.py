@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+import traceback
+import weakref
+from contextlib import contextmanager
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable
+from uuid import uuid4
+
+
+def default_job_workers() -> int:
+    try:
+        return max(1, int(os.environ.get("PYCOUSTIC_JOB_WORKERS", "")))
+    except ValueError:
+        return max(1, min(4, os.cpu_count() or 1))
+
+
+def job_executor(max_workers: int | None = None) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max_workers or default_job_workers(), thread_name_prefix="pycoustic-job")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation has been requested."""
+
+
+class JobContext:
+    """Handed to a job function to report progress and observe cancellation."""
+
+    def __init__(self, job: "Job") -> None:
+        self._job = job
+
+    @property
+    def cancelled(self) -> bool:
+        return self._job._cancel.is_set()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise JobCancelled()
+
+    def progress(self, fraction: float, text: str | None = None) -> None:
+        """Record progress in [0, 1]; raises JobCancelled if the job has been cancelled."""
+        self._job.progress = min(max(float(fraction), 0.0), 1.0)
+        if text is not None:
+            self._job.text = text
+        self.check()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a named step of the job; totals are kept in ``Job.stages`` for the page to report."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._job.stages[name] = self._job.stages.get(name, 0.0) + time.perf_counter() - started
+
+
+class Job:
+    """One background computation. ``status`` is "queued", "running", "done", "failed" or "cancelled"."""
+
+    def __init__(self, name: str, key: Any) -> None:
+        self.id = uuid4().hex
+        self.name = name
+        self.key = key
+        self.status = "queued"
+        self.progress = 0.0
+        self.text = ""
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.traceback = ""
+        self.stages: dict[str, float] = {}
+        self.submitted = time.time()
+        self.finished_at: float | None = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.time()) - self.submitted
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        if self.status == "queued":
+            self._finish("cancelled")
+
+    def _finish(self, status: str) -> None:
+        self.status = status
+        self.finished_at = time.time()
+
+    def _run(self, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        if self._cancel.is_set():
+            self._finish("cancelled")
+            return
+        self.status = "running"
+        try:
+            self.result = fn(JobContext(self), *args, **kwargs)
+        except JobCancelled:
+            self._finish("cancelled")
+        except BaseException as exc:
+            self.error = exc
+            self.traceback = traceback.format_exc()
+            self._finish("failed")
+        else:
+            self.progress = 1.0
+            self._finish("done")
+
+
+def _cancel_all(jobs: dict[str, Job]) -> None:
+    for job in list(jobs.values()):
+        job.cancel()
+
+
+class JobRunner:
+    """A session's background jobs, one slot per name, run on a shared executor.
+
+    Job functions run off the script thread, so they must not touch ``st`` or
+    session state: they take plain inputs and return a result, which the page
+    publishes on a later rerun.
+    """
+
+    def __init__(self, executor: Executor) -> None:
+        self._executor = executor
+        self._jobs: dict[str, Job] = {}
+        weakref.finalize(self, _cancel_all, self._jobs)
+
+    def get(self, name: str, key: Any = None) -> Job | None:
+        """The job in slot ``name``, or None if there is none or it was started for a different key."""
+        job = self._jobs.get(name)
+        if job is None or (key is not None and job.key != key):
+            return None
+        return job
+
+    def submit(self, name: str, key: Any, fn: Callable[..., Any], *args, **kwargs) -> Job:
+        """Start ``fn(context, *args, **kwargs)`` in slot ``name``, cancelling any job it replaces."""
+        previous = self._jobs.get(name)
+        if previous is not None and not previous.finished:
+            previous.cancel()
+        job = Job(name, key)
+        self._jobs[name] = job
+        self._executor.submit(job._run, fn, args, kwargs)
+        return job
+
+    def discard(self, name: str) -> None:
+        job = self._jobs.pop(name, None)
+        if job is not None and not job.finished:
+            job.cancel()
+
+    def cancel_all(self) -> None:
+        _cancel_all(self._jobs)
+
+    def jobs(self) -> list[Job]:
+        return list(self._jobs.values())
@@ -0,0 +1,213 @@
+"""Period and time-range Leqs from each log's cumulative energy index.
+
+``leq_spectra`` and the Leq columns of ``broadband_summary`` average antilogs
+over every row of a period. With the prefix sums kept in ``LogArrays`` each
+contiguous run of a period costs two lookups per band, so these tables no
+longer filter and group the whole log. Results match pycoustic's methods,
+which are still used for any log without an index and for wrapped logs such
+as weather-excluded ones, whose rows are filtered.
+
+pycoustic is imported where it is used, so importing this module does not
+load its parsers and weather client.
+"""
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import pandas as pd
+
+from log_arrays import LogArrays, _underlying
+
+if TYPE_CHECKING:
+    import pycoustic as pc
+
+PERIOD_NAMES = {"days": "Daytime", "evenings": "Evening", "nights": "Night-time"}
+
+
+def _times_of(log: Any) -> dict:
+    return {
+        key: (value.hour, value.minute)
+        for key, value in (("day", log._day_start), ("evening", log._evening_start), ("night", log._night_start))
+    }
+
+
+def _matching(arrays: LogArrays, cols: list) -> list[tuple] | None:
+    """Indexed columns selected by ``cols`` as ``df[cols]`` would select them, or None if any is not indexed."""
+    selected = []
+    for col in cols:
+        if isinstance(col, tuple):
+            matched = [col] if col in arrays.band_map else []
+        else:
+            matched = [name for name in arrays.columns if name[0] == col]
+        if any(name not in arrays.energy_columns for name in matched):
+            return None
+        selected += matched
+    return selected
+
+
+def indexed_arrays(log: Any) -> LogArrays | None:
+    """The log's arrays when its energy index covers the rows a survey would use.
+
+    Wrapped logs that filter rows answer through their own ``masked_arrays``;
+    other wrappers have no index.
+    """
+    if "_log" in getattr(log, "__dict__", {}):
+        masked_arrays = getattr(log, "masked_arrays", None)
+        return None if masked_arrays is None else masked_arrays()
+    arrays = getattr(log, "_arrays", None)
+    if arrays is None or not arrays.energy_columns or len(arrays) != len(log.get_antilogs()):
+        return None
+    return arrays
+
+
+def _period_sums(arrays: LogArrays, log: Any, period: str, cols: list) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    starts, ends, days = arrays.period_runs(_times_of(log), period)
+    # Runs whose rows are all masked out are absent from a filtered frame, so they get no date.
+    kept = arrays.kept_runs(starts, ends)
+    starts, ends, days = starts[kept], ends[kept], days[kept]
+    sums, counts = arrays.energy_sums(starts, ends, cols)
+    return sums, counts, days
+
+
+def _db(energy: np.ndarray, counts: np.ndarray, decimals: int) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.round(10 * np.log10(energy / counts), decimals)
+
+
+def _period_leq(log: Any, period: str, leq_cols: list) -> pd.Series:
+    arrays = indexed_arrays(log)
+    cols = None if arrays is None else _matching(arrays, leq_cols)
+    from pycoustic.survey import DECIMALS, Survey
+
+    if cols is None:
+        data = log.get_period(data=log.get_antilogs(), period=period)
+        valid_cols = Survey._existing_columns(data, leq_cols)
+        return data[valid_cols].apply(Survey._db_mean) if valid_cols else pd.Series(dtype=float)
+    if not cols:
+        return pd.Series(dtype=float)
+    sums, counts, _ = _period_sums(arrays, log, period, cols)
+    return pd.Series(
+        _db(sums.sum(axis=0), counts.sum(axis=0), DECIMALS),
+        index=pd.MultiIndex.from_tuples(cols, names=_underlying(log).get_antilogs().columns.names),
+    )
+
+
+def leq_spectra(survey: "pc.Survey", leq_cols: list[Any] | None = None) -> pd.DataFrame:
+    """``Survey.leq_spectra`` computed from the energy index where logs have one."""
+    from pycoustic.survey import DECIMALS
+
+    if leq_cols is None:
+        leq_cols = ["Leq"]
+
+    all_pos = []
+    labels = []
+    for label, log in survey._logs.items():
+        periods = ["days", "evenings", "nights"] if log.is_evening() else ["days", "nights"]
+        all_pos.append(
+            pd.concat(
+                [_period_leq(log, period, leq_cols) for period in periods],
+                axis=1,
+                keys=[PERIOD_NAMES[period] for period in periods],
+            )
+        )
+        labels.append(label)
+
+    if not all_pos:
+        return pd.DataFrame()
+
+    combi = pd.concat(all_pos, axis=1, keys=labels)
+    combi = combi.transpose().unstack(level=1)
+    combi.columns = combi.columns.reorder_levels([2, 0, 1])
+    combi = combi.sort_index(axis=1)
+    return combi.round(decimals=DECIMALS)
+
+
+def _leq_by_date(log: Any, period: str, cols: list) -> pd.DataFrame:
+    arrays = indexed_arrays(log)
+    matched = None
+    if arrays is not None and all(isinstance(col, tuple) for col in cols):
+        matched = _matching(arrays, cols)
+    if not matched:
+        return log.leq_by_date(log.get_period(data=log.get_antilogs(), period=period), cols=cols)
+
+    sums, counts, days = _period_sums(arrays, log, period, matched)
+    unique_days, group = np.unique(days, return_inverse=True)
+    energy = np.zeros((len(unique_days), len(matched)))
+    samples = np.zeros((len(unique_days), len(matched)), dtype="int64")
+    np.add.at(energy, group, sums)
+    np.add.at(samples, group, counts)
+    dates = pd.Index([day.date() for day in pd.to_datetime(unique_days, unit="D")], dtype=object)
+    result = pd.DataFrame(_db(energy, samples, log._decimals), index=dates, columns=pd.MultiIndex.from_tuples(matched))
+    return result.reindex(columns=pd.MultiIndex.from_tuples(cols))
+
+
+def broadband_summary(
+        survey: "pc.Survey",
+        leq_cols: list[Any] | None = None,
+        max_cols: list[Any] | None = None,
+        lmax_n: int = 10,
+        lmax_t: str = "2min",
+        pivot_col: tuple[Any, Any] | None = None,
+) -> pd.DataFrame:
+    """``Survey.broadband_summary`` with its Leq columns taken from the energy index where logs have one."""
+    from pycoustic.survey import DECIMALS
+
+    combi = pd.DataFrame()
+    if leq_cols is None:
+        leq_cols = [("Leq", "A")]
+    if max_cols is None:
+        max_cols = [("Lmax", "A")]
+    if pivot_col is None and max_cols:
+        pivot_col = max_cols[0]
+
+    for key, lg in survey._logs.items():
+        periods = ["days", "evenings", "nights"] if lg.is_evening() else ["days", "nights"]
+        period_blocks: list[pd.DataFrame | pd.Series] = [
+            _leq_by_date(lg, period, leq_cols).sort_index() for period in periods
+        ]
+        period_names = [PERIOD_NAMES[period] for period in periods]
+
+        # Lmax columns are nth-highest values, which prefix sums cannot give; as in pycoustic.
+        maxes = lg.as_interval(t=lmax_t)
+        maxes = lg.get_period(data=maxes, period="nights", night_idx=True)
+        max_df = lg.get_nth_high_low(n=lmax_n, data=maxes, pivot_col=pivot_col)
+
+        existing_max_cols = survey._existing_columns(max_df, max_cols)
+        maxes = max_df[existing_max_cols] if existing_max_cols else pd.DataFrame(index=max_df.index)
+        maxes = maxes.reindex(columns=survey._expected_columns(max_cols))
+        maxes.sort_index(inplace=True)
+        try:
+            maxes.index = pd.to_datetime(maxes.index)
+            maxes.index = maxes.index.date
+        except Exception:
+            pass
+        maxes.index.name = None
+        period_blocks.append(maxes)
+        period_names.append("Night-time")
+
+        summary = survey._concat_period_blocks(period_blocks=period_blocks, period_names=period_names)
+        summary = survey._insert_multiindex(df=summary, super=key)
+        combi = pd.concat(objs=[combi, summary], axis=0)
+
+    return combi.round(decimals=DECIMALS)
+
+
+def survey_table(survey: "pc.Survey", method: str, **kwargs) -> pd.DataFrame:
+    """Run a survey method, through the energy index for the tables it can answer."""
+    if method == "leq_spectra":
+        return leq_spectra(survey, **kwargs)
+    if method == "broadband_summary":
+        return broadband_summary(survey, **kwargs)
+    return getattr(survey, method)(**kwargs)
+
+
+def range_leq(log: Any, start, end) -> pd.Series:
+    """Leq of every indexed column between two times (inclusive), e.g. a range selected on a chart."""
+    from pycoustic.survey import DECIMALS, Survey
+
+    arrays = indexed_arrays(log)
+    if arrays is None:
+        data = log.get_antilogs().drop(columns="Night idx", level=0)
+        data = data.loc[pd.Timestamp(start):pd.Timestamp(end), [col for col in data.columns if col[0] == "Leq"]]
+        return data.apply(Survey._db_mean)
+    columns = list(arrays.energy_columns)
+    return pd.Series(np.round(arrays.leq(start, end, columns), DECIMALS), index=pd.MultiIndex.from_tuples(columns))
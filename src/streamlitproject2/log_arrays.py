@@ -0,0 +1,301 @@
+"""Array-backed view of a pycoustic Log, with period labels computed once per ``times`` setting.
+
+pycoustic keeps each log as a MultiIndex-column DataFrame and rebuilds its
+"Night idx" column in a Python loop over every row on each ``set_periods``.
+``LogArrays`` holds the same time axis as int64 nanoseconds, the measurements
+as a float64 (time x column) matrix with a map from (parameter, band) to
+column, and caches the period codes and night index for each ``times``
+setting it has seen. Frames are rebuilt from it only where something is shown.
+
+At import it also indexes the energy (antilog) of every Leq column as prefix
+sums, so the Leq of any run of rows is two lookups per band.
+"""
+import datetime as dt
+import threading
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+# pycoustic.log's names for its night-index column, kept here so that importing
+# this module does not load pycoustic.
+NIGHT_IDX_LABEL = "Night idx"
+NIGHT_IDX_COLUMN = (NIGHT_IDX_LABEL, "")
+DAY_NS = 86_400 * 10 ** 9
+PERIODS = ("days", "evenings", "nights")
+
+_build_lock = threading.Lock()
+
+
+def freeze_times(times: dict) -> tuple:
+    return tuple(tuple(int(part) for part in times[key]) for key in ("day", "evening", "night"))
+
+
+def _time_ns(hour_minute: tuple[int, int]) -> int:
+    return (int(hour_minute[0]) * 60 + int(hour_minute[1])) * 60 * 10 ** 9
+
+
+def _between(time_of_day: np.ndarray, start: int, end: int) -> np.ndarray:
+    # Same rule as DataFrame.between_time(start, end, inclusive="left"), which wraps past midnight.
+    if start <= end:
+        return (time_of_day >= start) & (time_of_day < end)
+    return (time_of_day >= start) | (time_of_day < end)
+
+
+def band_frequency(band) -> float | None:
+    if isinstance(band, str) and band.strip().upper() == "A":
+        return None
+    try:
+        return float(band)
+    except (TypeError, ValueError):
+        return None
+
+
+class LogArrays:
+    """Timestamps, measurement matrix and cached period labels of one log.
+
+    The matrix is extracted from the source frame on first use and shared by
+    every view of the log; treat it as read-only.
+    """
+
+    __slots__ = (
+        "timestamps",
+        "columns",
+        "band_map",
+        "energy_columns",
+        "_source",
+        "_matrix",
+        "_periods",
+        "_runs",
+        "_energy",
+        "_counts",
+        "_kept",
+    )
+
+    def __init__(self, frame: pd.DataFrame) -> None:
+        if not isinstance(frame.index, pd.DatetimeIndex):
+            raise TypeError("LogArrays needs a DatetimeIndex")
+        self.timestamps = np.ascontiguousarray(frame.index.as_unit("ns").asi8)
+        self.columns = tuple(col for col in frame.columns if col[0] != NIGHT_IDX_LABEL)
+        self.band_map = {col: idx for idx, col in enumerate(self.columns)}
+        self._source = frame
+        self._matrix: np.ndarray | None = None
+        self._periods: dict[tuple, tuple[np.ndarray, np.ndarray]] = {}
+        self._runs: dict[tuple, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self.energy_columns: dict[tuple, int] = {}
+        self._energy: np.ndarray | None = None
+        self._counts: np.ndarray | None = None
+        self._kept: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            with _build_lock:
+                if self._matrix is None:
+                    values = self._source[list(self.columns)].apply(pd.to_numeric, errors="coerce")
+                    self._matrix = np.ascontiguousarray(values.to_numpy(dtype="float64"))
+                    self._source = None
+        return self._matrix
+
+    def column(self, col: tuple) -> np.ndarray:
+        """One column's values, read from the source frame unless the matrix is already built."""
+        if self._matrix is None and self._source is not None:
+            return pd.to_numeric(self._source[col], errors="coerce").to_numpy(dtype="float64")
+        return self.matrix[:, self.band_map[col]]
+
+    @property
+    def nbytes(self) -> int:
+        cached = sum(codes.nbytes + night.nbytes for codes, night in self._periods.values())
+        cached += sum(sum(part.nbytes for part in runs) for runs in self._runs.values())
+        energy = sum(
+            array.nbytes for array in (self._matrix, self._energy, self._counts, self._kept) if array is not None
+        )
+        return self.timestamps.nbytes + energy + cached
+
+    def family(self, param: str) -> tuple[np.ndarray, list[int]]:
+        """Band frequencies of one parameter (e.g. "Leq") in ascending order, and their matrix columns."""
+        bands = sorted(
+            (freq, idx)
+            for (col_param, band), idx in self.band_map.items()
+            if str(col_param) == param and (freq := band_frequency(band)) is not None
+        )
+        return np.array([freq for freq, _ in bands], dtype="float64"), [idx for _, idx in bands]
+
+    def band_matrix(self, param: str) -> tuple[np.ndarray, np.ndarray]:
+        """(band frequencies, band x time matrix) of one parameter, as a contiguous copy."""
+        freqs, cols = self.family(param)
+        if not cols:
+            return freqs, np.empty((0, len(self)), dtype="float64")
+        return freqs, np.ascontiguousarray(self.matrix[:, cols].T)
+
+    def periods(self, times: dict) -> tuple[np.ndarray, np.ndarray]:
+        """(period code per row, night index) for ``times``, computed once per setting.
+
+        Codes index ``PERIODS``; rows outside every period (when evening equals
+        night, say) are -1. The night index matches pycoustic's "Night idx":
+        rows before day start shift back one day when night starts after day.
+        """
+        key = freeze_times(times)
+        cached = self._periods.get(key)
+        if cached is not None:
+            return cached
+        day, evening, night = (_time_ns(part) for part in key)
+        time_of_day = self.timestamps % DAY_NS
+        codes = np.full(len(self), -1, dtype="int8")
+        # Assigned in reverse so that, as in pycoustic, a row is a day row first.
+        codes[_between(time_of_day, night, day)] = 2
+        codes[_between(time_of_day, evening, night)] = 1
+        codes[_between(time_of_day, day, evening)] = 0
+        night_idx = self.timestamps
+        if night > day:
+            night_idx = np.where(time_of_day < day, self.timestamps - DAY_NS, self.timestamps)
+        cached = (codes, night_idx.view("datetime64[ns]"))
+        self._periods[key] = cached
+        return cached
+
+    def period_mask(self, times: dict, period: str) -> np.ndarray:
+        return self.periods(times)[0] == PERIODS.index(period)
+
+    def period_runs(self, times: dict, period: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(start rows, end rows, day numbers) of the contiguous runs of one period, split at dates.
+
+        Nights are dated by the night index, so a night crossing midnight is one
+        run; day numbers count days since 1970-01-01.
+        """
+        key = (freeze_times(times), period)
+        cached = self._runs.get(key)
+        if cached is not None:
+            return cached
+        codes, night_idx = self.periods(times)
+        stamps = night_idx.view("int64") if period == "nights" else self.timestamps
+        inside = codes == PERIODS.index(period)
+        labels = np.where(inside, stamps // DAY_NS, np.iinfo(np.int64).min)
+        bounds = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+        starts = np.concatenate(([0], bounds)) if len(self) else bounds
+        ends = np.concatenate((bounds, [len(self)])) if len(self) else bounds
+        keep = inside[starts]
+        cached = (starts[keep], ends[keep], labels[starts[keep]])
+        self._runs[key] = cached
+        return cached
+
+    def index_energy(
+            self,
+            antilogs: pd.DataFrame,
+            params: Iterable[str] = ("Leq",),
+            keep: np.ndarray | None = None,
+    ) -> None:
+        """Store prefix sums of the antilogs of every column of ``params``; missing values count as absent.
+
+        With a boolean ``keep`` per row, rows where it is False count as absent too.
+        """
+        params = {str(param) for param in params}
+        columns = [col for col in self.columns if str(col[0]) in params and col in antilogs.columns]
+        energy = antilogs[columns].to_numpy(dtype="float64")
+        valid = ~np.isnan(energy)
+        if keep is not None:
+            valid &= keep[:, None]
+            self._kept = np.concatenate(([0], np.cumsum(keep, dtype="int64")))
+        prefix = np.zeros((len(energy) + 1, len(columns)), dtype="float64")
+        np.cumsum(np.where(valid, energy, 0.0), axis=0, out=prefix[1:])
+        counts = None
+        if not valid.all():
+            counts = np.zeros(prefix.shape, dtype="int64")
+            np.cumsum(valid, axis=0, out=counts[1:])
+        self.energy_columns = {col: idx for idx, col in enumerate(columns)}
+        self._energy = prefix
+        self._counts = counts
+
+    def masked(self, antilogs: pd.DataFrame, keep: np.ndarray) -> "LogArrays":
+        """A copy sharing this log's time axis and period caches, whose energy index covers only ``keep`` rows."""
+        view = LogArrays.__new__(LogArrays)
+        for name in self.__slots__:
+            setattr(view, name, getattr(self, name))
+        view.index_energy(antilogs, {str(col[0]) for col in self.energy_columns}, keep=keep)
+        return view
+
+    def kept_runs(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """True for each run ``starts[i]:ends[i]`` with at least one row not masked out."""
+        if self._kept is None:
+            return ends > starts
+        return self._kept[ends] > self._kept[starts]
+
+    def energy_sums(self, starts: np.ndarray, ends: np.ndarray, columns: list) -> tuple[np.ndarray, np.ndarray]:
+        """(summed energy, sample count) over rows ``starts[i]:ends[i]`` for each column, in O(1) per run."""
+        starts = np.asarray(starts, dtype="int64")
+        ends = np.asarray(ends, dtype="int64")
+        cols = [self.energy_columns[col] for col in columns]
+        sums = self._energy[ends][:, cols] - self._energy[starts][:, cols]
+        if self._counts is None:
+            counts = np.repeat((ends - starts)[:, None], len(cols), axis=1)
+        else:
+            counts = self._counts[ends][:, cols] - self._counts[starts][:, cols]
+        return sums, counts
+
+    def row_range(self, start=None, end=None) -> tuple[int, int]:
+        """Rows with ``start <= timestamp <= end``; either bound may be None."""
+        first = 0 if start is None else int(np.searchsorted(self.timestamps, pd.Timestamp(start).value, "left"))
+        last = len(self) if end is None else int(np.searchsorted(self.timestamps, pd.Timestamp(end).value, "right"))
+        return first, max(first, last)
+
+    def leq(self, start=None, end=None, columns: list | None = None) -> np.ndarray:
+        """Leq in dB of each indexed column (or ``columns``) between two times; NaN where no samples."""
+        columns = list(self.energy_columns if columns is None else columns)
+        first, last = self.row_range(start, end)
+        sums, counts = self.energy_sums([first], [last], columns)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return 10 * np.log10(sums[0] / counts[0])
+
+    def to_frame(self, rows: slice | np.ndarray | None = None, columns: Iterable | None = None) -> pd.DataFrame:
+        """A DataFrame of the selected rows and columns, for display."""
+        columns = list(self.columns if columns is None else columns)
+        rows = slice(None) if rows is None else rows
+        values = self.matrix[rows][:, [self.band_map[col] for col in columns]]
+        return pd.DataFrame(
+            values,
+            index=pd.DatetimeIndex(self.timestamps[rows].view("datetime64[ns]")),
+            columns=pd.MultiIndex.from_tuples(columns),
+        )
+
+
+def _underlying(log: Any) -> Any:
+    # Wrappers such as WeatherExcludedLog hold the Log they delegate to in ``_log``.
+    while "_log" in getattr(log, "__dict__", {}):
+        log = vars(log)["_log"]
+    return log
+
+
+def attach_arrays(log: Any) -> LogArrays:
+    """The log's arrays, built on first use and shared with session views copied from it afterwards."""
+    log = _underlying(log)
+    arrays = getattr(log, "_arrays", None)
+    if arrays is None or len(arrays) != len(log._master):
+        arrays = LogArrays(log._master)
+        arrays.index_energy(log._antilogs)
+        log._arrays = arrays
+    return arrays
+
+
+def apply_periods(log: Any, times: dict | None = None) -> None:
+    """``Log.set_periods`` using the cached night index instead of a per-row loop."""
+    if times is None:
+        from pycoustic.log import DEFAULT_PERIODS
+
+        times = DEFAULT_PERIODS
+    log = _underlying(log)
+    _, night_idx = attach_arrays(log).periods(times)
+    log._day_start = dt.time(*times["day"])
+    log._evening_start = dt.time(*times["evening"])
+    log._night_start = dt.time(*times["night"])
+    for attr in ("_master", "_antilogs"):
+        # Replaces the column's array rather than writing into it, so frames shared with
+        # other session views keep their own night index.
+        getattr(log, attr)[NIGHT_IDX_COLUMN] = night_idx
+
+
+def set_survey_periods(survey: Any, times: dict) -> None:
+    """``Survey.set_periods`` through ``apply_periods``; each log's labels are reused across calls."""
+    for log in survey._logs.values():
+        apply_periods(log, times)
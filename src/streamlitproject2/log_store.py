@@ -0,0 +1,222 @@
+import copy
+import functools
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable
+
+import pandas as pd
+
+from log_arrays import apply_periods
+
+DEFAULT_MAX_MB = 2048
+
+ParsedLogs = tuple[tuple[str | None, Any], ...]
+
+
+def _env_megabytes(name: str, default: float) -> int:
+    try:
+        return int(float(os.environ.get(name, default)) * 1024 * 1024)
+    except ValueError:
+        return int(default * 1024 * 1024)
+
+
+def default_budget() -> tuple[int, int]:
+    """(process budget, per-session budget) in bytes, from PYCOUSTIC_LOG_CACHE_MB / PYCOUSTIC_LOG_CACHE_SESSION_MB."""
+    max_bytes = _env_megabytes("PYCOUSTIC_LOG_CACHE_MB", DEFAULT_MAX_MB)
+    session_bytes = _env_megabytes("PYCOUSTIC_LOG_CACHE_SESSION_MB", max_bytes / (2 * 1024 * 1024))
+    return max_bytes, min(session_bytes, max_bytes)
+
+
+def log_nbytes(log: Any) -> int:
+    total = 0
+    for getter in ("get_data", "get_antilogs"):
+        try:
+            frame = getattr(log, getter)()
+        except Exception:
+            continue
+        if isinstance(frame, pd.DataFrame):
+            total += int(frame.memory_usage(deep=True, index=True).sum())
+    arrays = getattr(log, "_arrays", None)
+    if arrays is not None:
+        total += arrays.nbytes
+    return total
+
+
+def session_view(log: Any) -> Any:
+    """Per-session Log sharing the stored frames' data.
+
+    Applying survey periods rewrites the Night idx column, so each session
+    gets its own shallow copy of the Log and of its frames; the column blocks
+    themselves stay shared with the cached Log. pycoustic's ``set_periods``
+    drops that column in place, which copies every block, so a view's
+    ``set_periods`` replaces just the column instead.
+    """
+    view = copy.copy(log)
+    for attr in ("_master", "_antilogs"):
+        frame = getattr(log, attr, None)
+        if isinstance(frame, pd.DataFrame):
+            setattr(view, attr, frame.copy(deep=False))
+    view.set_periods = functools.partial(apply_periods, view)
+    return view
+
+
+class LogBudgetError(MemoryError):
+    """Raised when a parsed log does not fit the shared or per-session memory budget."""
+
+
+class _Entry:
+    __slots__ = ("logs", "nbytes", "refs")
+
+    def __init__(self, logs: ParsedLogs, nbytes: int) -> None:
+        self.logs = logs
+        self.nbytes = nbytes
+        self.refs: dict[str, int] = {}
+
+
+class SharedLogStore:
+    """Process-wide cache of parsed logs keyed by file content hash.
+
+    Entries referenced by any session are pinned; unreferenced entries are kept
+    for reuse and evicted least-recently-used first when the total exceeds
+    ``max_bytes``. Each session may pin at most ``max_session_bytes``.
+    """
+
+    def __init__(self, max_bytes: int, max_session_bytes: int | None = None) -> None:
+        self.max_bytes = int(max_bytes)
+        self.max_session_bytes = int(max_session_bytes or max_bytes)
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._parse_locks: dict[str, threading.Lock] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _holder_bytes(self, holder: str) -> int:
+        return sum(entry.nbytes for entry in self._entries.values() if holder in entry.refs)
+
+    def _total_bytes(self) -> int:
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def _evict_for(self, nbytes: int) -> None:
+        total = self._total_bytes()
+        for key in list(self._entries):
+            if total + nbytes <= self.max_bytes:
+                return
+            entry = self._entries[key]
+            if entry.refs:
+                continue
+            del self._entries[key]
+            total -= entry.nbytes
+            self._evictions += 1
+
+    def _reference(self, holder: str, key: str, entry: _Entry) -> ParsedLogs:
+        entry.refs[holder] = entry.refs.get(holder, 0) + 1
+        self._entries.move_to_end(key)
+        return entry.logs
+
+    def acquire(self, holder: str, key: str, parse: Callable[[], ParsedLogs]) -> ParsedLogs:
+        """Return the parsed logs for ``key``, calling ``parse`` only if no session has them cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._hits += 1
+                return self._reference(holder, key, entry)
+            parse_lock = self._parse_locks.setdefault(key, threading.Lock())
+
+        # Concurrent uploads of the same file wait for one parse instead of repeating it.
+        with parse_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._hits += 1
+                    return self._reference(holder, key, entry)
+
+            try:
+                logs = tuple(parse())
+            finally:
+                # Dropped on failure too, so files that fail to parse do not leave locks behind.
+                with self._lock:
+                    self._parse_locks.pop(key, None)
+            nbytes = sum(log_nbytes(log) for _, log in logs)
+
+            with self._lock:
+                self._misses += 1
+                if self._holder_bytes(holder) + nbytes > self.max_session_bytes:
+                    raise LogBudgetError(
+                        f"Loading this file would exceed the per-session log memory budget "
+                        f"({self.max_session_bytes // (1024 * 1024)} MB)."
+                    )
+                self._evict_for(nbytes)
+                if self._total_bytes() + nbytes > self.max_bytes:
+                    raise LogBudgetError(
+                        f"The shared log memory budget ({self.max_bytes // (1024 * 1024)} MB) "
+                        "is in use by other sessions."
+                    )
+                entry = _Entry(logs, nbytes)
+                self._entries[key] = entry
+                return self._reference(holder, key, entry)
+
+    def release(self, holder: str, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or holder not in entry.refs:
+                return
+            entry.refs[holder] -= 1
+            if entry.refs[holder] <= 0:
+                del entry.refs[holder]
+            self._evict_for(0)
+
+    def release_holder(self, holder: str) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                entry.refs.pop(holder, None)
+            self._evict_for(0)
+
+    def held_logs(self, holder: str) -> list[Any]:
+        """The stored Logs ``holder`` references, for counting their data once per process."""
+        with self._lock:
+            return [log for entry in self._entries.values() if holder in entry.refs for _, log in entry.logs]
+
+    def clear_unreferenced(self) -> None:
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if not entry.refs]:
+                del self._entries[key]
+                self._evictions += 1
+
+    def stats(self, holder: str | None = None) -> dict[str, int]:
+        with self._lock:
+            entries = list(self._entries.values())
+            stats = {
+                "entries": len(entries),
+                "bytes": sum(entry.nbytes for entry in entries),
+                "pinned_bytes": sum(entry.nbytes for entry in entries if entry.refs),
+                "sessions": len({holder for entry in entries for holder in entry.refs}),
+                "max_bytes": self.max_bytes,
+                "max_session_bytes": self.max_session_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+            if holder is not None:
+                stats["session_bytes"] = self._holder_bytes(holder)
+            return stats
+
+
+class LogLease:
+    """A session's references into a SharedLogStore, released when the session state is discarded."""
+
+    def __init__(self, store: SharedLogStore, holder: str) -> None:
+        self.store = store
+        self.holder = holder
+        weakref.finalize(self, store.release_holder, holder)
+
+    def acquire(self, key: str, parse: Callable[[], ParsedLogs]) -> ParsedLogs:
+        return self.store.acquire(self.holder, key, parse)
+
+    def release(self, key: str) -> None:
+        self.store.release(self.holder, key)
+
+    def release_all(self) -> None:
+        self.store.release_holder(self.holder)
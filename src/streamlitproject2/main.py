@@ -1,25 +1,57 @@
-import streamlit as st
+import importlib
+import os
 
-from st_config import build_combined_csv_with_sections, init_app_state
-from page_1 import config_page
-from page_2 import analysis_page
-from page_3 import vis_page
-from page_4 import weather_page
+import streamlit as st
 
+from st_config import (
+    build_bundle_export,
+    build_combined_csv_export,
+    build_workbook_export,
+    bundle_export_available,
+    combined_csv_export_key,
+    init_app_state,
+    render_lazy_download,
+    render_stage_timings,
+    start_analysis_api,
+    tables_export_key,
+    timed_stage,
+    workbook_export_available,
+)
 ss = init_app_state()
+ss["stage_timer"].begin_rerun(
+    enabled=ss.get("stage_timing_enabled", False) or ss.get("stage_memory_enabled", False),
+    trace_memory=ss.get("stage_memory_enabled", False),
+)
+
+
+def _lazy_page(module_name: str, function_name: str):
+    """Page callable that imports its module (and its plotly/weather dependencies) on first visit."""
+
+    def _page() -> None:
+        getattr(importlib.import_module(module_name), function_name)()
+
+    # st.Page derives the URL path from the callable's name.
+    _page.__name__ = _page.__qualname__ = function_name
+    return _page
+
+
+# Optional HTTP analysis API for other tools, served alongside the app.
+if os.environ.get("PYCOUSTIC_API_PORT"):
+    start_analysis_api(int(os.environ["PYCOUSTIC_API_PORT"]))
 
 st.set_page_config(page_title="Pycoustic Acoustic Survey Analyser", layout="wide")
 
 pg = st.navigation(
     [
-        st.Page(config_page, title="Data Loader"),
-        st.Page(analysis_page, title="Analysis"),
-        st.Page(vis_page, title="Visualisation"),
-        st.Page(weather_page, title="Weather"),
+        st.Page(_lazy_page("page_1", "config_page"), title="Data Loader"),
+        st.Page(_lazy_page("page_2", "analysis_page"), title="Analysis"),
+        st.Page(_lazy_page("page_3", "vis_page"), title="Visualisation"),
+        st.Page(_lazy_page("page_4", "weather_page"), title="Weather"),
     ]
 )
+ss["stage_timer"].set_label(pg.title)
 
-with st.sidebar:
+with st.sidebar, timed_stage("sidebar exports"):
     st.caption(
         "This tool is a work in progress and may produce errors. "
         "Check results manually and use with care."
@@ -27,38 +59,86 @@ with st.sidebar:
 
     any_data = bool(ss.get("logs"))
 
-    times = ss.get("times") or {}
-    modal_params = ss.get("modal_params") or [("L90", "A"), "60min", "60min", "15min"]
-
-    csv_bytes = build_combined_csv_with_sections(
-        ss.get("broadband_df"),
-        ss.get("leq_df"),
-        ss.get("lmax_df"),
-        ss.get("modal_df"),
-        ss.get("counts"),
-        day_start=times.get("day"),
-        evening_start=times.get("evening"),
-        night_start=times.get("night"),
-        lmax_n=ss.get("lmax_n"),
-        lmax_t=ss.get("lmax_t"),
-        modal_param=modal_params[0],
-        day_t=modal_params[1],
-        evening_t=modal_params[2],
-        night_t=modal_params[3],
-    )
-
-    st.download_button(
-        label="Download all tables (CSV)",
-        data=csv_bytes,
+    render_lazy_download(
+        "all_tables_csv",
+        combined_csv_export_key(),
+        build_combined_csv_export,
+        prepare_label="Prepare all tables (CSV)",
+        download_label="Download all tables (CSV)",
         file_name="pycoustic-analysis-tables.csv",
         mime="text/csv",
-        key="dl_all_tables_csv",
         disabled=not any_data,
-        width='stretch',
         help=(
             "Exports all summary tables into one CSV file with section headers "
-            "and full multi-row column headers where applicable."
+            "and full multi-row column headers where applicable. "
+            "The file is rebuilt only when the tables change."
         ),
     )
 
-pg.run()
\ No newline at end of file
+    with st.expander("More exports"):
+        include_resampled = st.toggle(
+            "Include resampled logs",
+            value=False,
+            key="bundle_include_resampled",
+        )
+        bundle_minutes = st.selectbox(
+            "Resample period (minutes)",
+            options=[1, 2, 5, 10, 15, 30, 60, 120],
+            index=4,
+            key="bundle_resample_minutes",
+            disabled=not include_resampled,
+        )
+        bundle_interval = f"{bundle_minutes}min"
+        bundle_ready = bundle_export_available()
+
+        render_lazy_download(
+            "analysis_bundle",
+            tables_export_key(include_resampled, bundle_interval),
+            lambda: build_bundle_export(include_resampled, bundle_interval),
+            prepare_label="Prepare bundle (Parquet zip)",
+            download_label="Download bundle (Parquet zip)",
+            file_name="pycoustic-analysis-bundle.zip",
+            mime="application/zip",
+            disabled=not (any_data and bundle_ready),
+            help=(
+                "Zip of compressed Parquet tables with exact multi-level headers and a JSON "
+                "manifest of the analysis parameters."
+                if bundle_ready
+                else "Install pyarrow to enable Parquet bundle exports."
+            ),
+        )
+
+        workbook_ready = workbook_export_available()
+        render_lazy_download(
+            "analysis_workbook",
+            tables_export_key(include_resampled, bundle_interval),
+            lambda: build_workbook_export(include_resampled, bundle_interval),
+            prepare_label="Prepare workbook (Excel)",
+            download_label="Download workbook (Excel)",
+            file_name="pycoustic-analysis-tables.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            disabled=not (any_data and workbook_ready),
+            help=(
+                "One sheet per summary table, with multi-row column headers."
+                if workbook_ready
+                else "Install xlsxwriter to enable Excel workbook exports."
+            ),
+        )
+
+with st.sidebar.expander("Stage timings"):
+    st.toggle(
+        "Time this session's reruns",
+        key="stage_timing_enabled",
+        help="Records how long each stage of a rerun takes, e.g. building the survey, resampling and figures.",
+    )
+    timing_panel = st.container()
+
+try:
+    with timed_stage(f"page:{pg.title}"):
+        pg.run()
+finally:
+    ss["stage_timer"].end_rerun()
+
+# Not reached when the page calls st.stop(); those reruns are still in the JSON export.
+with timing_panel:
+    render_stage_timings()
@@ -0,0 +1,179 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _root_array(values: np.ndarray) -> np.ndarray:
+    while isinstance(values.base, np.ndarray):
+        values = values.base
+    return values
+
+
+def _column_size(column: pd.Series, seen: set[int]) -> int:
+    values = column.values
+    if not isinstance(values, np.ndarray):
+        return int(column.memory_usage(deep=True, index=False))
+    root = _root_array(values)
+    if id(root) in seen:
+        return 0
+    seen.add(id(root))
+    size = root.nbytes
+    if values.dtype == object:
+        size += int(column.memory_usage(deep=True, index=False)) - values.nbytes
+    return size
+
+
+def deep_size(obj: Any, _seen: set[int] | None = None) -> int:
+    """Approximate bytes held by ``obj`` and everything it references, counting each object once.
+
+    Frames and arrays report their buffers (object columns included); a buffer
+    shared by several frames, such as a block kept by a shallow copy, counts
+    once. Containers and plain objects (such as pycoustic Logs) are walked
+    through their items, ``__dict__`` and ``__slots__``.
+    """
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, pd.Series):
+        return deep_size(obj.index, seen) + _column_size(obj, seen)
+    if isinstance(obj, pd.DataFrame):
+        size = deep_size(obj.index, seen) + deep_size(obj.columns, seen)
+        return size + sum(_column_size(obj.iloc[:, idx], seen) for idx in range(obj.shape[1]))
+    if isinstance(obj, pd.Index):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        root = _root_array(obj)
+        if root is obj:
+            return int(obj.nbytes)
+        if id(root) in seen:
+            return 0
+        seen.add(id(root))
+        return int(root.nbytes)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return len(obj) if not isinstance(obj, memoryview) else obj.nbytes
+    if isinstance(obj, (str, int, float, bool, type(None))):
+        return sys.getsizeof(obj)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, Mapping):
+        for key, value in list(obj.items()):
+            size += deep_size(key, seen) + deep_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in list(obj):
+            size += deep_size(item, seen)
+    else:
+        if hasattr(obj, "__dict__") and not isinstance(obj, type):
+            size += deep_size(vars(obj), seen)
+        for slot in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, slot):
+                size += deep_size(getattr(obj, slot), seen)
+    return size
+
+
+def session_report(
+        state: Mapping[str, Any],
+        *,
+        table_keys: Iterable[str],
+        cache_keys: Iterable[str],
+        shared_logs: Iterable[str] = (),
+        shared_data: Iterable[Any] = (),
+) -> dict:
+    """Bytes per loaded log, staged upload, cached table and cache in one session's state.
+
+    Objects are counted once, in that order, so a cache entry that wraps a loaded
+    log only adds what it holds on top of it. Data held by the process-wide log
+    store (``shared_data``) is counted there, once per process, so a log named in
+    ``shared_logs`` reports only this session's overhead, such as its own Night
+    idx column.
+    """
+    shared = set(shared_logs)
+    seen: set[int] = set()
+    for obj in shared_data:
+        deep_size(obj, seen)
+    logs = {
+        name: {"bytes": deep_size(log, seen), "shared": name in shared}
+        for name, log in (state.get("logs") or {}).items()
+    }
+    pending = sum(len(item.get("data", b"")) for item in state.get("pending_uploads") or [])
+    tables = {key: deep_size(state.get(key), seen) for key in table_keys if state.get(key) is not None}
+    caches = {key: deep_size(state.get(key), seen) for key in cache_keys if state.get(key) is not None}
+    return {
+        "logs": logs,
+        "pending_uploads": pending,
+        "tables": tables,
+        "caches": caches,
+        "total": sum(entry["bytes"] for entry in logs.values()) + pending + sum(tables.values()) + sum(caches.values()),
+    }
+
+
+def process_memory() -> dict[str, int | None]:
+    """Resident set size of this process now and at its peak, where the platform reports them."""
+    rss = None
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            rss = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    peak = None
+    if resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes.
+        peak = int(maxrss if sys.platform == "darwin" else maxrss * 1024)
+
+    traced = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+    return {"rss_bytes": rss, "peak_rss_bytes": peak, "traced_bytes": traced[0], "traced_peak_bytes": traced[1]}
+
+
+class MemoryRegistry:
+    """Latest memory report of each live session in this process, for admin totals.
+
+    Session totals exclude logs shared through the parsed-log store, which reports
+    them once for the process. Sessions publish when their Data Loader memory panel is shown; an entry is
+    dropped when its owner object (one per session) is garbage collected.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._reports: dict[str, dict] = {}
+
+    def publish(self, holder: str, report: dict, owner: Any) -> None:
+        with self._lock:
+            if holder not in self._reports:
+                weakref.finalize(owner, self.discard, holder)
+            self._reports[holder] = {
+                "total": report["total"],
+                "logs": len(report["logs"]),
+                "updated": time.time(),
+            }
+
+    def discard(self, holder: str) -> None:
+        with self._lock:
+            self._reports.pop(holder, None)
+
+    def totals(self) -> dict:
+        with self._lock:
+            reports = dict(self._reports)
+        return {
+            "sessions": len(reports),
+            "bytes": sum(report["total"] for report in reports.values()),
+            "largest": sorted(
+                ({"session": holder, **report} for holder, report in reports.items()),
+                key=lambda entry: entry["total"],
+                reverse=True,
+            )[:10],
+        }
@@ -1,5 +1,7 @@
 import datetime as dt
+import io
 
+import pandas as pd
 import streamlit as st
 
 from st_config import (
@@ -8,14 +10,169 @@ from st_config import (
     _get_template_dataframe,
     _render_upload_modal_contents,
     _reset_workspace,
+    _format_bytes,
     default_times,
     init_app_state,
+    is_admin,
     parse_times,
+    process_memory_report,
+    build_workspace_snapshot,
+    bundle_export_available,
+    compute_summary_tables,
+    publish_table,
+    render_job_status,
+    render_import_status,
+    render_lazy_download,
+    restore_workspace_snapshot,
+    session_memory_report,
+    session_table_calls,
+    table_is_current,
+    table_signature,
+    workspace_snapshot_key,
 )
 
 ss = init_app_state()
 
 
+def _load_workspace() -> None:
+    uploaded = ss.get("workspace_upload")
+    if uploaded is None:
+        return
+    try:
+        restored = restore_workspace_snapshot(io.BytesIO(uploaded.getvalue()))
+        ss["workspace_message"] = ("success", f"Workspace restored with {restored} log(s).")
+    except Exception as exc:
+        ss["workspace_message"] = ("error", f"Failed to load workspace: {exc}")
+
+
+def _toggle_stage_memory() -> None:
+    # Kept outside the widget key so tracing stays on while other pages are open.
+    ss["stage_memory_enabled"] = ss["stage_memory_toggle"]
+
+
+def _size_or_dash(num_bytes) -> str:
+    return "—" if num_bytes is None else _format_bytes(int(num_bytes))
+
+
+def _render_memory_panel() -> None:
+    with st.expander("Memory", expanded=False):
+        st.toggle(
+            "Measure peak memory per stage",
+            value=ss.get("stage_memory_enabled", False),
+            key="stage_memory_toggle",
+            on_change=_toggle_stage_memory,
+            help=(
+                "Traces allocations with tracemalloc while timed stages run on any page. "
+                "This slows computations noticeably; switch it off when done."
+            ),
+        )
+        if not st.toggle("Show session memory", value=False, key="memory_panel_enabled"):
+            st.caption("Sizes are measured on demand, as walking every cached frame takes time.")
+            return
+
+        report = session_memory_report()
+        metric_cols = st.columns(4)
+        metric_cols[0].metric("Session total", _format_bytes(report["total"]))
+        metric_cols[1].metric("Logs", _format_bytes(sum(entry["bytes"] for entry in report["logs"].values())))
+        metric_cols[2].metric("Tables", _format_bytes(sum(report["tables"].values())))
+        metric_cols[3].metric("Caches", _format_bytes(sum(report["caches"].values()) + report["pending_uploads"]))
+
+        rows = [
+            ("Log", name, entry["bytes"], "shared; this session's own data only" if entry["shared"] else "")
+            for name, entry in report["logs"].items()
+        ]
+        rows.append(("Staged uploads", "pending_uploads", report["pending_uploads"], ""))
+        rows += [("Table", key, size, "") for key, size in report["tables"].items()]
+        rows += [("Cache", key, size, "") for key, size in report["caches"].items()]
+        st.dataframe(
+            pd.DataFrame(
+                {
+                    "Kind": [row[0] for row in rows],
+                    "Item": [row[1] for row in rows],
+                    "MB": [round(row[2] / 1024 ** 2, 2) for row in rows],
+                    "Note": [row[3] for row in rows],
+                }
+            ).sort_values("MB", ascending=False),
+            hide_index=True,
+            width='stretch',
+        )
+        st.caption(
+            "Logs shared through the parsed-log cache count only what this session adds, such as its period index; "
+            "their data is held, and counted, once per process in the cache."
+        )
+
+        peaks = ss["stage_timer"].peak_memory()
+        if peaks:
+            st.markdown("**Peak allocations by stage** (recent reruns)")
+            st.dataframe(
+                pd.DataFrame(
+                    {"Stage": list(peaks), "Peak MB": [round(value / 1024 ** 2, 2) for value in peaks.values()]}
+                ).sort_values("Peak MB", ascending=False),
+                hide_index=True,
+                width='stretch',
+            )
+        elif ss.get("stage_memory_enabled"):
+            st.caption("Peaks appear here after the next computations on any page.")
+
+        if is_admin():
+            process = process_memory_report()
+            st.markdown("**Process (admin)**")
+            admin_cols = st.columns(4)
+            admin_cols[0].metric("Resident", _size_or_dash(process["process"]["rss_bytes"]))
+            admin_cols[1].metric("Peak resident", _size_or_dash(process["process"]["peak_rss_bytes"]))
+            admin_cols[2].metric("Parsed-log cache", _format_bytes(process["log_store"]["bytes"]))
+            admin_cols[3].metric(
+                "Sessions (own data)",
+                f"{process['sessions']['sessions']} · {_format_bytes(process['sessions']['bytes'])}",
+            )
+            st.dataframe(
+                pd.DataFrame(process["sessions"]["largest"]).assign(
+                    MB=lambda df: (df["total"] / 1024 ** 2).round(2),
+                    updated=lambda df: pd.to_datetime(df["updated"], unit="s"),
+                )[["session", "logs", "MB", "updated"]],
+                hide_index=True,
+                width='stretch',
+            )
+            st.json(process, expanded=False)
+
+
+def _render_workspace_controls() -> None:
+    with st.expander("Workspace", expanded=False):
+        if not bundle_export_available():
+            st.info("Saving and loading workspaces needs the optional `pyarrow` package.")
+            return
+
+        st.caption(
+            "Save loaded logs, period and analysis settings, weather data and computed tables to one file, "
+            "and load it later without re-importing the original files."
+        )
+        save_col, load_col = st.columns(2)
+        with save_col:
+            render_lazy_download(
+                "workspace",
+                workspace_snapshot_key(),
+                build_workspace_snapshot,
+                prepare_label="Prepare workspace file",
+                download_label="Save workspace",
+                file_name="pycoustic-workspace.zip",
+                mime="application/zip",
+                disabled=not ss["logs"],
+            )
+        with load_col:
+            st.file_uploader("Workspace file", type=["zip"], key="workspace_upload")
+            st.button(
+                "Load workspace",
+                key="workspace_load",
+                on_click=_load_workspace,
+                disabled=ss.get("workspace_upload") is None,
+                width='stretch',
+            )
+
+        message = ss.pop("workspace_message", None)
+        if message is not None:
+            getattr(st, message[0])(message[1])
+
+
 def config_page() -> None:
     st.title("Pycoustic Acoustic Survey Analyser")
     st.markdown(
@@ -65,7 +222,7 @@ def config_page() -> None:
     with action_cols[1]:
         st.download_button(
             label="Download template CSV",
-            data=_convert_for_download(template_df),
+            data=_convert_for_download(template_df, "template"),
             file_name="pycoustic-template.csv",
             mime="text/csv",
             icon=":material/download:",
@@ -81,9 +238,13 @@ def config_page() -> None:
     ):
         _reset_workspace()
 
+    _render_workspace_controls()
+    _render_memory_panel()
+
     st.divider()
 
     ss.setdefault("show_upload_modal", False)
+    render_import_status()
 
     if ss.get("show_upload_modal", False):
 
@@ -143,64 +304,48 @@ def config_page() -> None:
     if not selected_logs:
         selected_logs = list(ss["logs"].keys())
 
-    survey = _build_survey(times=times, log_names=selected_logs)
+    # No survey until a log is loaded; building one imports pycoustic.
+    survey = _build_survey(times=times, log_names=selected_logs) if ss["logs"] else None
     ss["survey"] = survey
 
     if ss["logs"]:
-        try:
-            ss["broadband_df"] = survey.broadband_summary(
-                lmax_n=int(ss["lmax_n"]),
-                lmax_t=f"{int(ss['lmax_t'])}min",
-            )
-        except Exception:
-            ss["broadband_df"] = None
-
-        try:
-            ss["leq_df"] = survey.leq_spectra()
-        except Exception:
-            ss["leq_df"] = None
-
-        try:
-            ss["lmax_df"] = survey.lmax_spectra(
-                n=int(ss["lmax_n"]),
-                t=f"{int(ss['lmax_t'])}min",
-                period="nights",
-            )
-        except Exception:
-            ss["lmax_df"] = None
-
-        try:
-            modal_param, day_t, evening_t, night_t = ss["modal_params"]
-            ss["modal_df"] = survey.modal(
-                cols=[modal_param],
-                by_date=False,
-                day_t=day_t,
-                evening_t=evening_t,
-                night_t=night_t,
-                averaging=ss.get("l90_averaging", "log"),
-                ln_averaging=ss.get("l90_averaging", "log"),
-            )
-        except Exception:
-            ss["modal_df"] = None
-
-        try:
-            modal_param, day_t, evening_t, night_t = ss["modal_params"]
-            ss["counts"] = survey.counts(
-                cols=[modal_param],
-                day_t=day_t,
-                evening_t=evening_t,
-                night_t=night_t,
-                averaging=ss.get("l90_averaging", "log"),
-                ln_averaging=ss.get("l90_averaging", "log"),
-            )
-        except Exception:
-            ss["counts"] = None
+        calls = session_table_calls()
+        signatures = {key: table_signature(method, selected_logs, **kwargs) for key, (method, kwargs) in calls.items()}
+
+        # Tables restored from a workspace, or unchanged since the last run, are not recomputed.
+        stale = {key: call for key, call in calls.items() if not table_is_current(key, signatures[key])}
+        if stale:
+            job_key = tuple(signatures[key] for key in stale)
+            job = ss["jobs"].get("summary_tables", job_key)
+            if job is None:
+                job = ss["jobs"].submit(
+                    "summary_tables",
+                    job_key,
+                    compute_summary_tables,
+                    _build_survey(log_names=selected_logs, detached=True),
+                    times,
+                    stale,
+                    session_id=ss["session_id"],
+                )
+
+            if job.status == "done":
+                for step, seconds in job.stages.items():
+                    ss["stage_timer"].record(f"job:summary_tables.{step}", seconds)
+                for key, df in job.result.items():
+                    publish_table(key, df, signatures[key])
+                ss["jobs"].discard("summary_tables")
+            elif job.status == "cancelled":
+                st.warning("Summary table computation was cancelled.")
+                if st.button("Restart computation", key="summary_tables_restart"):
+                    ss["jobs"].discard("summary_tables")
+                    st.rerun()
+            elif job.status == "failed":
+                st.error(f"Summary table computation failed: {job.error}")
+            else:
+                render_job_status(job, cancel_key="summary_tables_cancel")
     else:
-        ss["broadband_df"] = None
-        ss["leq_df"] = None
-        ss["lmax_df"] = None
-        ss["modal_df"] = None
-        ss["counts"] = None
+        for key in ["broadband_df", "leq_df", "lmax_df", "modal_df", "counts"]:
+            publish_table(key, None, table_signature(key))
 
     with st.expander("Maintenance", expanded=True):
         st.markdown(
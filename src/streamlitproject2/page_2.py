@@ -1,11 +1,68 @@
 import pandas as pd
 import streamlit as st
 
-from st_config import _build_survey, init_app_state, to_csv_preserve_multiheader
+from st_config import (
+    _build_survey,
+    compute_summary_tables,
+    init_app_state,
+    publish_table,
+    render_job_status,
+    session_table_calls,
+    table_csv,
+    table_is_current,
+    table_signature,
+    traced_stage,
+)
 
 ss = init_app_state()
 
 
+def _all_log_peaks(ctx, survey, log_names: list[str], **kwargs) -> list[pd.DataFrame]:
+    """Peaks of each log for the combined CSV, tagged with a "Log" column. Runs as a job."""
+    peaks = []
+    for done, name in enumerate(log_names):
+        ctx.progress(done / len(log_names), f"Picking peaks in {name}")
+        try:
+            with ctx.stage("peak_picker"):
+                pk, _ = survey.peak_picker(log_name=name, **kwargs)
+        except Exception:
+            continue
+        if not pk.empty:
+            pk = pk.rename_axis("Timestamp")
+            pk["Log"] = name
+            peaks.append(pk)
+    return peaks
+
+
+def _analysis_tables(ctx, survey, times, calls: dict, session_id: str | None = None) -> tuple[dict, dict]:
+    """The given survey tables and their errors. Runs as a job."""
+    errors = {}
+    return compute_summary_tables(ctx, survey, times, calls, session_id=session_id, errors=errors), errors
+
+
+def _render_table(key: str, signature: tuple, what: str, file_name: str, download_key: str) -> None:
+    """A published table and its CSV download, once it is current for ``signature``."""
+    if not table_is_current(key, signature):
+        st.caption(f"Computing {what}…")
+        return
+    df = ss.get(key)
+    error = ss.get("analysis_table_errors", {}).get(key)
+    if df is not None and not df.empty:
+        st.dataframe(df, width='stretch')
+    elif error is not None and error[0] == signature and error[1]:
+        st.error(f"Failed to compute {what}: {error[1]}")
+    else:
+        st.info(f"No {what} data available for the selected logs and settings.")
+
+    st.download_button(
+        "Download CSV (full headers)",
+        data=table_csv(key),
+        file_name=file_name,
+        mime="text/csv",
+        key=download_key,
+    )
+
+
 def analysis_page() -> None:
     st.title("Analysis")
     st.markdown(
@@ -38,6 +95,7 @@ def analysis_page() -> None:
     ss["survey"] = survey
 
     st.subheader("Summary datasets")
+    job_status = st.container()
 
     summary_tabs = st.tabs(
         [
@@ -72,53 +130,12 @@ def analysis_page() -> None:
                 key="bb_lmax_t",
             )
 
-        try:
-            df = survey.broadband_summary(
-                lmax_n=int(ss["lmax_n"]),
-                lmax_t=f"{int(ss['lmax_t'])}min",
-            )
-            ss["broadband_df"] = df
-            if df is not None and not df.empty:
-                st.dataframe(df, width='stretch')
-            else:
-                st.info("No broadband summary data available for the selected logs.")
-        except Exception as exc:
-            st.error(f"Failed to compute broadband summary: {exc}")
-            ss["broadband_df"] = None
-
-        st.download_button(
-            "Download CSV (full headers)",
-            data=to_csv_preserve_multiheader(ss.get("broadband_df")),
-            file_name="broadband_summary.csv",
-            mime="text/csv",
-            key="dl_broadband_csv",
-        )
-
     with summary_tabs[1]:
         st.subheader("Leq Spectra")
         st.caption(
             "This computes the combined Leq for each period over the whole survey, rather than separate values by date."
         )
 
-        try:
-            df = survey.leq_spectra()
-            ss["leq_df"] = df
-            if df is not None and not df.empty:
-                st.dataframe(df, width='stretch')
-            else:
-                st.info("No Leq spectra data available for the selected logs.")
-        except Exception as exc:
-            st.error(f"Failed to compute Leq spectra: {exc}")
-            ss["leq_df"] = None
-
-        st.download_button(
-            "Download CSV (full headers)",
-            data=to_csv_preserve_multiheader(ss.get("leq_df")),
-            file_name="leq_spectra.csv",
-            mime="text/csv",
-            key="dl_leq_csv",
-        )
-
     with summary_tabs[2]:
         st.subheader("Lmax Spectra")
         st.caption(
@@ -158,29 +175,6 @@ def analysis_page() -> None:
         if period_label == "evenings" and ss["times"]["evening"] == ss["times"]["night"]:
             st.info("Evenings are currently disabled. Set different evening and night start times to enable them.")
 
-        try:
-            df = survey.lmax_spectra(
-                n=int(nth),
-                t=f"{int(t_int)}min",
-                period=period_label,
-            )
-            ss["lmax_df"] = df
-            if df is not None and not df.empty:
-                st.dataframe(df, width='stretch')
-            else:
-                st.info("No Lmax spectra data available for the selected logs and settings.")
-        except Exception as exc:
-            st.error(f"Failed to compute Lmax spectra: {exc}")
-            ss["lmax_df"] = None
-
-        st.download_button(
-            "Download CSV (full headers)",
-            data=to_csv_preserve_multiheader(ss.get("lmax_df")),
-            file_name="lmax_spectra.csv",
-            mime="text/csv",
-            key="dl_lmax_csv",
-        )
-
     with summary_tabs[3]:
         st.subheader("Modal and Value Counts")
 
@@ -247,12 +241,22 @@ def analysis_page() -> None:
             else:
                 st.caption("Upload logs to see available columns.")
                 parameter_col = ("L90", "A")
+        _interval_options = [1, 2, 5, 10, 15, 30, 60, 120]
+
+        def _interval_index(current: str, default: int) -> int:
+            # Start from the session's intervals, so both pages describe the same tables.
+            try:
+                return _interval_options.index(int(str(current).removesuffix("min")))
+            except ValueError:
+                return default
+
+        _, _cur_day_t, _cur_evening_t, _cur_night_t = ss["modal_params"]
         with c2:
-            day_t = f"{st.selectbox('Daytime interval (minutes)', [1, 2, 5, 10, 15, 30, 60, 120], index=6, key='modal_day_t')}min"
+            day_t = f"{st.selectbox('Daytime interval (minutes)', _interval_options, index=_interval_index(_cur_day_t, 6), key='modal_day_t')}min"
         with c3:
-            evening_t = f"{st.selectbox('Evening interval (minutes)', [1, 2, 5, 10, 15, 30, 60, 120], index=6, key='modal_evening_t')}min"
+            evening_t = f"{st.selectbox('Evening interval (minutes)', _interval_options, index=_interval_index(_cur_evening_t, 6), key='modal_evening_t')}min"
         with c4:
-            night_t = f"{st.selectbox('Night interval (minutes)', [1, 2, 5, 10, 15, 30, 60, 120], index=4, key='modal_night_t')}min"
+            night_t = f"{st.selectbox('Night interval (minutes)', _interval_options, index=_interval_index(_cur_night_t, 4), key='modal_night_t')}min"
 
         ss["modal_params"] = [parameter_col, day_t, evening_t, night_t]
 
@@ -277,60 +281,62 @@ def analysis_page() -> None:
                 )
                 ss["counts_all_t"] = f"{_all_t_min}min"
 
-        st.markdown("### Modal")
-        try:
-            modal_df = survey.modal(
-                cols=[parameter_col],
-                by_date=False,
-                day_t=day_t,
-                evening_t=evening_t,
-                night_t=night_t,
-                include_all=include_all,
-                all_t=ss.get("counts_all_t", "15min"),
-            )
-            ss["modal_df"] = modal_df
-            if modal_df is not None and not modal_df.empty:
-                st.dataframe(modal_df, width='stretch')
+    # The same calls as the Data Loader, so both pages agree on these tables' signatures;
+    # only the Lmax spectra take this page's own settings.
+    calls = session_table_calls()
+    calls["lmax_df"] = ("lmax_spectra", dict(n=int(nth), t=f"{int(t_int)}min", period=period_label))
+    signatures = {key: table_signature(method, selected_logs, **kwargs) for key, (method, kwargs) in calls.items()}
+
+    # Tables computed on either page, or unchanged since the last run, are shown as published.
+    stale = {key: call for key, call in calls.items() if not table_is_current(key, signatures[key])}
+    with job_status:
+        if stale:
+            job_key = tuple(signatures[key] for key in stale)
+            job = ss["jobs"].get("analysis_tables", job_key)
+            if job is None:
+                job = ss["jobs"].submit(
+                    "analysis_tables",
+                    job_key,
+                    _analysis_tables,
+                    _build_survey(log_names=selected_logs, detached=True),
+                    period_times,
+                    stale,
+                    session_id=ss["session_id"],
+                )
+
+            if job.status == "done":
+                for step, seconds in job.stages.items():
+                    ss["stage_timer"].record(f"job:analysis_tables.{step}", seconds)
+                tables, errors = job.result
+                table_errors = ss.setdefault("analysis_table_errors", {})
+                for key, df in tables.items():
+                    publish_table(key, df, signatures[key])
+                    table_errors[key] = (signatures[key], errors.get(key))
+                ss["jobs"].discard("analysis_tables")
+            elif job.status == "cancelled":
+                st.warning("Analysis table computation was cancelled.")
+                if st.button("Restart computation", key="analysis_tables_restart"):
+                    ss["jobs"].discard("analysis_tables")
+                    st.rerun()
+            elif job.status == "failed":
+                st.error(f"Analysis table computation failed: {job.error}")
             else:
-                st.info("No modal data available for the selected logs and settings.")
-        except Exception as exc:
-            st.error(f"Failed to compute modal values: {exc}")
-            ss["modal_df"] = None
-
-        st.download_button(
-            "Download CSV (full headers)",
-            data=to_csv_preserve_multiheader(ss.get("modal_df")),
-            file_name="modal.csv",
-            mime="text/csv",
-            key="dl_modal_csv",
-        )
+                render_job_status(job, cancel_key="analysis_tables_cancel")
+
+    with summary_tabs[0]:
+        _render_table("broadband_df", signatures["broadband_df"], "broadband summary", "broadband_summary.csv", "dl_broadband_csv")
+
+    with summary_tabs[1]:
+        _render_table("leq_df", signatures["leq_df"], "Leq spectra", "leq_spectra.csv", "dl_leq_csv")
 
+    with summary_tabs[2]:
+        _render_table("lmax_df", signatures["lmax_df"], "Lmax spectra", "lmax_spectra.csv", "dl_lmax_csv")
+
+    with summary_tabs[3]:
+        st.markdown("### Modal")
+        _render_table("modal_df", signatures["modal_df"], "modal", "modal.csv", "dl_modal_csv")
         st.markdown("### Counts")
-        try:
-            counts_df = survey.counts(
-                cols=[parameter_col],
-                day_t=day_t,
-                evening_t=evening_t,
-                night_t=night_t,
-                include_all=include_all,
-                all_t=ss.get("counts_all_t", "15min"),
-            )
-            ss["counts"] = counts_df
-            if counts_df is not None and not counts_df.empty:
-                st.dataframe(counts_df, width='stretch')
-            else:
-                st.info("No counts data available for the selected logs and settings.")
-        except Exception as exc:
-            st.error(f"Failed to compute counts: {exc}")
-            ss["counts"] = None
-
-        st.download_button(
-            "Download CSV (full headers)",
-            data=to_csv_preserve_multiheader(ss.get("counts")),
-            file_name="counts.csv",
-            mime="text/csv",
-            key="dl_counts_csv",
-        )
+        _render_table("counts", signatures["counts"], "counts", "counts.csv", "dl_counts_csv")
 
     with summary_tabs[4]:
         st.subheader("Peak Picker")
@@ -417,13 +423,14 @@ def analysis_page() -> None:
 
                         survey = ss.get("survey")
                         if survey is not None:
-                            peaks_df, history = survey.peak_picker(
-                                log_name=selected_log,
-                                pivot_col=pivot_col,
-                                k=int(k_val),
-                                high=(high_low == "Highest"),
-                                exclusion_zone_s=exclusion_zone,
-                            )
+                            with traced_stage("survey.peak_picker", survey, k=int(k_val), log=selected_log):
+                                peaks_df, history = survey.peak_picker(
+                                    log_name=selected_log,
+                                    pivot_col=pivot_col,
+                                    k=int(k_val),
+                                    high=(high_low == "Highest"),
+                                    exclusion_zone_s=exclusion_zone,
+                                )
 
                             if not peaks_df.empty:
                                 st.subheader("Time history with peaks")
@@ -481,49 +488,65 @@ def analysis_page() -> None:
                                 display_df = peaks_df[display_cols] if display_cols else peaks_df
                                 st.dataframe(display_df, width='stretch')
 
-                                # Build combined peaks across ALL logs for download
-                                survey_in = ss.get("survey")
-                                all_peaks_list = []
-                                if survey_in is not None:
-                                    for name in ss["logs"].keys():
-                                        try:
-                                            pk, _ = survey_in.peak_picker(
-                                                log_name=name,
-                                                pivot_col=pivot_col,
-                                                k=int(k_val),
-                                                high=(high_low == "Highest"),
-                                                exclusion_zone_s=exclusion_zone,
-                                            )
-                                            if not pk.empty:
-                                                pk = pk.rename_axis("Timestamp")
-                                                pk["Log"] = name
-                                                all_peaks_list.append(pk)
-                                        except Exception:
-                                            pass
-
-                                if all_peaks_list:
-                                    combined_peaks = pd.concat(all_peaks_list)
-                                else:
-                                    combined_peaks = peaks_df.copy()
-                                    combined_peaks = combined_peaks.rename_axis("Timestamp")
-                                    combined_peaks["Log"] = selected_log
-
-                                # Reorder combined_peaks columns to match display column order
-                                                                # so that the CSV mirrors the table grouping.
-                                # "Log" will naturally be picked up by extra_cols since
-                                # it's not in display_cols or drop_cols_set.
-                                existing_display = [c for c in display_cols if c in combined_peaks.columns]
-                                extra_cols = [c for c in combined_peaks.columns if c not in display_cols and c not in drop_cols_set]
-                                ordered_cols = existing_display + extra_cols
-                                combined_peaks = combined_peaks[ordered_cols]
-
-                                st.download_button(
-                                    "Download peaks CSV (all logs)",
-                                    data=to_csv_preserve_multiheader(combined_peaks),
-                                    file_name="peak_picker.csv",
-                                    mime="text/csv",
-                                    key="dl_peak_csv",
+                                # Combined peaks across all analysed logs for download, picked in a background job.
+                                peak_kwargs = dict(
+                                    pivot_col=pivot_col,
+                                    k=int(k_val),
+                                    high=(high_low == "Highest"),
+                                    exclusion_zone_s=exclusion_zone,
+                                )
+                                signature = table_signature(
+                                    "peak_picker", selected_logs, selected_log=selected_log, **peak_kwargs
                                 )
+                                if not table_is_current("peak_picker_df", signature):
+                                    job = ss["jobs"].get("peak_picker", signature)
+                                    if job is None:
+                                        job = ss["jobs"].submit(
+                                            "peak_picker",
+                                            signature,
+                                            _all_log_peaks,
+                                            _build_survey(times=ss.get("times"), log_names=selected_logs, detached=True),
+                                            selected_logs,
+                                            **peak_kwargs,
+                                        )
+
+                                    if job.status == "done":
+                                        for step, seconds in job.stages.items():
+                                            ss["stage_timer"].record(f"job:peak_picker.{step}", seconds)
+                                        if job.result:
+                                            combined_peaks = pd.concat(job.result)
+                                        else:
+                                            combined_peaks = peaks_df.copy()
+                                            combined_peaks = combined_peaks.rename_axis("Timestamp")
+                                            combined_peaks["Log"] = selected_log
+
+                                        # Reorder combined_peaks columns to match display column order
+                                        # so that the CSV mirrors the table grouping.
+                                        # "Log" will naturally be picked up by extra_cols since
+                                        # it's not in display_cols or drop_cols_set.
+                                        existing_display = [c for c in display_cols if c in combined_peaks.columns]
+                                        extra_cols = [c for c in combined_peaks.columns if c not in display_cols and c not in drop_cols_set]
+                                        ordered_cols = existing_display + extra_cols
+                                        publish_table("peak_picker_df", combined_peaks[ordered_cols], signature)
+                                        ss["jobs"].discard("peak_picker")
+                                    elif job.status == "cancelled":
+                                        st.warning("Peak picking across all logs was cancelled.")
+                                        if st.button("Restart", key="peak_picker_restart"):
+                                            ss["jobs"].discard("peak_picker")
+                                            st.rerun()
+                                    elif job.status == "failed":
+                                        st.error(f"Peak picking across all logs failed: {job.error}")
+                                    else:
+                                        render_job_status(job, cancel_key="peak_picker_cancel")
+
+                                if table_is_current("peak_picker_df", signature):
+                                    st.download_button(
+                                        "Download peaks CSV (all logs)",
+                                        data=table_csv("peak_picker_df"),
+                                        file_name="peak_picker.csv",
+                                        mime="text/csv",
+                                        key="dl_peak_csv",
+                                    )
                             else:
                                 st.info("No peaks found for the current selection.")
             except Exception as exc:
@@ -1,11 +1,30 @@
+import warnings
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 
-from st_config import COLOURS, TEMPLATE, init_app_state
+from leq_index import range_leq
+from log_arrays import attach_arrays, band_frequency
+from st_config import (
+    COLOURS,
+    TEMPLATE,
+    get_band_matrix,
+    get_resampled_log,
+    get_sliding_trace,
+    init_app_state,
+    resampled_log_csv,
+    timed,
+    timed_stage,
+)
 
 ss = init_app_state()
 
+# Set here rather than at app start so plotly loads with the pages that draw charts.
+pd.options.plotting.backend = "plotly"
+
 PERIOD_COLOURS = {
     "Daytime": "#FBAE18",
     "Evening": "#FF7F0E",
@@ -13,6 +32,27 @@ PERIOD_COLOURS = {
     "All": "#1f77b4",
 }
 
+FALLBACK_COLOURS = [
+    "#1f77b4",
+    "#ff7f0e",
+    "#2ca02c",
+    "#9467bd",
+    "#8c564b",
+    "#e377c2",
+    "#7f7f7f",
+    "#bcbd22",
+    "#17becf",
+]
+
+TABLE_PAGE_SIZES = [100, 250, 500, 1000, 5000]
+
+SPECTROGRAM_MAX_COLUMNS = 1200
+
+COMPARE_TAB_LABEL = "Compare logs"
+
+SLIDING_METRICS = ["Leq", "L10", "L50", "L90"]
+SLIDING_WINDOWS = [1, 5, 15, 30, 60]
+
 
 def _counts_series_for_log(counts_df, log_name: str) -> pd.Series:
     if counts_df is None:
@@ -41,6 +81,7 @@ def _counts_series_for_log(counts_df, log_name: str) -> pd.Series:
     return pd.Series(dtype="float64")
 
 
+@timed("figure:counts")
 def _build_counts_figure(series: pd.Series, title: str, colour: str | None = None) -> go.Figure:
     if colour is None:
         colour = COLOURS["Leq A"]
@@ -87,20 +128,63 @@ def _normalise_plot_column_name(col) -> str:
     return str(col)
 
 
-def _prepare_display_df(df: pd.DataFrame) -> pd.DataFrame:
-    """Return a display-ready copy: Night idx dropped, float bands shown as integers."""
-    cols = [col for col in df.columns if _column_family(col) != "Night idx"]
-    display = df[cols].copy()
+@lru_cache(maxsize=64)
+def _display_columns(columns: tuple) -> tuple[tuple, tuple]:
+    """Return (source columns, display labels): Night idx dropped, float bands shown as integers."""
+    source = tuple(col for col in columns if _column_family(col) != "Night idx")
 
     def _clean_col(col):
         if isinstance(col, tuple):
             return tuple(int(p) if isinstance(p, float) and p == int(p) else p for p in col)
         return col
 
-    display.columns = [_clean_col(c) for c in display.columns]
+    return source, tuple(_clean_col(c) for c in source)
+
+
+def _prepare_display_df(df: pd.DataFrame, start: int = 0, stop: int | None = None) -> pd.DataFrame:
+    """Return a display-ready slice of rows [start, stop) with cleaned column labels."""
+    source, labels = _display_columns(tuple(df.columns))
+    display = df.iloc[start:stop][list(source)]
+    display.columns = list(labels)
     return display
 
 
+@timed("table:resampled")
+def _render_paginated_table(df: pd.DataFrame, key: str) -> None:
+    total_rows = len(df)
+    if total_rows == 0:
+        st.info("No rows to display.")
+        return
+
+    size_col, page_col, info_col = st.columns([1, 1, 2])
+    with size_col:
+        page_size = st.selectbox(
+            "Rows per page",
+            options=TABLE_PAGE_SIZES,
+            index=1,
+            key=f"{key}_page_size",
+        )
+    page_count = max(1, -(-total_rows // int(page_size)))
+    page_key = f"{key}_page"
+    if int(ss.get(page_key, 1)) > page_count:
+        ss[page_key] = page_count
+    with page_col:
+        page_number = st.number_input(
+            "Page",
+            min_value=1,
+            max_value=page_count,
+            step=1,
+            key=page_key,
+        )
+
+    start = (int(page_number) - 1) * int(page_size)
+    stop = min(start + int(page_size), total_rows)
+    with info_col:
+        st.caption(f"Rows {start + 1:,}–{stop:,} of {total_rows:,} · page {int(page_number)} of {page_count}")
+
+    st.dataframe(_prepare_display_df(df, start, stop), width='stretch')
+
+
 def _split_column_parts(col) -> list[str]:
     if isinstance(col, tuple):
         return [str(part).strip() for part in col if str(part).strip()]
@@ -127,18 +211,7 @@ def _base_default_colour(col, index: int) -> str:
     if family_a_label in COLOURS:
         return COLOURS[family_a_label]
 
-    fallback_colours = [
-        "#1f77b4",
-        "#ff7f0e",
-        "#2ca02c",
-        "#9467bd",
-        "#8c564b",
-        "#e377c2",
-        "#7f7f7f",
-        "#bcbd22",
-        "#17becf",
-    ]
-    return fallback_colours[index % len(fallback_colours)]
+    return FALLBACK_COLOURS[index % len(FALLBACK_COLOURS)]
 
 
 def _is_lmax_column(col) -> bool:
@@ -185,6 +258,302 @@ def _column_sort_key(col) -> tuple[int, str, str]:
     return family_order.get(family, 99), family, band
 
 
+def _downsample_band_matrix(
+        timestamps: np.ndarray,
+        matrix: np.ndarray,
+        family: str,
+        max_columns: int = SPECTROGRAM_MAX_COLUMNS,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Reduce a band x time matrix to at most ``max_columns`` time bins.
+
+    Lmax bins keep the block maximum; other families are energy-averaged, or
+    arithmetically averaged for statistical levels when that averaging is selected.
+    """
+    n_bands, n_times = matrix.shape
+    if n_times <= max_columns:
+        return timestamps, matrix
+
+    block = -(-n_times // max_columns)
+    n_bins = -(-n_times // block)
+    padded = np.full((n_bands, n_bins * block), np.nan)
+    padded[:, :n_times] = matrix
+    blocks = padded.reshape(n_bands, n_bins, block)
+
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if family.lower() == "lmax":
+            reduced = np.nanmax(blocks, axis=2)
+        elif family.lower() != "leq" and ss.get("l90_averaging", "log") == "arithmetic":
+            reduced = np.nanmean(blocks, axis=2)
+        else:
+            reduced = 10.0 * np.log10(np.nanmean(np.power(10.0, blocks / 10.0), axis=2))
+
+    return timestamps[::block], reduced
+
+
+@timed("figure:spectrogram")
+def _build_spectrogram_figure(name: str, period: str, family: str) -> go.Figure | None:
+    timestamps, freqs, matrix = get_band_matrix(name, period, family)
+    if matrix.size == 0:
+        return None
+
+    x_values, z_values = _downsample_band_matrix(timestamps, matrix, family)
+    band_labels = [str(int(f)) if f == int(f) else str(f) for f in freqs]
+
+    fig = go.Figure(
+        go.Heatmap(
+            x=x_values,
+            y=band_labels,
+            z=z_values,
+            colorscale="Viridis",
+            colorbar=dict(title="dB"),
+            hovertemplate="%{x}<br>%{y} Hz<br>%{z:.1f} dB<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        template=TEMPLATE,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(
+            title="Time & Date",
+            type="date",
+            tickformat="%H:%M<br>%d/%m/%Y",
+            tickangle=0,
+        ),
+        yaxis=dict(title="Octave band (Hz)", type="category"),
+        height=420,
+    )
+    return fig
+
+
+def _selected_time_range(event) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+    boxes = ((event or {}).get("selection") or {}).get("box") or []
+    x_values = (boxes[0].get("x") or []) if boxes else []
+    if len(x_values) < 2:
+        return None
+    bounds = [pd.to_datetime(x, unit="ms") if isinstance(x, (int, float)) else pd.Timestamp(x) for x in x_values]
+    return min(bounds), max(bounds)
+
+
+@timed("figure:range_spectrum")
+def _build_range_spectrum_figure(leq: pd.Series) -> go.Figure | None:
+    bands = sorted(
+        (freq, value)
+        for (_, band), value in leq.items()
+        if (freq := band_frequency(band)) is not None and pd.notna(value)
+    )
+    if not bands:
+        return None
+
+    fig = go.Figure(
+        go.Bar(
+            x=[str(int(freq)) if freq == int(freq) else str(freq) for freq, _ in bands],
+            y=[value for _, value in bands],
+            marker_color=COLOURS["Leq A"],
+            hovertemplate="%{x} Hz<br>%{y:.1f} dB<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        template=TEMPLATE,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(title="Octave band (Hz)", type="category"),
+        yaxis_title="Leq (dB)",
+        height=360,
+        showlegend=False,
+    )
+    return fig
+
+
+def _render_range_spectrum(log, selection: tuple[pd.Timestamp, pd.Timestamp] | None) -> None:
+    if selection is None:
+        st.caption("Box-select a time range on the chart to see the Leq spectrum over that range.")
+        return
+
+    start, end = selection
+    with timed_stage("range_leq"):
+        leq = range_leq(log, start, end)
+    if leq.isna().all():
+        st.info("No measurements fall within the selected range.")
+        return
+
+    st.markdown(f"#### Leq spectrum, {start:%d/%m/%Y %H:%M:%S} to {end:%d/%m/%Y %H:%M:%S}")
+    overall = leq.get(("Leq", "A"))
+    if overall is not None and pd.notna(overall):
+        st.metric("Leq A over range", f"{overall:.1f} dB")
+    fig = _build_range_spectrum_figure(leq)
+    if fig is not None:
+        st.plotly_chart(fig, width='stretch')
+
+
+def _render_sliding_controls(name: str, log) -> dict[str, pd.Series]:
+    """Sliding-window traces chosen for this log, keyed by trace label."""
+    source_cols = list(attach_arrays(log).energy_columns)
+    if not source_cols:
+        return {}
+
+    with st.expander("Sliding-window metrics", expanded=False):
+        st.caption(
+            "Leq and Ln over a window trailing each point, computed from the raw samples rather than "
+            "the resampled data. Ln is the level exceeded n % of the window, to 0.1 dB."
+        )
+        metric_col, window_col, source_col = st.columns(3)
+        with metric_col:
+            metrics = st.multiselect("Metrics", options=SLIDING_METRICS, key=f"sliding_metrics_{name}")
+        with window_col:
+            window = st.selectbox("Window (minutes)", options=SLIDING_WINDOWS, index=1, key=f"sliding_window_{name}")
+        with source_col:
+            source = st.selectbox(
+                "Source column",
+                options=source_cols,
+                index=source_cols.index(("Leq", "A")) if ("Leq", "A") in source_cols else 0,
+                format_func=_normalise_plot_column_name,
+                key=f"sliding_source_{name}",
+            )
+
+    traces = {}
+    for metric in metrics:
+        # Labels lead with the window so default colours do not repeat the measured traces'.
+        label = f"{window} min {metric} · {_normalise_plot_column_name(source)}"
+        traces[label] = get_sliding_trace(name, source, metric, window)
+    return traces
+
+
+def _aligned_comparison_frame(log_names: list[str], col, period: str) -> pd.DataFrame:
+    """Align one column from several logs onto a shared, sorted time index."""
+    aligned = {}
+    for log_name in log_names:
+        try:
+            resampled = get_resampled_log(log_name, period)
+        except Exception:
+            continue
+        if col not in resampled.columns:
+            continue
+        series = pd.to_numeric(resampled[col], errors="coerce")
+        if not series.index.is_monotonic_increasing:
+            series = series.sort_index()
+        aligned[log_name] = series[~series.index.duplicated(keep="first")]
+
+    if not aligned:
+        return pd.DataFrame()
+    return pd.concat(aligned, axis=1, join="outer", sort=True)
+
+
+@timed("compare logs")
+def _render_comparison_view(log_names: list[str]) -> None:
+    st.subheader("Compare logs")
+    st.caption(
+        "Overlay one column from several logs on a shared time axis. "
+        "Logs are resampled to the same interval and joined on their timestamps."
+    )
+
+    all_cols: set = set()
+    for log_name in log_names:
+        try:
+            all_cols.update(
+                col for col in ss["logs"][log_name].get_data().columns
+                if _column_family(col) not in ("Night idx", "Time")
+            )
+        except Exception:
+            pass
+    compare_cols = sorted(all_cols, key=_column_sort_key)
+    if not compare_cols:
+        st.info("No columns available to compare.")
+        return
+
+    default_col = next((col for col in compare_cols if _normalise_plot_column_name(col) == "Leq A"), compare_cols[0])
+
+    c1, c2, c3 = st.columns([2, 1, 1])
+    with c1:
+        selected_names = st.multiselect(
+            "Logs to compare",
+            options=log_names,
+            default=log_names[:2],
+            key="compare_logs",
+        )
+    with c2:
+        compare_col = st.selectbox(
+            "Column",
+            options=compare_cols,
+            index=compare_cols.index(default_col),
+            format_func=_normalise_plot_column_name,
+            key="compare_column",
+        )
+    with c3:
+        compare_minutes = st.selectbox(
+            "Resample period (minutes)",
+            options=[1, 2, 5, 10, 15, 30, 60, 120],
+            index=4,
+            key="compare_period",
+        )
+
+    if len(selected_names) < 2:
+        st.info("Select at least two logs to compare.")
+        return
+
+    aligned = _aligned_comparison_frame(selected_names, compare_col, f"{compare_minutes}min")
+    missing = [log_name for log_name in selected_names if log_name not in aligned.columns]
+    if missing:
+        st.caption(f"Skipped (column not available): {', '.join(missing)}")
+    if aligned.empty:
+        st.info("No overlapping data for the selected logs and column.")
+        return
+
+    label = _normalise_plot_column_name(compare_col)
+    fig = go.Figure()
+    for trace_index, log_name in enumerate(aligned.columns):
+        fig.add_trace(
+            go.Scattergl(
+                x=aligned.index,
+                y=aligned[log_name].to_numpy(),
+                name=str(log_name),
+                mode="lines",
+                line=dict(color=FALLBACK_COLOURS[trace_index % len(FALLBACK_COLOURS)], width=1.5),
+                connectgaps=False,
+            )
+        )
+    fig.update_layout(
+        template=TEMPLATE,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(title="Time & Date", type="date", tickformat="%H:%M<br>%d/%m/%Y", tickangle=0),
+        yaxis_title=f"{label} (dB)",
+        legend=dict(orientation="h", yanchor="top", y=-0.2, xanchor="left", x=0),
+        height=500,
+    )
+    st.plotly_chart(fig, width='stretch')
+
+    show_diff = st.toggle("Show difference traces", value=True, key="compare_show_diff")
+    if show_diff and aligned.shape[1] >= 2:
+        reference = st.selectbox(
+            "Reference log",
+            options=list(aligned.columns),
+            index=0,
+            key="compare_reference",
+        )
+        reference_values = aligned[reference].to_numpy()
+        diff_fig = go.Figure()
+        for trace_index, log_name in enumerate(aligned.columns):
+            if log_name == reference:
+                continue
+            diff_fig.add_trace(
+                go.Scattergl(
+                    x=aligned.index,
+                    y=aligned[log_name].to_numpy() - reference_values,
+                    name=f"{log_name} − {reference}",
+                    mode="lines",
+                    line=dict(color=FALLBACK_COLOURS[trace_index % len(FALLBACK_COLOURS)], width=1.5),
+                )
+            )
+        diff_fig.add_hline(y=0, line_dash="dot", line_color="#7f7f7f")
+        diff_fig.update_layout(
+            template=TEMPLATE,
+            margin=dict(l=0, r=0, t=0, b=0),
+            xaxis=dict(title="Time & Date", type="date", tickformat="%H:%M<br>%d/%m/%Y", tickangle=0),
+            yaxis_title=f"{label} difference (dB)",
+            legend=dict(orientation="h", yanchor="top", y=-0.2, xanchor="left", x=0),
+            height=400,
+        )
+        st.plotly_chart(diff_fig, width='stretch')
+
+
 def vis_page() -> None:
     st.header("Visualisation", divider=True)
 
@@ -193,7 +562,7 @@ def vis_page() -> None:
         st.warning("No logs have been uploaded yet. Use the Data Loader page to add data.")
         st.stop()
 
-    tabs = st.tabs([name for name, _ in log_items])
+    tabs = st.tabs([name for name, _ in log_items] + [COMPARE_TAB_LABEL])
 
     modal_params = ss.get("modal_params") or [("L90", "A"), "60min", "60min", "15min"]
     modal_param = modal_params[0]
@@ -212,7 +581,7 @@ def vis_page() -> None:
             period = f"{period_minutes}min"
 
             try:
-                graph_df = log.as_interval(t=period, averaging=ss.get("l90_averaging", "log"), ln_averaging=ss.get("l90_averaging", "log"))
+                graph_df = get_resampled_log(name, period)
             except Exception as exc:
                 st.error(f"Failed to resample data for {name}: {exc}")
                 continue
@@ -282,10 +651,14 @@ def vis_page() -> None:
                     f"L90={family_counts['L90']}"
                 )
 
-            if selected_cols:
+            sliding_traces = _render_sliding_controls(name, log)
+            # Sliding traces take the same styling controls, keyed by their labels.
+            plot_cols = list(selected_cols) + list(sliding_traces)
+
+            if plot_cols:
                 st.markdown("#### Plot styling")
 
-                for trace_index, col in enumerate(selected_cols):
+                for trace_index, col in enumerate(plot_cols):
                     label = _normalise_plot_column_name(col)
                     mode_key = f"time_history_mode_{name}_{label}"
                     colour_key = f"time_history_colour_{name}_{label}"
@@ -296,7 +669,7 @@ def vis_page() -> None:
                         ss[colour_key] = _base_default_colour(col, trace_index)
 
                 style_columns = st.columns(3)
-                for idx_col, col in enumerate(selected_cols):
+                for idx_col, col in enumerate(plot_cols):
                     label = _normalise_plot_column_name(col)
                     mode_key = f"time_history_mode_{name}_{label}"
                     colour_key = f"time_history_colour_{name}_{label}"
@@ -315,72 +688,111 @@ def vis_page() -> None:
                             key=f"{colour_key}_widget",
                         )
 
-                fig = go.Figure()
-
-                for trace_index, col in enumerate(selected_cols):
-                    label = _normalise_plot_column_name(col)
-                    series = pd.to_numeric(graph_df[col], errors="coerce")
-
-                    if not series.notna().any():
-                        continue
-
-                    mode_value = ss.get(f"time_history_mode_{name}_{label}", _default_trace_mode(col))
-                    colour_value = ss.get(f"time_history_colour_{name}_{label}", _base_default_colour(col, trace_index))
-
-                    if mode_value == "bar":
-                        fig.add_trace(
-                            go.Bar(
-                                x=graph_df.index,
-                                y=series,
-                                name=label,
-                                marker_color=colour_value,
+                with timed_stage("figure:time_history"):
+                    fig = go.Figure()
+
+                    for trace_index, col in enumerate(plot_cols):
+                        label = _normalise_plot_column_name(col)
+                        if col in sliding_traces:
+                            series = sliding_traces[col]
+                        else:
+                            series = pd.to_numeric(graph_df[col], errors="coerce")
+
+                        if not series.notna().any():
+                            continue
+
+                        mode_value = ss.get(f"time_history_mode_{name}_{label}", _default_trace_mode(col))
+                        colour_value = ss.get(f"time_history_colour_{name}_{label}", _base_default_colour(col, trace_index))
+
+                        if mode_value == "bar":
+                            fig.add_trace(
+                                go.Bar(
+                                    x=series.index,
+                                    y=series,
+                                    name=label,
+                                    marker_color=colour_value,
+                                )
                             )
-                        )
-                    else:
-                        scatter_mode = "lines" if mode_value == "line" else "markers"
-                        fig.add_trace(
-                            go.Scatter(
-                                x=graph_df.index,
-                                y=series,
-                                name=label,
-                                mode=scatter_mode,
-                                line=dict(
-                                    color=colour_value,
-                                    width=2,
-                                ) if mode_value == "line" else None,
-                                marker=dict(
-                                    color=colour_value,
-                                    size=6 if mode_value == "point" else 4,
-                                ) if mode_value == "point" else None,
+                        else:
+                            scatter_mode = "lines" if mode_value == "line" else "markers"
+                            fig.add_trace(
+                                go.Scatter(
+                                    x=series.index,
+                                    y=series,
+                                    name=label,
+                                    mode=scatter_mode,
+                                    line=dict(
+                                        color=colour_value,
+                                        width=2,
+                                    ) if mode_value == "line" else None,
+                                    marker=dict(
+                                        color=colour_value,
+                                        size=6 if mode_value == "point" else 4,
+                                    ) if mode_value == "point" else None,
+                                )
                             )
-                        )
 
-                fig.update_layout(
-                    template=TEMPLATE,
-                    margin=dict(l=0, r=0, t=0, b=0),
-                    xaxis=dict(
-                        title="Time & Date",
-                        type="date",
-                        tickformat="%H:%M<br>%d/%m/%Y",
-                        tickangle=0,
-                    ),
-                    yaxis_title="Measured Sound Pressure Level dB(A)",
-                    legend=dict(
-                        orientation="h",
-                        yanchor="top",
-                        y=-0.2,
-                        xanchor="left",
-                        x=0,
-                    ),
-                    height=600,
-                    barmode="overlay",
+                    fig.update_layout(
+                        template=TEMPLATE,
+                        margin=dict(l=0, r=0, t=0, b=0),
+                        xaxis=dict(
+                            title="Time & Date",
+                            type="date",
+                            tickformat="%H:%M<br>%d/%m/%Y",
+                            tickangle=0,
+                        ),
+                        yaxis_title="Measured Sound Pressure Level dB(A)",
+                        legend=dict(
+                            orientation="h",
+                            yanchor="top",
+                            y=-0.2,
+                            xanchor="left",
+                            x=0,
+                        ),
+                        height=600,
+                        barmode="overlay",
+                    )
+                    event = st.plotly_chart(
+                        fig,
+                        width='stretch',
+                        on_select="rerun",
+                        selection_mode="box",
+                        key=f"time_history_chart_{name}",
+                    )
+                # Computed from the log's energy index, so the whole range is exact whatever the resample period.
+                _render_range_spectrum(log, _selected_time_range(event))
+            else:
+                st.info("Select at least one column or sliding-window metric to display the time history plot.")
+
+            st.subheader(f"{name} spectrogram")
+            spectro_families = [
+                family for family in ["Leq", "Lmax", "L90"]
+                if any(_column_family(col) == family and _column_band(col).upper() != "A" for col in available_cols)
+            ]
+            if spectro_families:
+                spectro_family = st.radio(
+                    "Spectrogram parameter",
+                    options=spectro_families,
+                    horizontal=True,
+                    key=f"spectrogram_family_{name}",
                 )
-                st.plotly_chart(fig, width='stretch')
+                spectro_fig = _build_spectrogram_figure(name, period, spectro_family)
+                if spectro_fig is not None:
+                    st.plotly_chart(spectro_fig, width='stretch')
+                else:
+                    st.info(f"No {spectro_family} octave-band columns available for this log.")
             else:
-                st.info("Select at least one column to display the time history plot.")
+                st.info("No octave-band columns available for a spectrogram.")
 
             st.subheader(f"{name} resampled data")
-            st.dataframe(_prepare_display_df(graph_df), width='stretch')
+            _render_paginated_table(graph_df, key=f"resampled_table_{name}")
+            st.download_button(
+                "Download resampled CSV (full headers)",
+                data=resampled_log_csv(name, period),
+                file_name=f"{name}_{period}.csv",
+                mime="text/csv",
+                key=f"dl_resampled_{name}",
+            )
 
             st.divider()
 
@@ -408,7 +820,7 @@ def vis_page() -> None:
             period_counts: dict = {}
             for period_label, period_key, period_t in period_defs:
                 try:
-                    interval_df = log.as_interval(t=period_t, averaging=ss.get("l90_averaging", "log"), ln_averaging=ss.get("l90_averaging", "log"))
+                    interval_df = get_resampled_log(name, period_t)
                     period_df = log.get_period(data=interval_df, period=period_key)
                     counts_series = log.counts(data=period_df, cols=[counts_col])
                     if not counts_series.empty:
@@ -419,7 +831,7 @@ def vis_page() -> None:
             if ss.get("counts_include_all", False):
                 _all_t = ss.get("counts_all_t", "15min")
                 try:
-                    _all_interval = log.as_interval(t=_all_t, averaging=ss.get("l90_averaging", "log"), ln_averaging=ss.get("l90_averaging", "log"))
+                    _all_interval = get_resampled_log(name, _all_t)
                     _all_series = log.counts(data=_all_interval, cols=[counts_col])
                     if not _all_series.empty:
                         period_counts["All"] = _all_series
@@ -429,32 +841,33 @@ def vis_page() -> None:
             if not period_counts:
                 st.info("No counts data available for this log.")
             elif stack_counts:
-                fig = go.Figure()
-                for period_label, counts_series in period_counts.items():
-                    plot_series = pd.to_numeric(counts_series, errors="coerce").dropna()
-                    try:
-                        sort_index = sorted(plot_series.index, key=lambda v: float(v))
-                        plot_series = plot_series.reindex(sort_index)
-                    except Exception:
-                        pass
-                    fig.add_trace(go.Bar(
-                        x=[str(x) for x in plot_series.index],
-                        y=plot_series.values,
-                        name=period_label,
-                        marker_color=PERIOD_COLOURS.get(period_label, "#7f7f7f"),
-                        opacity=0.75,
-                    ))
-                fig.update_layout(
-                    template=TEMPLATE,
-                    title=f"{name} — {counts_label} counts by period",
-                    xaxis_title="Value (dB)",
-                    yaxis_title="Count",
-                    margin=dict(l=0, r=0, t=48, b=0),
-                    height=420,
-                    barmode="overlay",
-                    legend=dict(orientation="h", yanchor="top", y=-0.2, xanchor="left", x=0),
-                )
-                st.plotly_chart(fig, width='stretch', config={"displayModeBar": "hover", "responsive": True})
+                with timed_stage("figure:counts"):
+                    fig = go.Figure()
+                    for period_label, counts_series in period_counts.items():
+                        plot_series = pd.to_numeric(counts_series, errors="coerce").dropna()
+                        try:
+                            sort_index = sorted(plot_series.index, key=lambda v: float(v))
+                            plot_series = plot_series.reindex(sort_index)
+                        except Exception:
+                            pass
+                        fig.add_trace(go.Bar(
+                            x=[str(x) for x in plot_series.index],
+                            y=plot_series.values,
+                            name=period_label,
+                            marker_color=PERIOD_COLOURS.get(period_label, "#7f7f7f"),
+                            opacity=0.75,
+                        ))
+                    fig.update_layout(
+                        template=TEMPLATE,
+                        title=f"{name} — {counts_label} counts by period",
+                        xaxis_title="Value (dB)",
+                        yaxis_title="Count",
+                        margin=dict(l=0, r=0, t=48, b=0),
+                        height=420,
+                        barmode="overlay",
+                        legend=dict(orientation="h", yanchor="top", y=-0.2, xanchor="left", x=0),
+                    )
+                    st.plotly_chart(fig, width='stretch', config={"displayModeBar": "hover", "responsive": True})
             else:
                 chart_cols = st.columns(len(period_counts))
                 for col_idx, (period_label, counts_series) in enumerate(period_counts.items()):
@@ -465,4 +878,7 @@ def vis_page() -> None:
                             period_fig,
                             width='stretch',
                             config={"displayModeBar": "hover", "responsive": True},
-                        )
\ No newline at end of file
+                        )
+
+    with tabs[-1]:
+        _render_comparison_view([name for name, _ in log_items])
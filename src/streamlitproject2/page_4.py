@@ -2,10 +2,29 @@ import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 
-from st_config import TEMPLATE, _build_survey, init_app_state
+from st_config import (
+    TEMPLATE,
+    _format_bytes,
+    _survey_log,
+    init_app_state,
+    render_job_status,
+    set_weather_df,
+    timed,
+)
+from tracing import span
+from weather_history import (
+    DEFAULT_MAX_REQUESTS_PER_S,
+    DEFAULT_MAX_WORKERS,
+    WeatherCache,
+    WeatherFetchError,
+    load_weather_history,
+)
 
 ss = init_app_state()
 
+# Set here rather than at app start so plotly loads with the pages that draw charts.
+pd.options.plotting.backend = "plotly"
+
 
 def _safe_get_survey_time_bounds(selected_logs: list[str]) -> tuple[object, object]:
     logs = ss.get("logs", {})
@@ -32,11 +51,9 @@ def _safe_get_survey_time_bounds(selected_logs: list[str]) -> tuple[object, obje
     return start, end
 
 
-def _get_weather_source(survey):
-    weather_obj = getattr(survey, "_weather", None)
-    if weather_obj is None:
-        raise RuntimeError("Weather service is not available on the current survey object.")
-    return weather_obj
+@st.cache_resource
+def _get_weather_cache() -> WeatherCache:
+    return WeatherCache()
 
 
 def _prepare_weather_dataframe(df: pd.DataFrame | None) -> pd.DataFrame:
@@ -62,6 +79,11 @@ def _prepare_weather_dataframe(df: pd.DataFrame | None) -> pd.DataFrame:
         "rain",
         "snow",
     ]
+    for col in ["rain", "snow"]:
+        # One Call reports precipitation as {"1h": mm}.
+        if col in prepared.columns:
+            prepared[col] = prepared[col].map(lambda value: value.get("1h") if isinstance(value, dict) else value)
+
     for col in numeric_candidates:
         if col in prepared.columns:
             prepared[col] = pd.to_numeric(prepared[col], errors="coerce")
@@ -69,6 +91,28 @@ def _prepare_weather_dataframe(df: pd.DataFrame | None) -> pd.DataFrame:
     return prepared
 
 
+def _fetch_weather_job(ctx, session_id: str | None = None, **kwargs) -> tuple[pd.DataFrame, dict[str, int], int]:
+    def _report_progress(done: int, total: int) -> None:
+        ctx.progress(done / total, f"Fetched {done} of {total} weather readings")
+
+    ctx.progress(0.0, "Fetching weather history...")
+    with span(
+        "weather_fetch",
+        session=session_id,
+        interval_hours=kwargs["interval_hours"],
+        offline=kwargs.get("offline", False),
+    ) as trace:
+        try:
+            weather_df, fetch_summary = load_weather_history(progress=_report_progress, **kwargs)
+        except WeatherFetchError:
+            ctx.check()
+            raise
+        trace.update(fetch_summary)
+        trace["cache"] = "hit" if not fetch_summary.get("fetched") else "miss"
+    return _prepare_weather_dataframe(weather_df), fetch_summary, kwargs["interval_hours"]
+
+
+@timed("figure:weather")
 def _line_chart(df: pd.DataFrame, x_col: str, y_cols: list[str], title: str) -> go.Figure:
     fig = go.Figure()
 
@@ -95,6 +139,73 @@ def _line_chart(df: pd.DataFrame, x_col: str, y_cols: list[str], title: str) ->
     return fig
 
 
+def _render_exclusion_controls(weather_df: pd.DataFrame) -> None:
+    st.subheader("Weather exclusions")
+    st.caption(
+        "Exclude acoustic samples measured while the latest weather reading breaches a threshold. "
+        "Applies to the survey summary, modal, counts and Lmax tables."
+    )
+
+    settings = dict(ss["weather_exclusion"])
+    speed_unit = "mph" if ss.get("weather_units") == "imperial" else "m/s"
+
+    settings["enabled"] = st.toggle(
+        "Exclude samples by weather",
+        value=bool(settings.get("enabled", False)),
+        key="weather_exclusion_enabled",
+    )
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        settings["max_wind_speed"] = float(
+            st.number_input(
+                f"Max wind speed ({speed_unit})",
+                min_value=0.0,
+                value=float(settings.get("max_wind_speed", 5.0)),
+                step=0.5,
+                key="weather_exclusion_wind",
+            )
+        )
+    with c2:
+        gust = settings.get("max_wind_gust")
+        settings["max_wind_gust"] = st.number_input(
+            f"Max wind gust ({speed_unit})",
+            min_value=0.0,
+            value=None if gust is None else float(gust),
+            step=0.5,
+            placeholder="No gust limit",
+            key="weather_exclusion_gust",
+            help="Leave empty to ignore gusts.",
+        )
+    with c3:
+        settings["max_rain"] = float(
+            st.number_input(
+                "Max rain (mm/h)",
+                min_value=0.0,
+                value=float(settings.get("max_rain", 0.0)),
+                step=0.1,
+                key="weather_exclusion_rain",
+            )
+        )
+    ss["weather_exclusion"] = settings
+
+    if not settings["enabled"]:
+        return
+    if "dt" not in weather_df.columns:
+        st.warning("Weather data has no timestamps, so no samples can be excluded.")
+        return
+
+    excluded = {}
+    for name, log in ss["logs"].items():
+        masked = _survey_log(name, log)
+        if hasattr(masked, "excluded_fraction"):
+            excluded[name] = round(100.0 * masked.excluded_fraction(), 1)
+    if excluded:
+        st.dataframe(
+            pd.DataFrame({"Log": list(excluded), "Excluded (%)": list(excluded.values())}),
+            hide_index=True,
+        )
+
+
 def weather_page() -> None:
     st.title("Weather")
     st.markdown(
@@ -148,6 +259,40 @@ def weather_page() -> None:
             help="Enter your API key to fetch historical weather data.",
         ).strip()
 
+        c7, c8 = st.columns(2)
+        with c7:
+            max_workers = st.number_input(
+                "Parallel requests",
+                min_value=1,
+                max_value=32,
+                value=int(ss.get("weather_max_workers", DEFAULT_MAX_WORKERS)),
+                step=1,
+                help="Number of weather requests in flight at once.",
+            )
+        with c8:
+            max_rate = st.number_input(
+                "Max requests per second",
+                min_value=0.5,
+                max_value=100.0,
+                value=float(ss.get("weather_max_requests_per_s", DEFAULT_MAX_REQUESTS_PER_S)),
+                step=0.5,
+                help="Ceiling on the request rate, to stay within your OpenWeather plan limits.",
+            )
+
+        c5, c6 = st.columns(2)
+        with c5:
+            use_cache = st.toggle(
+                "Use local weather cache",
+                value=ss.get("weather_use_cache", True),
+                help="Reuse previously fetched hours and only request the missing ones.",
+            )
+        with c6:
+            offline = st.toggle(
+                "Offline (cache only)",
+                value=ss.get("weather_offline", False),
+                help="Build the weather table from cached hours without calling the API.",
+            )
+
         fetch_clicked = st.form_submit_button("Fetch weather history", width='stretch')
 
     ss["weather_country"] = country
@@ -155,6 +300,10 @@ def weather_page() -> None:
     ss["weather_units"] = units
     ss["weather_interval_hours"] = interval_hours
     ss["owm_api_key"] = api_key
+    ss["weather_use_cache"] = use_cache
+    ss["weather_offline"] = offline
+    ss["weather_max_workers"] = int(max_workers)
+    ss["weather_max_requests_per_s"] = float(max_rate)
 
     start, end = _safe_get_survey_time_bounds(selected_logs)
 
@@ -163,7 +312,11 @@ def weather_page() -> None:
     info_cols[1].metric("Survey end", str(end) if end is not None else "—")
 
     if fetch_clicked:
-        if not api_key:
+        if offline and not use_cache:
+            st.error("Offline mode needs the local weather cache enabled.")
+            st.stop()
+
+        if not api_key and not offline:
             st.error("Enter an API key before fetching weather history.")
             st.stop()
 
@@ -175,28 +328,63 @@ def weather_page() -> None:
             st.error("Could not determine survey time bounds from the selected logs.")
             st.stop()
 
-        survey = _build_survey(times=ss.get("times"), log_names=selected_logs)
-        ss["survey"] = survey
-
-        try:
-            weather_obj = _get_weather_source(survey)
-            weather_obj.reinit(
-                start=start,
-                end=end,
-                interval=int(interval_hours),
-                api_key=api_key,
-                country=country,
-                postcode=postcode,
-                tz=country,
-                units=units,
+        ss["jobs"].submit(
+            "weather_fetch",
+            (start, end, country, postcode, units, int(interval_hours)),
+            _fetch_weather_job,
+            session_id=ss["session_id"],
+            start=start,
+            end=end,
+            interval_hours=int(interval_hours),
+            api_key=api_key,
+            country=country,
+            postcode=postcode,
+            units=units,
+            timeout=float(ss.get("weather_timeout_s", 30)),
+            cache=_get_weather_cache() if use_cache else None,
+            offline=offline,
+            max_workers=int(max_workers),
+            max_requests_per_s=float(max_rate),
+        )
+
+    job = ss["jobs"].get("weather_fetch")
+    if job is not None and not job.finished:
+        render_job_status(job, cancel_key="weather_fetch_cancel")
+    elif job is not None:
+        ss["jobs"].discard("weather_fetch")
+        ss["stage_timer"].record("job:weather_fetch", job.elapsed)
+        if job.status == "done":
+            weather_df, fetch_summary, fetched_interval = job.result
+            set_weather_df(weather_df, interval_hours=fetched_interval)
+            st.success(
+                f"Weather history loaded: {fetch_summary['cached']} cached, "
+                f"{fetch_summary['fetched']} fetched"
+                + (f", {fetch_summary['missing']} not available offline." if fetch_summary["missing"] else ".")
             )
-            weather_df = weather_obj.compute_weather_history(drop_cols=[])
-            weather_df = _prepare_weather_dataframe(weather_df)
-            ss["weather_df"] = weather_df
-            st.success("Weather history loaded.")
-        except Exception as exc:
-            ss["weather_df"] = pd.DataFrame()
-            st.error(f"Failed to fetch weather history: {exc}")
+        elif job.status == "cancelled":
+            st.warning("Weather fetch cancelled.")
+        elif isinstance(job.error, WeatherFetchError):
+            set_weather_df(pd.DataFrame())
+            kept = f" {len(job.error.observations)} readings were cached for the next attempt." if use_cache else ""
+            st.error(f"Failed to fetch weather history: {job.error}.{kept}")
+        else:
+            set_weather_df(pd.DataFrame())
+            st.error(f"Failed to fetch weather history: {job.error}")
+
+    if use_cache:
+        with st.expander("Local weather cache", expanded=False):
+            weather_cache = _get_weather_cache()
+            try:
+                cache_stats = weather_cache.stats()
+                st.caption(
+                    f"{cache_stats['observations']} observations for {cache_stats['locations']} location(s) · "
+                    f"{_format_bytes(cache_stats['bytes'])} · `{weather_cache.path}`"
+                )
+            except Exception as exc:
+                st.warning(f"Weather cache unavailable: {exc}")
+            if st.button("Clear weather cache", key="weather_cache_clear"):
+                weather_cache.clear()
+                st.rerun()
 
     weather_df = ss.get("weather_df")
     if weather_df is None or weather_df.empty:
@@ -232,6 +420,8 @@ def weather_page() -> None:
 
     st.dataframe(weather_df, width='stretch')
 
+    _render_exclusion_controls(weather_df)
+
     ss["weather_show_raw"] = st.toggle(
         "Show raw weather object output table",
         value=ss.get("weather_show_raw", False),
@@ -0,0 +1,85 @@
+"""Sliding-window Leq and Ln traces over a log's raw samples.
+
+Each window trails its evaluation time ``t`` and holds the samples in
+``(t - window, t]``. Leq comes from the log's cumulative energy index, one
+pair of lookups per point. Ln comes from a histogram of dB values quantised
+to ``RESOLUTION_DB``, updated as the window slides: every sample enters and
+leaves it once, so a trace costs O(samples + points x bins) rather than a
+sort per window.
+"""
+import numpy as np
+
+from log_arrays import LogArrays
+
+RESOLUTION_DB = 0.1
+MAX_POINTS = 5000
+
+
+def evaluation_times(arrays: LogArrays, window_ns: int, max_points: int = MAX_POINTS) -> np.ndarray:
+    """Sample times whose window lies within the log, thinned to at most ``max_points``."""
+    timestamps = arrays.timestamps
+    if len(timestamps) < 2:
+        return timestamps[:0]
+    spacing = int(np.median(np.diff(timestamps[:1000])))
+    times = timestamps[timestamps >= timestamps[0] + window_ns - spacing]
+    stride = max(1, -(-len(times) // max_points))
+    return times[::stride]
+
+
+def window_rows(timestamps: np.ndarray, times: np.ndarray, window_ns: int) -> tuple[np.ndarray, np.ndarray]:
+    """(first row, end row) of the window trailing each evaluation time."""
+    starts = np.searchsorted(timestamps, times - window_ns, side="right")
+    ends = np.searchsorted(timestamps, times, side="right")
+    return starts, ends
+
+
+def sliding_leq(arrays: LogArrays, column: tuple, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    sums, counts = arrays.energy_sums(starts, ends, [column])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 10 * np.log10(sums[:, 0] / counts[:, 0])
+
+
+def sliding_ln(
+        values: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        percentiles: list[int],
+        resolution: float = RESOLUTION_DB,
+) -> dict[int, np.ndarray]:
+    """Ln (the level exceeded n % of the window) for each ``n`` in ``percentiles``.
+
+    Windows must move forward: ``starts`` and ``ends`` non-decreasing. Missing
+    values are left out of the windows they fall in.
+    """
+    results = {n: np.full(len(starts), np.nan) for n in percentiles}
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return results
+
+    quantised = np.round(values[valid] / resolution).astype("int64")
+    lowest = int(quantised.min())
+    nbins = int(quantised.max()) - lowest + 1
+    bins = np.full(len(values), -1, dtype="int64")
+    bins[valid] = quantised - lowest
+
+    def _counts(rows: np.ndarray) -> np.ndarray:
+        return np.bincount(rows[rows >= 0], minlength=nbins)
+
+    hist = np.zeros(nbins, dtype="int64")
+    held_start = held_end = 0
+    for point, (start, end) in enumerate(zip(starts, ends)):
+        if end > held_end:
+            hist += _counts(bins[held_end:end])
+            held_end = end
+        if start > held_start:
+            hist -= _counts(bins[held_start:start])
+            held_start = start
+        cumulative = np.cumsum(hist)
+        total = int(cumulative[-1])
+        if total == 0:
+            continue
+        for n in percentiles:
+            # Smallest level with at least (100 - n) % of the window at or below it.
+            rank = max(1, -(-(100 - n) * total // 100))
+            results[n][point] = (np.searchsorted(cumulative, rank) + lowest) * resolution
+    return results
@@ -1,15 +1,40 @@
+import contextlib
 import datetime as dt
+import functools
 import hashlib
+import hmac
+import importlib.util
 import io
+import itertools
+import json
 import os
 import tempfile
-from typing import Dict, Iterable, Tuple
+import threading
+import weakref
+import zipfile
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Tuple
 from uuid import uuid4
 
+import numpy as np
 import pandas as pd
-import pycoustic as pc
 import streamlit as st
 
+from jobs import JobCancelled, JobRunner, job_executor
+from leq_index import survey_table
+from log_arrays import LogArrays, attach_arrays, band_frequency, set_survey_periods
+from log_store import LogLease, SharedLogStore, default_budget, session_view
+from memory import MemoryRegistry, process_memory, session_report
+from sliding import evaluation_times, sliding_leq, sliding_ln, window_rows
+from stage_timer import StageTimer
+from tracing import span, tracing_enabled
+from weather_masks import DEFAULT_EXCLUSION, WeatherExcludedLog
+
+if TYPE_CHECKING:
+    # pycoustic loads its parsers and weather client on import; it is imported
+    # where logs are parsed or surveys built instead, to keep app startup light.
+    import pycoustic as pc
+
 COLOURS = {
     "Leq A": "#FBAE18",
     "L90 A": "#4d4d4d",
@@ -24,6 +49,64 @@ default_times = {
     "night": (23, 0),
 }
 
+SUMMARY_TABLE_KEYS = ["broadband_df", "leq_df", "lmax_df", "modal_df", "counts"]
+
+EXPORT_SPOOL_MAX_BYTES = 16 * 1024 * 1024
+EXPORT_CHUNK_ROWS = 50_000
+
+# Per-session limits on derived-data caches; least recently used entries go first.
+RESAMPLE_CACHE_ENTRIES = 16
+BAND_MATRIX_CACHE_ENTRIES = 16
+SLIDING_CACHE_ENTRIES = 32
+
+MEMORY_TABLE_KEYS = SUMMARY_TABLE_KEYS + ["peak_picker_df", "weather_df"]
+MEMORY_CACHE_KEYS = ["resample_cache", "band_matrix_cache", "sliding_cache", "weather_masked_logs", "prepared_exports"]
+
+BUNDLE_FORMAT = "pycoustic-analysis-bundle"
+BUNDLE_COMPRESSION = "zstd"
+BUNDLE_TABLE_KEYS = SUMMARY_TABLE_KEYS + ["peak_picker_df"]
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_MAX_COLUMNS = 16_384
+WORKSPACE_FORMAT = "pycoustic-workspace"
+WORKSPACE_SETTING_KEYS = [
+    "times",
+    "modal_params",
+    "lmax_n",
+    "lmax_t",
+    "l90_averaging",
+    "analysis_selected_logs",
+    "counts_include_all",
+    "counts_all_t",
+    "counts_facet_overlap",
+    "weather_country",
+    "weather_postcode",
+    "weather_units",
+    "weather_interval_hours",
+    "weather_df_interval_hours",
+    "weather_exclusion",
+]
+# Widgets that mirror restored settings; dropped so they re-read session state.
+WORKSPACE_WIDGET_KEYS = [
+    "day_start",
+    "evening_start",
+    "night_start",
+    "bb_lmax_n",
+    "bb_lmax_t",
+    "analysis_log_filter",
+    "weather_exclusion_enabled",
+    "weather_exclusion_wind",
+    "weather_exclusion_gust",
+    "weather_exclusion_rain",
+]
+
+# How the current thread's last export build went: set to "hit" before a call
+# into an st.cache_data builder, and to "miss" by its body, which runs only when
+# the cache has no entry. None when the build does not go through such a cache.
+_export_cache = threading.local()
+
+# Process-wide so versions never collide between sessions sharing st.cache_data.
+_table_versions = itertools.count(1)
+
 TEMPLATE_COLUMNS = [
     "Time",
     "Leq A",
@@ -62,11 +145,20 @@ def init_app_state():
     ss.setdefault("lmax_t", 2)
     ss.setdefault("tmp_paths", [])
     ss.setdefault("logs", {})
+    ss.setdefault("log_sources", {})
+    ss.setdefault("session_id", uuid4().hex)
+    if "log_lease" not in ss:
+        ss["log_lease"] = LogLease(get_log_store(), ss["session_id"])
+    if "jobs" not in ss:
+        ss["jobs"] = JobRunner(get_job_executor())
+    if "stage_timer" not in ss:
+        ss["stage_timer"] = StageTimer()
     ss.setdefault("broadband_df", pd.DataFrame())
     ss.setdefault("leq_df", pd.DataFrame())
     ss.setdefault("lmax_df", pd.DataFrame())
     ss.setdefault("modal_df", pd.DataFrame())
     ss.setdefault("counts", pd.DataFrame())
+    ss.setdefault("peak_picker_df", pd.DataFrame())
     ss.setdefault("survey", None)
     ss.setdefault("num_logs", 0)
     ss.setdefault("pending_uploads", [])
@@ -87,7 +179,19 @@ def init_app_state():
     ss.setdefault("owm_api_key", "")
     ss.setdefault("weather_df", pd.DataFrame())
     ss.setdefault("weather_show_raw", False)
-    pd.options.plotting.backend = "plotly"
+    ss.setdefault("weather_use_cache", True)
+    ss.setdefault("weather_offline", False)
+    ss.setdefault("weather_max_workers", 8)
+    ss.setdefault("weather_max_requests_per_s", 10.0)
+    ss.setdefault("weather_version", 0)
+    ss.setdefault("weather_df_interval_hours", 12)
+    ss.setdefault("weather_exclusion", DEFAULT_EXCLUSION.copy())
+    ss.setdefault("weather_masked_logs", {})
+    for key, cache in _new_log_caches().items():
+        ss.setdefault(key, cache)
+    ss.setdefault("logs_version", 0)
+    ss.setdefault("table_registry", {})
+    ss.setdefault("prepared_exports", PreparedExports())
     return ss
 
 
@@ -96,18 +200,19 @@ def get_data() -> pd.DataFrame:
     return pd.DataFrame(columns=TEMPLATE_COLUMNS)
 
 
-@st.cache_data
-def to_csv_preserve_multiheader(df: pd.DataFrame) -> bytes:
-    if df is None:
+# Leading-underscore arguments are not hashed by st.cache_data; ``version`` is the cache key.
+@st.cache_data(max_entries=64)
+def to_csv_preserve_multiheader(_df: pd.DataFrame, version) -> bytes:
+    if _df is None:
         return b""
-    return df.to_csv(index=True).encode("utf-8")
+    return _read_export(write_table_csv(_df, index=True))
 
 
-@st.cache_data
-def _convert_for_download(df: pd.DataFrame) -> bytes:
-    if df is None:
+@st.cache_data(max_entries=8)
+def _convert_for_download(_df: pd.DataFrame, version) -> bytes:
+    if _df is None:
         return b""
-    return df.to_csv(index=False).encode("utf-8")
+    return _df.to_csv(index=False).encode("utf-8")
 
 
 @st.cache_data
@@ -123,6 +228,62 @@ def _cleanup_tmp_files(paths) -> None:
             pass
 
 
+class SessionLRU(OrderedDict):
+    """Per-session cache keeping at most ``max_entries``, least recently used evicted first."""
+
+    def __init__(self, max_entries: int) -> None:
+        super().__init__()
+        self.max_entries = max_entries
+
+    def lookup(self, key):
+        value = self.get(key)
+        if value is not None:
+            self.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.max_entries:
+            self.popitem(last=False)
+        return value
+
+
+def _new_log_caches() -> dict[str, SessionLRU]:
+    return {
+        "resample_cache": SessionLRU(RESAMPLE_CACHE_ENTRIES),
+        "band_matrix_cache": SessionLRU(BAND_MATRIX_CACHE_ENTRIES),
+        "sliding_cache": SessionLRU(SLIDING_CACHE_ENTRIES),
+    }
+
+
+class PreparedExports(dict):
+    """A session's prepared downloads, ``{name: (export key, file path)}``.
+
+    The bytes live in temporary files rather than session state, so the only
+    in-memory copy is the one st.download_button hands to the browser. Files
+    are deleted when replaced and when the session state drops this object.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._paths: list[str] = []
+        weakref.finalize(self, _cleanup_tmp_files, self._paths)
+
+    def store(self, name: str, export_key: tuple, data: bytes) -> None:
+        with tempfile.NamedTemporaryFile(prefix="pycoustic-export-", delete=False) as out:
+            out.write(data)
+        self.discard(name)
+        self._paths.append(out.name)
+        self[name] = (export_key, out.name)
+
+    def discard(self, name: str) -> None:
+        entry = self.pop(name, None)
+        if entry is not None:
+            _cleanup_tmp_files([entry[1]])
+            self._paths.remove(entry[1])
+
+
 def parse_times(
         day_start: dt.time,
         evening_start: dt.time,
@@ -151,6 +312,333 @@ def _format_bytes(num_bytes: int) -> str:
     return f"{size:.2f} PB"
 
 
+@st.cache_resource
+def get_job_executor():
+    """Worker threads shared by every session's background jobs."""
+    return job_executor()
+
+
+@st.cache_resource
+def start_analysis_api(port: int, host: str = "127.0.0.1"):
+    """Serve the HTTP analysis API from this process, sharing the app's parsed-log store."""
+    from api_server import start_server
+
+    return start_server(host, port, store=get_log_store())
+
+
+def render_job_status(job, *, cancel_key: str, poll_s: float = 0.5) -> None:
+    """Progress and a cancel button for a running job; reruns the app once it finishes."""
+
+    @st.fragment(run_every=poll_s)
+    def _poll() -> None:
+        if job.finished:
+            st.rerun()
+        st.progress(job.progress, text=job.text or f"{job.name} running…")
+        st.button("Cancel", key=cancel_key, on_click=job.cancel)
+
+    _poll()
+
+
+def timed_stage(name: str):
+    """Time a named stage of this rerun when stage timings are switched on; a no-op otherwise.
+
+    Uses session state, so call it from the script thread only, never from a job.
+    """
+    timer = st.session_state.get("stage_timer")
+    if timer is None or not timer.enabled:
+        return contextlib.nullcontext()
+    return timer.stage(name)
+
+
+def timed(name: str):
+    """Decorator form of ``timed_stage``."""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed_stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def traced(name: str, **fields):
+    """Trace span tagged with this session's id; yields a dict for extra fields. Script thread only."""
+    return span(name, session=st.session_state.get("session_id"), **fields)
+
+
+@contextlib.contextmanager
+def traced_stage(name: str, survey: "pc.Survey | None" = None, **fields):
+    """``timed_stage`` and ``traced`` together, with the survey's log sizes on the span."""
+    if survey is not None:
+        fields.update(trace_sizes(getattr(survey, "_logs", {}).values()))
+    with timed_stage(name), traced(name, **fields) as trace:
+        yield trace
+
+
+def trace_sizes(logs: Iterable) -> dict[str, int]:
+    """Input sizes for a trace span: log count, total rows and the widest band count."""
+    if not tracing_enabled():
+        return {}
+    logs = list(logs)
+    rows = 0
+    bands = 0
+    for log in logs:
+        master = getattr(log, "_master", None)
+        if not isinstance(master, pd.DataFrame):
+            continue
+        rows += len(master)
+        bands = max(
+            bands,
+            len({col[1] for col in master.columns if isinstance(col, tuple) and band_frequency(col[1]) is not None}),
+        )
+    return {"logs": len(logs), "rows": rows, "bands": bands}
+
+
+def render_stage_timings() -> None:
+    """Breakdown of the rerun just finished, its slowest stages, and a JSON export of recent reruns."""
+    timer = st.session_state.get("stage_timer")
+    if timer is None or not timer.enabled:
+        return
+
+    rows = timer.breakdown()
+    rerun = timer.current()
+    st.caption(f"{rerun['label'] or 'Rerun'}: {rerun['total_s'] * 1000:.0f} ms")
+    if not rows:
+        st.caption("No stages recorded yet.")
+    else:
+        table = pd.DataFrame(
+            {
+                "Stage": [" " * row["depth"] + row["name"] for row in rows],
+                "ms": [round(row["seconds"] * 1000, 1) for row in rows],
+                "Self ms": [round(row["self_s"] * 1000, 1) for row in rows],
+            }
+        )
+        if any("peak_bytes" in row for row in rows):
+            table["Peak MB"] = [
+                round(row["peak_bytes"] / 1024 ** 2, 1) if "peak_bytes" in row else None for row in rows
+            ]
+        st.dataframe(table, hide_index=True, width='stretch')
+        st.markdown(
+            "**Slowest**\n"
+            + "\n".join(
+                f"- {entry['name']}: {entry['self_s'] * 1000:.0f} ms"
+                + (f" ({entry['calls']} calls)" if entry["calls"] > 1 else "")
+                for entry in timer.slowest()
+            )
+        )
+    st.download_button(
+        "Export timings (JSON)",
+        data=timer.to_json(),
+        file_name="pycoustic-stage-timings.json",
+        mime="application/json",
+        key="dl_stage_timings",
+        width='stretch',
+        help=f"The last {timer.history.maxlen} reruns with stage timings switched on.",
+    )
+
+
+@st.cache_resource
+def get_log_store() -> SharedLogStore:
+    """Parsed logs shared by every session in this server process."""
+    return SharedLogStore(*default_budget())
+
+
+@st.cache_resource
+def get_memory_registry() -> MemoryRegistry:
+    """Each live session's latest memory report, for process-wide totals."""
+    return MemoryRegistry()
+
+
+def session_memory_report() -> dict:
+    """Deep sizes of this session's logs, staged uploads, tables and caches; also published for admins."""
+    ss = st.session_state
+    report = session_report(
+        ss,
+        table_keys=MEMORY_TABLE_KEYS,
+        cache_keys=MEMORY_CACHE_KEYS,
+        shared_logs=ss.get("log_sources", {}).keys(),
+        shared_data=get_log_store().held_logs(ss["log_lease"].holder),
+    )
+    get_memory_registry().publish(ss["session_id"], report, owner=ss["log_lease"])
+    return report
+
+
+def process_memory_report() -> dict:
+    """Process memory, with shared logs counted once in the log store and sessions counting their own data."""
+    log_store, sessions = get_log_store().stats(), get_memory_registry().totals()
+    return {
+        "process": process_memory(),
+        "log_store": log_store,
+        "sessions": sessions,
+        "tracked_bytes": log_store["bytes"] + sessions["bytes"],
+    }
+
+
+def is_admin() -> bool:
+    """True when the page was opened with ``?admin=<PYCOUSTIC_ADMIN_TOKEN>``."""
+    token = os.environ.get("PYCOUSTIC_ADMIN_TOKEN", "")
+    supplied = st.query_params.get("admin", "")
+    return bool(token) and hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8"))
+
+
+def parse_log_file(path: str) -> tuple:
+    """Parse a CSV/XLSX log into ((profile name or None, Log), ...); multi-profile files yield one Log per profile."""
+    import pycoustic as pc
+
+    try:
+        logs = ((None, pc.Log(path)),)
+    except NotImplementedError:
+        # Multi-sheet XLSX (Nor145, etc.) — use parse_all
+        from pycoustic.parsers.nor145_multi_th import Nor145MultipleTHParser
+        parser = Nor145MultipleTHParser()
+        profiles = parser.parse_all(path)
+        logs = tuple(
+            (prof_name, pc.Log.from_dataframe(prof_df, filepath=path, name=prof_name))
+            for prof_name, prof_df in profiles
+        )
+    # Built before the log is shared, so every session view reuses its period labels.
+    for _, log in logs:
+        attach_arrays(log)
+    return logs
+
+
+def _parse_log_bytes(data: bytes, original_name: str, tmp_paths: list[str] | None = None) -> tuple:
+    """Parse an uploaded file into ((profile name or None, Log), ...).
+
+    The temporary copy's path goes to ``tmp_paths``, or to the session's when
+    not given; jobs, which cannot touch session state, pass their own list.
+    """
+    if tmp_paths is None:
+        tmp_paths = st.session_state["tmp_paths"]
+    orig_ext = os.path.splitext(original_name)[1].lower() or ".csv"
+    tmp_file = tempfile.NamedTemporaryFile(mode="wb", suffix=orig_ext, delete=False)
+    tmp_file.write(data)
+    tmp_file.flush()
+    tmp_file.close()
+    tmp_paths.append(tmp_file.name)
+    return parse_log_file(tmp_file.name)
+
+
+def import_uploads(ctx, lease: LogLease, items: list[dict], session_id: str | None = None) -> dict:
+    """Parse staged uploads through the shared log store, one file at a time. Runs as a job.
+
+    Returns ``{"results": [{"id", "key", "parsed"} or {"id", "error"}, ...], "tmp_paths": [...]}``
+    for ``publish_imports``. Cancellation is checked between files; logs acquired
+    before it are released again, as they will not be published.
+    """
+    results = []
+    tmp_paths: list[str] = []
+    acquired = []
+    try:
+        for idx, item in enumerate(items):
+            ctx.progress(idx / len(items), f"Importing {item['original_name']} ({idx + 1} of {len(items)})…")
+            parses = []
+
+            def _parse(item=item) -> tuple:
+                parses.append(item["hash"])
+                return _parse_log_bytes(item["data"], item["original_name"], tmp_paths)
+
+            try:
+                with ctx.stage("import"), span(
+                        "import", session=session_id, file=item["original_name"], bytes=item["size"]
+                ) as trace:
+                    parsed = lease.acquire(item["hash"], _parse)
+                    trace["cache"] = "miss" if parses else "hit"
+                    trace.update(trace_sizes(log for _, log in parsed))
+            except Exception as exc:
+                results.append({"id": item["id"], "error": f"Failed to create log from {item['original_name']}: {exc}"})
+                continue
+            acquired.append(item["hash"])
+            results.append({"id": item["id"], "key": item["hash"], "parsed": parsed})
+        ctx.check()
+    except JobCancelled:
+        for key in acquired:
+            lease.release(key)
+        _cleanup_tmp_files(tmp_paths)
+        raise
+    return {"results": results, "tmp_paths": tmp_paths}
+
+
+def publish_imports(output: dict) -> int:
+    """Add an ``import_uploads`` result to the session's logs under unique names; returns the files added.
+
+    Files that failed stay staged, with their errors in ``import_errors``.
+    """
+    ss = st.session_state
+    ss["tmp_paths"].extend(output["tmp_paths"])
+    queue = {item["id"]: item for item in ss.get("pending_uploads", [])}
+    existing_names = set(ss["logs"].keys())
+    errors = []
+    succeeded_ids: list[str] = []
+
+    for result in output["results"]:
+        item = queue.get(result["id"])
+        if "error" in result:
+            errors.append(result["error"])
+            continue
+        if item is None:
+            # Removed from the staging list while importing.
+            ss["log_lease"].release(result["key"])
+            continue
+
+        default_name = os.path.splitext(os.path.basename(item["original_name"]))[0]
+        final_name = custom_name = item.get("custom_name") or default_name
+        suffix = 1
+        while final_name in existing_names:
+            final_name = f"{custom_name}-{suffix}"
+            suffix += 1
+        existing_names.add(final_name)
+
+        for prof_name, log in result["parsed"]:
+            log_key = final_name
+            if prof_name is not None:
+                suffix_n = 1
+                log_key = f"{final_name} - {prof_name}"
+                while log_key in existing_names:
+                    log_key = f"{final_name} - {prof_name} ({suffix_n})"
+                    suffix_n += 1
+                existing_names.add(log_key)
+            ss["logs"][log_key] = session_view(log)
+            ss["log_sources"][log_key] = (item["hash"], prof_name)
+        succeeded_ids.append(item["id"])
+
+    ss["import_errors"] = errors
+    if succeeded_ids:
+        _clear_log_caches()
+        ss["last_upload_ts"] = dt.datetime.now()
+        ss["num_logs"] = len(ss["logs"])
+        for upload_id in succeeded_ids:
+            ss.pop(f"log_name_{upload_id}", None)
+        _update_pending_uploads([item for item in queue.values() if item["id"] not in succeeded_ids])
+    return len(succeeded_ids)
+
+
+def render_import_status() -> None:
+    """Progress of a running log import, publishing its logs once it is done."""
+    ss = st.session_state
+    job = ss["jobs"].get("import_logs")
+    if job is not None:
+        if job.status == "done":
+            for step, seconds in job.stages.items():
+                ss["stage_timer"].record(f"job:import_logs.{step}", seconds)
+            ss["jobs"].discard("import_logs")
+            if publish_imports(job.result):
+                st.rerun()
+        elif job.status == "cancelled":
+            ss["jobs"].discard("import_logs")
+            st.warning("Log import was cancelled; the remaining files are still staged.")
+        elif job.status == "failed":
+            ss["jobs"].discard("import_logs")
+            st.error(f"Log import failed: {job.error}")
+        else:
+            render_job_status(job, cancel_key="import_logs_cancel")
+    for error in ss.get("import_errors", []):
+        st.error(error)
+
+
 def _update_pending_uploads(queue: list[dict]) -> None:
     st.session_state["pending_uploads"] = queue
 
@@ -242,11 +730,21 @@ def _render_upload_modal_contents() -> None:
     else:
         st.info("No files staged yet. Drag and drop CSV or XLSX files above to begin.")
 
+    store_stats = get_log_store().stats(ss["session_id"])
+    st.caption(
+        f"Shared log cache: {_format_bytes(store_stats['bytes'])} of {_format_bytes(store_stats['max_bytes'])} "
+        f"in use across {store_stats['sessions']} session(s); this session holds "
+        f"{_format_bytes(store_stats['session_bytes'])} of {_format_bytes(store_stats['max_session_bytes'])}. "
+        "Files already loaded by another session are reused without re-parsing."
+    )
+
+    import_job = ss["jobs"].get("import_logs")
+    importing = import_job is not None and not import_job.finished
     add_col, close_col = st.columns([3, 1])
     with add_col:
         add_clicked = st.button(
             f"Add {len(queue)} file(s) as logs" if queue else "Add files as logs",
-            disabled=not queue,
+            disabled=not queue or importing,
             width='stretch',
             key="modal_add_logs",
         )
@@ -256,88 +754,42 @@ def _render_upload_modal_contents() -> None:
             st.rerun()
 
     if add_clicked and queue:
-        with st.spinner("Importing log data..."):
-            existing_names = set(ss["logs"].keys())
-            succeeded_ids: list[str] = []
-            added = 0
-
-            for item in list(queue):
-                default_name = os.path.splitext(os.path.basename(item["original_name"]))[0]
-                custom_name = item.get("custom_name") or default_name
-
-                if not custom_name:
-                    st.error(f"Name for {item['original_name']} cannot be empty.")
-                    continue
-
-                final_name = custom_name
-                suffix = 1
-                while final_name in existing_names:
-                    final_name = f"{custom_name}-{suffix}"
-                    suffix += 1
-                existing_names.add(final_name)
-
-                orig_ext = os.path.splitext(item["original_name"])[1].lower() or ".csv"
-                tmp_file = tempfile.NamedTemporaryFile(mode="wb", suffix=orig_ext, delete=False)
-                tmp_file.write(item["data"])
-                tmp_file.flush()
-                tmp_file.close()
-                ss["tmp_paths"].append(tmp_file.name)
-
-                try:
-                    log = pc.Log(tmp_file.name)
-                    ss["logs"][final_name] = log
-                    succeeded_ids.append(item["id"])
-                    added += 1
-                except NotImplementedError:
-                    # Multi-sheet XLSX (Nor145, etc.) — use parse_all
-                    try:
-                        from pycoustic.parsers.nor145_multi_th import Nor145MultipleTHParser
-                        parser = Nor145MultipleTHParser()
-                        profiles = parser.parse_all(tmp_file.name)
-                        for prof_name, prof_df in profiles:
-                            log = pc.Log.from_dataframe(prof_df, filepath=tmp_file.name, name=prof_name)
-                            suffix_n = 1
-                            log_key = f"{final_name} - {prof_name}"
-                            while log_key in existing_names:
-                                log_key = f"{final_name} - {prof_name} ({suffix_n})"
-                                suffix_n += 1
-                            existing_names.add(log_key)
-                            ss["logs"][log_key] = log
-                        succeeded_ids.append(item["id"])
-                        added += 1
-                    except Exception as exc:
-                        st.error(f"Failed to create log from {item['original_name']}: {exc}")
-                        continue
-                except Exception as exc:
-                    st.error(f"Failed to create log from {item['original_name']}: {exc}")
-                    continue
-
-            if added:
-                ss["last_upload_ts"] = dt.datetime.now()
-                ss["num_logs"] = len(ss["logs"])
-                for upload_id in succeeded_ids:
-                    st.session_state.pop(f"log_name_{upload_id}", None)
-                queue = [item for item in queue if item["id"] not in succeeded_ids]
-                _update_pending_uploads(queue)
-                st.success(f"Added {added} log(s).")
-                if not queue:
-                    ss["show_upload_modal"] = False
-                st.rerun()
+        # Parsed off the script thread; the Data Loader shows progress and publishes the logs.
+        ss["import_errors"] = []
+        ss["jobs"].submit(
+            "import_logs",
+            tuple(item["id"] for item in queue),
+            import_uploads,
+            ss["log_lease"],
+            list(queue),
+            session_id=ss["session_id"],
+        )
+        ss["show_upload_modal"] = False
+        st.rerun()
 
 
 def _reset_workspace() -> None:
     ss = st.session_state
     _cleanup_tmp_files(ss.get("tmp_paths", []))
     ss["tmp_paths"] = []
+    ss["jobs"].cancel_all()
+    ss["log_lease"].release_all()
     ss["logs"] = {}
+    ss["log_sources"] = {}
     ss["broadband_df"] = pd.DataFrame()
     ss["leq_df"] = pd.DataFrame()
     ss["lmax_df"] = pd.DataFrame()
     ss["modal_df"] = pd.DataFrame()
     ss["counts"] = pd.DataFrame()
-    ss["weather_df"] = pd.DataFrame()
+    ss["peak_picker_df"] = pd.DataFrame()
+    set_weather_df(pd.DataFrame())
+    ss["weather_exclusion"] = DEFAULT_EXCLUSION.copy()
+    _clear_log_caches()
+    ss["table_registry"] = {}
+    ss["prepared_exports"] = PreparedExports()
     ss["survey"] = None
     ss["pending_uploads"] = []
+    ss["import_errors"] = []
     ss["num_logs"] = 0
     ss["last_upload_ts"] = None
     ss["analysis_selected_logs"] = []
@@ -352,46 +804,381 @@ def _reset_workspace() -> None:
     st.rerun()
 
 
+def _excel_sheet_name(name: str, used: set[str], suffix: str = "") -> str:
+    stem = "".join("_" if ch in "[]:*?/\\" else ch for ch in str(name)).strip("'") or "Sheet"
+    candidate = stem[: 31 - len(suffix)] + suffix
+    counter = 1
+    while candidate.lower() in used:
+        tail = f" ({counter})"
+        candidate = stem[: 31 - len(suffix) - len(tail)] + suffix + tail
+        counter += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def _write_excel_value(sheet, row: int, col: int, value, date_format) -> None:
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or value is pd.NaT:
+        return
+    if isinstance(value, float):
+        if np.isnan(value):
+            return
+        if np.isinf(value):
+            sheet.write_string(row, col, str(value))
+            return
+    if isinstance(value, dt.datetime):
+        sheet.write_datetime(row, col, value.replace(tzinfo=None), date_format)
+    elif isinstance(value, bool):
+        sheet.write_boolean(row, col, value)
+    elif isinstance(value, (int, float)):
+        sheet.write_number(row, col, value)
+    else:
+        sheet.write_string(row, col, str(value))
+
+
+def _write_excel_sheet(sheet, frame: pd.DataFrame | pd.Series, date_format) -> None:
+    """Write header rows, then data rows in order, as xlsxwriter's constant_memory mode requires."""
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame()
+
+    n_index = frame.index.nlevels
+    n_header = frame.columns.nlevels
+
+    for level in range(n_header):
+        if level == n_header - 1:
+            for idx_col, index_name in enumerate(frame.index.names):
+                _write_excel_value(sheet, level, idx_col, index_name, date_format)
+        for col_idx, label in enumerate(frame.columns):
+            part = label[level] if isinstance(label, tuple) else label
+            _write_excel_value(sheet, level, n_index + col_idx, part, date_format)
+
+    for row_offset, row in enumerate(frame.itertuples(index=True, name=None)):
+        excel_row = n_header + row_offset
+        index_value = row[0] if n_index > 1 else (row[0],)
+        for idx_col, value in enumerate(index_value):
+            _write_excel_value(sheet, excel_row, idx_col, value, date_format)
+        for col_idx, value in enumerate(row[1:]):
+            _write_excel_value(sheet, excel_row, n_index + col_idx, value, date_format)
+
+    sheet.freeze_panes(n_header, n_index)
+
+
 def _export_frames_to_excel(frames: dict[str, pd.DataFrame]) -> bytes:
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        for sheet_name, frame in frames.items():
-            if frame is None or frame.empty:
-                continue
-            export_frame = frame.copy()
-            if isinstance(export_frame.columns, pd.MultiIndex):
-                export_frame.columns = [
-                    " | ".join(str(level) for level in col if level not in (None, ""))
-                    for col in export_frame.columns.to_flat_index()
-                ]
-            if isinstance(export_frame.index, pd.MultiIndex):
-                export_frame = export_frame.reset_index()
-            export_frame.to_excel(writer, sheet_name=(sheet_name[:31] or "Sheet1"), index=False)
+    """One sheet per frame; frames longer than an Excel sheet continue on numbered sheets."""
+    import xlsxwriter
+
+    frames = {
+        name: frame.to_frame() if isinstance(frame, pd.Series) else frame
+        for name, frame in frames.items()
+        if frame is not None and not frame.empty
+    }
+    for sheet_name, frame in frames.items():
+        width = frame.index.nlevels + frame.shape[1]
+        if width > EXCEL_MAX_COLUMNS:
+            raise ValueError(
+                f"{sheet_name!r} has {width:,} columns; an Excel sheet holds at most {EXCEL_MAX_COLUMNS:,}. "
+                "Use the Parquet bundle or CSV export for this table."
+            )
+
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode="w+b")
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+    used_names: set[str] = set()
+    for sheet_name, frame in frames.items():
+        rows_per_sheet = EXCEL_MAX_ROWS - frame.columns.nlevels
+        starts = range(0, len(frame), rows_per_sheet)
+        for part, start in enumerate(starts, start=1):
+            suffix = f" ({part} of {len(starts)})" if len(starts) > 1 else ""
+            sheet = workbook.add_worksheet(_excel_sheet_name(sheet_name, used_names, suffix))
+            _write_excel_sheet(sheet, frame.iloc[start:start + rows_per_sheet], date_format)
+    if not used_names:
+        workbook.add_worksheet("No data")
+    workbook.close()
     output.seek(0)
-    return output.getvalue()
+    return _read_export(output)
+
+
+def _clear_log_caches() -> None:
+    ss = st.session_state
+    ss.update(_new_log_caches())
+    ss["weather_masked_logs"] = {}
+    ss["logs_version"] = ss.get("logs_version", 0) + 1
+
 
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
 
+
+def table_signature(method: str, log_names: Iterable[str] | None = None, **kwargs) -> tuple:
+    """Cheap identity for a survey table: loaded-log version, logs, periods and call arguments."""
+    ss = st.session_state
+    return (
+        ss.get("logs_version", 0),
+        tuple(log_names or ()),
+        _freeze(ss.get("times")),
+        _active_weather_exclusion(),
+        method,
+        _freeze(kwargs),
+    )
+
+
+def publish_table(key: str, df: pd.DataFrame | None, signature: tuple) -> None:
+    """Store a computed table in session state and register its version.
+
+    A new process-wide version is drawn only when the table's signature changes,
+    so downstream caches can key on ``table_version(key)`` instead of hashing the frame.
+    """
+    ss = st.session_state
+    registry = ss.setdefault("table_registry", {})
+    entry = registry.get(key)
+    if entry is None or entry["signature"] != signature:
+        registry[key] = {"signature": signature, "version": next(_table_versions)}
+    ss[key] = df
+
+
+def table_is_current(key: str, signature: tuple) -> bool:
+    entry = st.session_state.get("table_registry", {}).get(key)
+    return entry is not None and entry["signature"] == signature
+
+
+def table_version(key: str) -> int:
+    entry = st.session_state.get("table_registry", {}).get(key)
+    return 0 if entry is None else entry["version"]
+
+
+def table_csv(key: str) -> bytes:
+    return to_csv_preserve_multiheader(st.session_state.get(key), table_version(key))
+
+
+def _resample_entry(name: str, t: str) -> tuple[int, pd.DataFrame]:
+    ss = st.session_state
+    averaging = ss.get("l90_averaging", "log")
+    cache = ss["resample_cache"]
+    key = (name, t, averaging, _freeze(ss.get("times")))
+    entry = cache.lookup(key)
+    with traced("resample", interval=t, averaging=averaging, cache="miss" if entry is None else "hit") as trace:
+        if entry is None:
+            log = ss["logs"][name]
+            trace.update(trace_sizes([log]))
+            with timed_stage("as_interval"):
+                df = log.as_interval(t=t, averaging=averaging, ln_averaging=averaging)
+            entry = cache.put(key, (next(_table_versions), df))
+        return entry
+
+
+def get_resampled_log(name: str, t: str) -> pd.DataFrame:
+    """Return ``as_interval`` output for a loaded log, cached per (log, interval, averaging, periods)."""
+    return _resample_entry(name, t)[1]
+
+
+def resampled_log_csv(name: str, t: str) -> bytes:
+    version, df = _resample_entry(name, t)
+    return to_csv_preserve_multiheader(df, version)
+
+
+def get_band_matrix(name: str, t: str, family: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return (timestamps, band frequencies, band x time matrix) for one column family.
+
+    The matrix is a contiguous float64 copy taken from the interval's ``LogArrays``
+    once per log, interval and family, and reused across reruns until the loaded
+    logs change.
+    """
+    ss = st.session_state
+    averaging = ss.get("l90_averaging", "log")
+    cache = ss["band_matrix_cache"]
+    key = (name, t, averaging, _freeze(ss.get("times")), family)
+    entry = cache.lookup(key)
+    if entry is None:
+        df = get_resampled_log(name, t)
+        with timed_stage("band_matrix"):
+            freqs, matrix = LogArrays(df).band_matrix(family)
+            entry = cache.put(key, (df.index.to_numpy(), freqs, matrix))
+    return entry
+
+
+def get_sliding_trace(name: str, column: tuple, metric: str, window_minutes: int) -> pd.Series:
+    """Sliding-window ``metric`` ("Leq", or an Ln such as "L90") of one Leq column of a loaded log.
+
+    Computed from the raw samples, not the resampled data, and cached until the
+    loaded logs change.
+    """
+    ss = st.session_state
+    cache = ss["sliding_cache"]
+    key = (name, column, metric, int(window_minutes))
+    series = cache.lookup(key)
+    if series is None:
+        arrays = attach_arrays(ss["logs"][name])
+        window_ns = int(pd.Timedelta(minutes=int(window_minutes)).value)
+        with timed_stage(f"sliding:{metric}"):
+            times = evaluation_times(arrays, window_ns)
+            starts, ends = window_rows(arrays.timestamps, times, window_ns)
+            if metric == "Leq":
+                values = sliding_leq(arrays, column, starts, ends)
+            else:
+                n = int(metric[1:])
+                values = sliding_ln(arrays.column(column), starts, ends, [n])[n]
+        series = cache.put(key, pd.Series(np.round(values, 1), index=pd.DatetimeIndex(times.view("datetime64[ns]"))))
+    return series
+
+
+def set_weather_df(weather_df: pd.DataFrame, interval_hours: int | None = None) -> None:
+    ss = st.session_state
+    ss["weather_df"] = weather_df
+    if interval_hours is not None:
+        ss["weather_df_interval_hours"] = int(interval_hours)
+    ss["weather_version"] = ss.get("weather_version", 0) + 1
+    ss["weather_masked_logs"] = {}
+
+
+def _active_weather_exclusion() -> tuple | None:
+    """(weather version, thresholds) when weather exclusion applies to survey tables, else None."""
+    ss = st.session_state
+    settings = ss.get("weather_exclusion") or {}
+    weather_df = ss.get("weather_df")
+    if not settings.get("enabled") or weather_df is None or weather_df.empty:
+        return None
+    return ss.get("weather_version", 0), _freeze(settings)
+
+
+def _survey_log(name: str, log, detached: bool = False):
+    """The log as a survey should see it; ``detached`` gives a private view safe to use off the script thread."""
+    active = _active_weather_exclusion()
+    if active is None:
+        return session_view(log) if detached else log
+    ss = st.session_state
+    cache = ss.setdefault("weather_masked_logs", {})
+    key = (name, active)
+    if key not in cache:
+        cache[key] = WeatherExcludedLog(
+            log,
+            ss["weather_df"],
+            ss["weather_exclusion"],
+            tolerance=pd.Timedelta(hours=int(ss.get("weather_df_interval_hours", 12))),
+        )
+    return cache[key].with_log(session_view(log)) if detached else cache[key]
+
+
+@timed("build_survey")
 def _build_survey(
         times: Dict[str, Tuple[int, int]] | None = None,
         log_names: Iterable[str] | None = None,
-) -> pc.Survey:
+        detached: bool = False,
+) -> "pc.Survey":
+    import pycoustic as pc
+
     survey = pc.Survey()
     logs = st.session_state.get("logs", {})
 
     if log_names:
         for name in log_names:
             if name in logs:
-                survey.add_log(data=logs[name], name=name)
+                survey.add_log(data=_survey_log(name, logs[name], detached), name=name)
     else:
         for name, log in logs.items():
-            survey.add_log(data=log, name=name)
+            survey.add_log(data=_survey_log(name, log, detached), name=name)
 
     if times:
-        survey.set_periods(times=times)
+        set_survey_periods(survey, times)
 
     return survey
 
 
+def summary_table_calls(
+        *,
+        lmax_n: int,
+        lmax_t: str,
+        modal_param,
+        day_t: str,
+        evening_t: str,
+        night_t: str,
+        averaging: str,
+        include_all: bool = False,
+        all_t: str = "15min",
+) -> dict[str, tuple[str, dict]]:
+    """``{table key: (survey method, kwargs)}`` for the five Data Loader summary tables."""
+    modal_kwargs = dict(
+        cols=[modal_param],
+        day_t=day_t,
+        evening_t=evening_t,
+        night_t=night_t,
+        include_all=include_all,
+        all_t=all_t,
+        averaging=averaging,
+    )
+    return {
+        "broadband_df": ("broadband_summary", dict(lmax_n=lmax_n, lmax_t=lmax_t)),
+        "leq_df": ("leq_spectra", {}),
+        "lmax_df": ("lmax_spectra", dict(n=lmax_n, t=lmax_t, period="nights")),
+        "modal_df": ("modal", dict(by_date=False, **modal_kwargs)),
+        "counts": ("counts", modal_kwargs),
+    }
+
+
+def session_table_calls() -> dict[str, tuple[str, dict]]:
+    """``summary_table_calls`` for this session's settings.
+
+    Every page builds its table calls here, so one set of settings gives one
+    signature per table and switching pages does not republish unchanged tables.
+    """
+    ss = st.session_state
+    modal_param, day_t, evening_t, night_t = ss["modal_params"]
+    return summary_table_calls(
+        lmax_n=int(ss["lmax_n"]),
+        lmax_t=f"{int(ss['lmax_t'])}min",
+        modal_param=modal_param,
+        day_t=day_t,
+        evening_t=evening_t,
+        night_t=night_t,
+        averaging=ss.get("l90_averaging", "log"),
+        include_all=bool(ss.get("counts_include_all", False)),
+        all_t=ss.get("counts_all_t", "15min"),
+    )
+
+
+def compute_summary_tables(
+        ctx,
+        survey: "pc.Survey",
+        times: Dict[str, Tuple[int, int]],
+        calls: dict[str, tuple[str, dict]],
+        session_id: str | None = None,
+        errors: dict[str, str] | None = None,
+) -> dict[str, pd.DataFrame | None]:
+    """Run ``{table key: (survey method, kwargs)}`` on a detached survey.
+
+    ``ctx`` is a job context, or None when run outside the job runner. Tables
+    that fail are returned as None, as on the pages, with their error recorded
+    in ``errors`` when given. ``session_id`` tags the trace spans, as jobs
+    cannot read session state.
+    """
+    def _progress(fraction: float, text: str) -> None:
+        if ctx is not None:
+            ctx.progress(fraction, text)
+
+    def _stage(name: str):
+        return contextlib.nullcontext() if ctx is None else ctx.stage(name)
+
+    _progress(0.0, "Applying survey periods…")
+    with _stage("set_periods"):
+        set_survey_periods(survey, times)
+    results = {}
+    sizes = trace_sizes(survey._logs.values())
+    for idx, (key, (method, kwargs)) in enumerate(calls.items()):
+        _progress(idx / len(calls), f"Computing {key.replace('_df', '')} ({idx + 1} of {len(calls)})…")
+        try:
+            with _stage(method), span(f"survey.{method}", session=session_id, cache="miss", **sizes):
+                results[key] = survey_table(survey, method, **kwargs)
+        except Exception as exc:
+            results[key] = None
+            if errors is not None:
+                errors[key] = f"{type(exc).__name__}: {exc}"
+    return results
+
+
 def _fmt_time_value(value) -> str:
     if isinstance(value, dt.time):
         return value.strftime("%H:%M")
@@ -412,11 +1199,12 @@ def _fmt_int_value(value) -> str:
         return str(value)
 
 
-def _section_to_csv(
+def _write_section(
+        stream: io.TextIOBase,
         title: str,
         params: list[tuple[str, str]],
         df: pd.DataFrame | None,
-) -> str:
+) -> None:
     lines: list[str] = [f"# {title}"]
 
     if params:
@@ -430,14 +1218,53 @@ def _section_to_csv(
 
     if df is None or getattr(df, "empty", True):
         lines.append("# (no data)")
-        return "\n".join(lines)
+        stream.write("\n".join(lines) + "\n")
+        return
 
-    lines.append(df.to_csv(index=True, lineterminator="\n").rstrip("\n"))
-    return "\n".join(lines)
+    stream.write("\n".join(lines) + "\n")
+    df.to_csv(stream, index=True, lineterminator="\n", chunksize=EXPORT_CHUNK_ROWS)
 
 
-@st.cache_data
-def build_combined_csv_with_sections(
+def _open_export_text(buffer) -> io.TextIOWrapper:
+    return io.TextIOWrapper(buffer, encoding="utf-8", newline="", write_through=True)
+
+
+def _finish_export(text: io.TextIOWrapper):
+    text.flush()
+    buffer = text.detach()
+    buffer.seek(0)
+    return buffer
+
+
+def write_csv_sections(
+        sections: Iterable[tuple[str, list[tuple[str, str]], pd.DataFrame | None]],
+) -> tempfile.SpooledTemporaryFile:
+    """Stream titled CSV sections into a spooled buffer, rewound and ready to read.
+
+    Sections are separated by two blank lines; the buffer spills to disk once it
+    exceeds EXPORT_SPOOL_MAX_BYTES, so large exports are never held as one string.
+    """
+    text = _open_export_text(tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode="w+b"))
+    for idx, (title, params, df) in enumerate(sections):
+        if idx:
+            text.write("\n\n")
+        _write_section(text, title, params, df)
+    return _finish_export(text)
+
+
+def write_table_csv(df: pd.DataFrame | None, index: bool = True) -> tempfile.SpooledTemporaryFile:
+    text = _open_export_text(tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode="w+b"))
+    if df is not None:
+        df.to_csv(text, index=index, chunksize=EXPORT_CHUNK_ROWS)
+    return _finish_export(text)
+
+
+def _read_export(buffer) -> bytes:
+    with buffer:
+        return buffer.read()
+
+
+def _combined_sections(
         broadband_df: pd.DataFrame | None,
         leq_df: pd.DataFrame | None,
         lmax_df: pd.DataFrame | None,
@@ -453,7 +1280,7 @@ def build_combined_csv_with_sections(
         day_t=None,
         evening_t=None,
         night_t=None,
-) -> bytes:
+) -> list[tuple[str, list[tuple[str, str]], pd.DataFrame | None]]:
     period_params = [
         ("Day start", _fmt_time_value(day_start)),
         ("Evening start", _fmt_time_value(evening_start)),
@@ -472,13 +1299,471 @@ def build_combined_csv_with_sections(
         ("Night T", "—" if night_t is None else str(night_t)),
     ]
 
-    sections = [
-        _section_to_csv("Broadband summary", period_params + lmax_params, broadband_df),
-        _section_to_csv("Leq spectra", period_params, leq_df),
-        _section_to_csv("Lmax spectra", period_params, lmax_df),
-        _section_to_csv("Modal", period_params + modal_params, modal_df),
-        _section_to_csv("Counts", period_params + modal_params, counts_df),
+    return [
+        ("Broadband summary", period_params + lmax_params, broadband_df),
+        ("Leq spectra", period_params, leq_df),
+        ("Lmax spectra", period_params, lmax_df),
+        ("Modal", period_params + modal_params, modal_df),
+        ("Counts", period_params + modal_params, counts_df),
     ]
 
-    combined = ("\n\n\n").join(sections).strip() + "\n"
-    return combined.encode("utf-8")
\ No newline at end of file
+
+@st.cache_data(max_entries=16)
+def build_combined_csv_with_sections(
+        version,
+        _broadband_df: pd.DataFrame | None,
+        _leq_df: pd.DataFrame | None,
+        _lmax_df: pd.DataFrame | None,
+        _modal_df: pd.DataFrame | None,
+        _counts_df: pd.DataFrame | None,
+        *,
+        day_start=None,
+        evening_start=None,
+        night_start=None,
+        lmax_n=None,
+        lmax_t=None,
+        modal_param=None,
+        day_t=None,
+        evening_t=None,
+        night_t=None,
+) -> bytes:
+    _export_cache.state = "miss"
+    sections = _combined_sections(
+        _broadband_df,
+        _leq_df,
+        _lmax_df,
+        _modal_df,
+        _counts_df,
+        day_start=day_start,
+        evening_start=evening_start,
+        night_start=night_start,
+        lmax_n=lmax_n,
+        lmax_t=lmax_t,
+        modal_param=modal_param,
+        day_t=day_t,
+        evening_t=evening_t,
+        night_t=night_t,
+    )
+    return _read_export(write_csv_sections(sections))
+
+
+def _combined_csv_params() -> dict:
+    ss = st.session_state
+    times = ss.get("times") or {}
+    modal_params = ss.get("modal_params") or [("L90", "A"), "60min", "60min", "15min"]
+    return dict(
+        day_start=times.get("day"),
+        evening_start=times.get("evening"),
+        night_start=times.get("night"),
+        lmax_n=ss.get("lmax_n"),
+        lmax_t=ss.get("lmax_t"),
+        modal_param=modal_params[0],
+        day_t=modal_params[1],
+        evening_t=modal_params[2],
+        night_t=modal_params[3],
+    )
+
+
+def combined_csv_export_key() -> tuple:
+    return tuple(table_version(key) for key in SUMMARY_TABLE_KEYS), _freeze(_combined_csv_params())
+
+
+def build_combined_csv_export() -> bytes:
+    ss = st.session_state
+    _export_cache.state = "hit"
+    return build_combined_csv_with_sections(
+        combined_csv_export_key(),
+        ss.get("broadband_df"),
+        ss.get("leq_df"),
+        ss.get("lmax_df"),
+        ss.get("modal_df"),
+        ss.get("counts"),
+        **_combined_csv_params(),
+    )
+
+
+def _prepare_export(name: str, export_key: tuple, build: Callable[[], bytes]) -> None:
+    errors = st.session_state.setdefault("export_errors", {})
+    errors.pop(name, None)
+    _export_cache.state = None
+    with timed_stage(f"export:{name}"), traced(f"export.{name}") as trace:
+        try:
+            data = build()
+        except ValueError as exc:
+            # Data the format cannot hold, e.g. a table too wide for an Excel sheet.
+            errors[name] = (export_key, str(exc))
+            return
+        trace["cache"] = _export_cache.state or "miss"
+        trace["bytes"] = len(data)
+    st.session_state.setdefault("prepared_exports", PreparedExports()).store(name, export_key, data)
+
+
+def render_lazy_download(
+        name: str,
+        export_key: tuple,
+        build: Callable[[], bytes],
+        *,
+        prepare_label: str,
+        download_label: str,
+        file_name: str,
+        mime: str,
+        disabled: bool = False,
+        help: str | None = None,
+) -> None:
+    """Show a prepare button until ``build`` has run for ``export_key``, then a download button."""
+    prepared = st.session_state.setdefault("prepared_exports", PreparedExports())
+    entry = prepared.get(name)
+
+    if entry is not None and entry[0] == export_key and os.path.exists(entry[1]):
+        with open(entry[1], "rb") as data:
+            st.download_button(
+                label=download_label,
+                data=data,
+                file_name=file_name,
+                mime=mime,
+                key=f"dl_{name}",
+                disabled=disabled,
+                width='stretch',
+                help=help,
+            )
+        return
+
+    error = st.session_state.get("export_errors", {}).get(name)
+    if error is not None and error[0] == export_key:
+        st.error(error[1])
+    st.button(
+        prepare_label,
+        key=f"prepare_{name}",
+        on_click=_prepare_export,
+        args=(name, export_key, build),
+        disabled=disabled,
+        width='stretch',
+        help=help,
+    )
+
+
+def _encode_label(value):
+    """A column label as JSON: primitives as they are, times and dates tagged so they decode to the same type."""
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value)
+    elif isinstance(value, np.timedelta64):
+        value = pd.Timedelta(value)
+    elif isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dt.datetime):
+        return {"datetime": pd.Timestamp(value).isoformat()}
+    if isinstance(value, dt.date):
+        return {"date": value.isoformat()}
+    if isinstance(value, dt.time):
+        return {"time": value.isoformat()}
+    if isinstance(value, dt.timedelta):
+        return {"timedelta": pd.Timedelta(value).isoformat()}
+    raise TypeError(f"Cannot store column label {value!r} of type {type(value).__name__}.")
+
+
+def _decode_label(value):
+    if not isinstance(value, dict):
+        return value
+    ((kind, text),) = value.items()
+    if kind == "datetime":
+        return pd.Timestamp(text)
+    if kind == "date":
+        return dt.date.fromisoformat(text)
+    if kind == "time":
+        return dt.time.fromisoformat(text)
+    return pd.Timedelta(text)
+
+
+def _frame_to_parquet(df: pd.DataFrame, stream) -> dict:
+    """Write ``df`` as Parquet with positional column names; return the labels needed to restore it."""
+    entry = {}
+    if isinstance(df.columns, pd.MultiIndex):
+        labels = [[_encode_label(part) for part in col] for col in df.columns]
+        # Levels can hold labels no column uses (pycoustic's concatenated tables do); kept so they round-trip.
+        entry["levels"] = [[_encode_label(value) for value in level] for level in df.columns.levels]
+    else:
+        labels = [[_encode_label(col)] for col in df.columns]
+    column_names = [_encode_label(name) for name in df.columns.names]
+
+    flat = df.set_axis([str(i) for i in range(df.shape[1])], axis=1)
+    flat.to_parquet(stream, engine="pyarrow", compression=BUNDLE_COMPRESSION, index=True)
+    return {"columns": labels, "column_names": column_names, "rows": int(len(df)), **entry}
+
+
+def _frame_from_parquet(stream, entry: dict) -> pd.DataFrame:
+    df = pd.read_parquet(stream, engine="pyarrow")
+    labels = [tuple(_decode_label(part) for part in label) for label in entry["columns"]]
+    names = [_decode_label(name) for name in entry["column_names"]]
+    if len(names) > 1:
+        columns = pd.MultiIndex.from_tuples(labels, names=names)
+        if "levels" in entry:
+            levels = [pd.Index([_decode_label(value) for value in level]) for level in entry["levels"]]
+            codes = [level.get_indexer(columns.get_level_values(idx)) for idx, level in enumerate(levels)]
+            columns = pd.MultiIndex(levels=levels, codes=codes, names=names)
+    else:
+        columns = pd.Index([label[0] for label in labels], name=names[0])
+    return df.set_axis(columns, axis=1)
+
+
+def build_bundle_zip(
+        tables: dict[str, pd.DataFrame | None],
+        parameters: dict,
+        resampled: dict[str, pd.DataFrame] | None = None,
+) -> bytes:
+    """Write tables (and optional resampled logs) as Parquet files in a zip with a JSON manifest."""
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "format_version": 1,
+        "created": dt.datetime.now().isoformat(timespec="seconds"),
+        "parameters": parameters,
+        "tables": {},
+        "resampled": {},
+    }
+
+    buffer = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode="w+b")
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        groups = [("tables", tables), ("resampled", resampled or {})]
+        for group, frames in groups:
+            for idx, (name, df) in enumerate(frames.items()):
+                if df is None or getattr(df, "empty", True):
+                    continue
+                member = f"{group}/{idx:02d}.parquet"
+                stream = io.BytesIO()
+                entry = _frame_to_parquet(df, stream)
+                archive.writestr(member, stream.getvalue())
+                manifest[group][name] = {"file": member, **entry}
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2, default=str))
+
+    buffer.seek(0)
+    return _read_export(buffer)
+
+
+def read_bundle_zip(source) -> tuple[dict[str, pd.DataFrame], dict[str, pd.DataFrame], dict]:
+    """Load a bundle written by ``build_bundle_zip``: (tables, resampled logs, manifest)."""
+    with zipfile.ZipFile(source) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        if manifest.get("format") != BUNDLE_FORMAT:
+            raise ValueError("Not a pycoustic analysis bundle.")
+        loaded = {}
+        for group in ("tables", "resampled"):
+            loaded[group] = {}
+            for name, entry in manifest.get(group, {}).items():
+                with archive.open(entry["file"]) as stream:
+                    loaded[group][name] = _frame_from_parquet(io.BytesIO(stream.read()), entry)
+    return loaded["tables"], loaded["resampled"], manifest
+
+
+def bundle_export_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def tables_export_key(include_resampled: bool, interval: str) -> tuple:
+    ss = st.session_state
+    return (
+        tuple(table_version(key) for key in BUNDLE_TABLE_KEYS),
+        _freeze(_combined_csv_params()),
+        include_resampled,
+        interval if include_resampled else None,
+        ss.get("logs_version", 0),
+        ss.get("l90_averaging", "log"),
+    )
+
+
+def build_bundle_export(include_resampled: bool, interval: str) -> bytes:
+    ss = st.session_state
+    parameters = {key: _freeze(value) for key, value in _combined_csv_params().items()}
+    parameters["l90_averaging"] = ss.get("l90_averaging", "log")
+    parameters["logs"] = list(ss.get("logs", {}).keys())
+    parameters["resample_interval"] = interval if include_resampled else None
+
+    resampled = None
+    if include_resampled:
+        resampled = {}
+        for name in ss.get("logs", {}):
+            try:
+                resampled[name] = get_resampled_log(name, interval)
+            except Exception:
+                continue
+
+    return build_bundle_zip(
+        {key: ss.get(key) for key in BUNDLE_TABLE_KEYS},
+        parameters,
+        resampled,
+    )
+
+
+def _log_to_frame(log) -> pd.DataFrame:
+    """A Log's measured data with flat "Leq A" style headers, as accepted by ``Log.from_dataframe``."""
+    data = log.get_data().drop(columns="Night idx", level=0, errors="ignore")
+    flat = [f"{param} {band}".strip() if band != "" else str(param) for param, band in data.columns]
+    return data.set_axis(flat, axis=1)
+
+
+def _restore_signature(signature, logs_version: int, weather_version: int) -> tuple:
+    """Re-key a saved table signature to the restored workspace's log and weather versions."""
+    signature = list(_freeze(signature))
+    signature[0] = logs_version
+    if signature[3] is not None:
+        signature[3] = (weather_version, signature[3][1])
+    return tuple(signature)
+
+
+def workspace_snapshot_key() -> tuple:
+    ss = st.session_state
+    return (
+        ss.get("logs_version", 0),
+        ss.get("weather_version", 0),
+        tuple(table_version(key) for key in BUNDLE_TABLE_KEYS),
+        _freeze({key: ss.get(key) for key in WORKSPACE_SETTING_KEYS}),
+    )
+
+
+def build_workspace_snapshot() -> bytes:
+    """Zip of Parquet log data, cached tables and weather with a JSON manifest of the analysis settings."""
+    ss = st.session_state
+    manifest = {
+        "format": WORKSPACE_FORMAT,
+        "format_version": 1,
+        "created": dt.datetime.now().isoformat(timespec="seconds"),
+        "settings": {key: ss.get(key) for key in WORKSPACE_SETTING_KEYS},
+        "logs": [],
+        "tables": {},
+        "weather": None,
+    }
+
+    buffer = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode="w+b")
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        def _write(member: str, df: pd.DataFrame) -> dict:
+            stream = io.BytesIO()
+            entry = _frame_to_parquet(df, stream)
+            archive.writestr(member, stream.getvalue())
+            return {"file": member, **entry}
+
+        for idx, (name, log) in enumerate(ss.get("logs", {}).items()):
+            source, profile = ss.get("log_sources", {}).get(name, (None, None))
+            entry = _write(f"logs/{idx:03d}.parquet", _log_to_frame(log))
+            manifest["logs"].append({"name": name, "source": source, "profile": profile, **entry})
+
+        registry = ss.get("table_registry", {})
+        for idx, key in enumerate(BUNDLE_TABLE_KEYS):
+            if key not in registry:
+                continue
+            df = ss.get(key)
+            # Tables that failed to compute are saved as empty so they are not retried on load.
+            entry = {"file": None}
+            if df is not None and not getattr(df, "empty", True):
+                entry = _write(f"tables/{idx:02d}.parquet", df)
+            manifest["tables"][key] = {"signature": registry[key]["signature"], **entry}
+
+        weather_df = ss.get("weather_df")
+        if weather_df is not None and not weather_df.empty:
+            manifest["weather"] = _write("weather.parquet", weather_df)
+
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2, default=str))
+
+    buffer.seek(0)
+    return _read_export(buffer)
+
+
+def restore_workspace_snapshot(source) -> int:
+    """Replace the session's logs, settings and tables with a saved workspace; return the number of logs.
+
+    Logs go through the shared log store, keyed by a hash of their saved data rather than the
+    original upload's: they are rebuilt from Parquet, so they must not stand in for a parse of
+    the file itself. The same workspace restored by several sessions is rebuilt once.
+    """
+    ss = st.session_state
+    with zipfile.ZipFile(source) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        if manifest.get("format") != WORKSPACE_FORMAT:
+            raise ValueError("Not a pycoustic workspace file.")
+
+        def _read(entry: dict) -> pd.DataFrame:
+            with archive.open(entry["file"]) as stream:
+                return _frame_from_parquet(io.BytesIO(stream.read()), entry)
+
+        by_source: dict[str, list[dict]] = {}
+        for entry in manifest["logs"]:
+            by_source.setdefault(entry["source"] or entry["file"], []).append(entry)
+
+        def _store_key(entries: list[dict]) -> str:
+            digest = hashlib.sha256()
+            for entry in entries:
+                digest.update(json.dumps([entry["name"], entry["profile"]]).encode("utf-8"))
+                digest.update(archive.read(entry["file"]))
+            return f"workspace:{digest.hexdigest()}"
+
+        def _parse(entries: list[dict]) -> tuple:
+            import pycoustic as pc
+
+            logs = tuple(
+                (entry["profile"], pc.Log.from_dataframe(_read(entry), filepath=entry["name"], name=entry["name"]))
+                for entry in entries
+            )
+            for _, log in logs:
+                attach_arrays(log)
+            return logs
+
+        ss["log_lease"].release_all()
+        ss["logs"] = {}
+        ss["log_sources"] = {}
+        for entries in by_source.values():
+            parsed = dict(ss["log_lease"].acquire(_store_key(entries), lambda entries=entries: _parse(entries)))
+            for entry in entries:
+                log = parsed.get(entry["profile"])
+                if log is None:
+                    log = _parse([entry])[0][1]
+                ss["logs"][entry["name"]] = session_view(log)
+                ss["log_sources"][entry["name"]] = (entry["source"], entry["profile"])
+
+        weather_df = _read(manifest["weather"]) if manifest.get("weather") else pd.DataFrame()
+        tables = {
+            key: (_read(entry) if entry["file"] else None, entry["signature"])
+            for key, entry in manifest["tables"].items()
+        }
+
+    settings = manifest["settings"]
+    settings["times"] = {period: tuple(value) for period, value in settings["times"].items()}
+    settings["modal_params"][0] = _freeze(settings["modal_params"][0])
+    for key in WORKSPACE_SETTING_KEYS:
+        if key in settings:
+            ss[key] = settings[key]
+    for key in WORKSPACE_WIDGET_KEYS:
+        ss.pop(key, None)
+
+    set_weather_df(weather_df)
+    _clear_log_caches()
+    ss["table_registry"] = {}
+    ss["prepared_exports"] = PreparedExports()
+    for key in BUNDLE_TABLE_KEYS:
+        ss[key] = pd.DataFrame()
+    for key, (df, signature) in tables.items():
+        publish_table(key, df, _restore_signature(signature, ss["logs_version"], ss["weather_version"]))
+
+    ss["num_logs"] = len(ss["logs"])
+    ss["last_upload_ts"] = dt.datetime.now()
+    return len(ss["logs"])
+
+
+def workbook_export_available() -> bool:
+    return importlib.util.find_spec("xlsxwriter") is not None
+
+
+def build_workbook_export(include_resampled: bool, interval: str) -> bytes:
+    ss = st.session_state
+    frames = {
+        "Broadband": ss.get("broadband_df"),
+        "Leq spectra": ss.get("leq_df"),
+        "Lmax spectra": ss.get("lmax_df"),
+        "Modal": ss.get("modal_df"),
+        "Counts": ss.get("counts"),
+    }
+    if include_resampled:
+        for name in ss.get("logs", {}):
+            try:
+                frames[f"{name} {interval}"] = get_resampled_log(name, interval)
+            except Exception:
+                continue
+    return _export_frames_to_excel(frames)
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_HISTORY = 20
+
+# Timers that asked for tracemalloc; tracing stops once the last of them lets go.
+_tracing_lock = threading.Lock()
+_tracing_holders: set[int] = set()
+_tracing_started_here = False
+
+
+def _hold_tracing(holder: int) -> None:
+    global _tracing_started_here
+    with _tracing_lock:
+        _tracing_holders.add(holder)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started_here = True
+
+
+def _release_tracing(holder: int) -> None:
+    global _tracing_started_here
+    with _tracing_lock:
+        _tracing_holders.discard(holder)
+        if not _tracing_holders and _tracing_started_here:
+            tracemalloc.stop()
+            _tracing_started_here = False
+
+
+class StageTimer:
+    """Wall-clock timings of named stages within each script rerun of one session.
+
+    Stages nest: a stage started inside another is recorded one level deeper,
+    so a breakdown can separate a page's total from the stages it contains.
+    Stages recorded between reruns, such as widget callbacks, are carried into
+    the next rerun with negative offsets. Recording is skipped entirely while
+    the timer is disabled.
+
+    With ``trace_memory`` on, each stage also records ``peak_bytes``: the highest
+    tracemalloc allocation above the stage's starting point. tracemalloc is
+    process-wide, so concurrent sessions and jobs inflate each other's peaks.
+    """
+
+    def __init__(self, history: int = DEFAULT_HISTORY) -> None:
+        self.enabled = False
+        self.trace_memory = False
+        self.records: list[dict] = []
+        self.history: deque[dict] = deque(maxlen=history)
+        self._rerun_started = time.perf_counter()
+        self._rerun_label = ""
+        self._depth = 0
+        self._closed_at: int | None = None
+        self._peaks: list[int] = []
+        self._tracing_finalizer: weakref.finalize | None = None
+
+    def begin_rerun(self, label: str = "", enabled: bool | None = None, trace_memory: bool | None = None) -> None:
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if trace_memory is not None:
+            self.set_trace_memory(trace_memory)
+        started = time.perf_counter()
+        carried = [] if self._closed_at is None else self.records[self._closed_at:]
+        shift = started - self._rerun_started
+        self.records = [{**record, "offset_s": record["offset_s"] - shift} for record in carried]
+        self._rerun_started = started
+        self._rerun_label = label
+        self._depth = 0
+        self._peaks = []
+        self._closed_at = None
+
+    def set_trace_memory(self, on: bool) -> None:
+        on = bool(on)
+        if on == self.trace_memory:
+            return
+        self.trace_memory = on
+        if on:
+            _hold_tracing(id(self))
+            self._tracing_finalizer = weakref.finalize(self, _release_tracing, id(self))
+        elif self._tracing_finalizer is not None:
+            self._tracing_finalizer()
+            self._tracing_finalizer = None
+
+    def end_rerun(self) -> dict | None:
+        """Close the current rerun and keep it in the history; returns it, or None when disabled."""
+        self._closed_at = len(self.records)
+        if not self.enabled:
+            return None
+        rerun = self.current()
+        self.history.append(rerun)
+        return rerun
+
+    def current(self) -> dict:
+        return {
+            "label": self._rerun_label,
+            "started": time.time() - (time.perf_counter() - self._rerun_started),
+            "total_s": time.perf_counter() - self._rerun_started,
+            "stages": list(self.records),
+        }
+
+    def set_label(self, label: str) -> None:
+        self._rerun_label = label
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                # The enclosing stage keeps the peak it reached before this one reset it.
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            self._peaks.append(current)
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        depth = self._depth
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth = depth
+            record = {
+                "name": name,
+                "depth": depth,
+                "offset_s": started - self._rerun_started,
+                "seconds": time.perf_counter() - started,
+            }
+            if tracing and self._peaks:
+                stage_peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record["peak_bytes"] = max(stage_peak - current, 0)
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], stage_peak)
+            self.records.append(record)
+
+    def record(self, name: str, seconds: float) -> None:
+        """Add a stage measured elsewhere, e.g. a background job that finished this rerun."""
+        if self.enabled:
+            self.records.append(
+                {
+                    "name": name,
+                    "depth": self._depth,
+                    "offset_s": time.perf_counter() - self._rerun_started,
+                    "seconds": float(seconds),
+                    "background": True,
+                }
+            )
+
+    def breakdown(self) -> list[dict]:
+        """Current rerun's stages in start order, each with ``self_s``: its time outside nested stages."""
+        ordered = sorted(self.records, key=lambda record: record["offset_s"])
+        rows = []
+        for idx, record in enumerate(ordered):
+            end = record["offset_s"] + record["seconds"]
+            nested = 0.0
+            for inner in ordered[idx + 1:]:
+                if inner["offset_s"] >= end:
+                    break
+                if inner["depth"] == record["depth"] + 1 and not inner.get("background"):
+                    nested += inner["seconds"]
+            rows.append({**record, "self_s": max(record["seconds"] - nested, 0.0)})
+        return rows
+
+    def slowest(self, n: int = 5) -> list[dict]:
+        """Self time per stage name across this rerun, slowest first."""
+        totals: dict[str, dict] = {}
+        for row in self.breakdown():
+            entry = totals.setdefault(row["name"], {"name": row["name"], "calls": 0, "self_s": 0.0})
+            entry["calls"] += 1
+            entry["self_s"] += row["self_s"]
+        return sorted(totals.values(), key=lambda entry: entry["self_s"], reverse=True)[:n]
+
+    def peak_memory(self) -> dict[str, int]:
+        """Highest traced ``peak_bytes`` per stage name over the history and the current rerun."""
+        peaks: dict[str, int] = {}
+        reruns = [rerun["stages"] for rerun in self.history] + [self.records]
+        for stages in reruns:
+            for record in stages:
+                if "peak_bytes" in record:
+                    peaks[record["name"]] = max(peaks.get(record["name"], 0), record["peak_bytes"])
+        return peaks
+
+    def to_json(self) -> bytes:
+        """Completed reruns in the history, oldest first."""
+        return json.dumps({"reruns": list(self.history)}, indent=2).encode("utf-8")
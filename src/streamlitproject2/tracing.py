@@ -0,0 +1,127 @@
+"""JSON-lines trace spans for computations, written off-thread to a rotating file.
+
+Tracing is off unless PYCOUSTIC_TRACE_FILE names a file (or ``configure`` is
+called). Rotation is not safe across processes, so a ``{pid}`` placeholder in
+the path gives each process (e.g. batch workers) its own file. Each span is
+one line:
+
+    {"ts": "...", "span": "survey.leq_spectra", "session": "...", "duration_ms": 12.3,
+     "status": "ok", "logs": 3, "rows": 30240, "bands": 8, "cache": "miss"}
+"""
+import atexit
+import datetime as dt
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueListener, RotatingFileHandler
+from typing import Any
+
+DEFAULT_MAX_MB = 20
+DEFAULT_BACKUPS = 5
+
+
+class Tracer:
+    """Queues span records for a background thread that appends them to a rotating file."""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024, backups: int = DEFAULT_BACKUPS) -> None:
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._listener = QueueListener(self._queue, handler)
+        self._listener.start()
+        self._closed = False
+
+    def emit(self, record: dict) -> None:
+        if not self._closed:
+            self._queue.put(logging.makeLogRecord({"msg": json.dumps(record, default=str)}))
+
+    def close(self) -> None:
+        """Flush queued spans and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+
+
+_tracer: Tracer | None = None
+_tracer_lock = threading.Lock()
+_configured = False
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def configure(path: str | None, max_bytes: int | None = None, backups: int | None = None) -> Tracer | None:
+    """Replace the process-wide tracer; ``path=None`` turns tracing off."""
+    global _tracer, _configured
+    with _tracer_lock:
+        if _tracer is not None:
+            _tracer.close()
+        _tracer = None
+        if path:
+            _tracer = Tracer(
+                path.replace("{pid}", str(os.getpid())),
+                max_bytes=int(max_bytes or _env_number("PYCOUSTIC_TRACE_MAX_MB", DEFAULT_MAX_MB) * 1024 * 1024),
+                backups=int(backups if backups is not None else _env_number("PYCOUSTIC_TRACE_BACKUPS", DEFAULT_BACKUPS)),
+            )
+        _configured = True
+        return _tracer
+
+
+def get_tracer() -> Tracer | None:
+    """The process-wide tracer, set up from PYCOUSTIC_TRACE_FILE on first use."""
+    if not _configured:
+        configure(os.environ.get("PYCOUSTIC_TRACE_FILE"))
+    return _tracer
+
+
+def tracing_enabled() -> bool:
+    return get_tracer() is not None
+
+
+@contextmanager
+def span(name: str, session: str | None = None, **fields: Any):
+    """Trace the enclosed block; the yielded dict takes extra fields such as sizes or cache hit/miss."""
+    tracer = get_tracer()
+    if tracer is None:
+        yield {}
+        return
+    started = time.perf_counter()
+    ts = dt.datetime.now(dt.timezone.utc).isoformat(timespec="milliseconds")
+    status = "ok"
+    try:
+        yield fields
+    except BaseException as exc:
+        status = "error"
+        fields.setdefault("error", f"{type(exc).__name__}: {exc}")
+        raise
+    finally:
+        tracer.emit(
+            {
+                "ts": ts,
+                "span": name,
+                "session": session,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                "status": status,
+                **fields,
+            }
+        )
+
+
+@atexit.register
+def _close_at_exit() -> None:
+    if _tracer is not None:
+        _tracer.close()
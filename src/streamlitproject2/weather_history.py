@@ -0,0 +1,377 @@
+import contextlib
+import datetime as dt
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterable
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+GEO_URL = "http://api.openweathermap.org/geo/1.0/zip"
+TIMEMACHINE_URL = "https://api.openweathermap.org/data/3.0/onecall/timemachine"
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_REQUESTS_PER_S = 10.0
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "streamlitproject2", "weather.sqlite3"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS locations (
+    country TEXT NOT NULL,
+    postcode TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    PRIMARY KEY (country, postcode)
+);
+CREATE TABLE IF NOT EXISTS observations (
+    country TEXT NOT NULL,
+    postcode TEXT NOT NULL,
+    units TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    PRIMARY KEY (country, postcode, units, ts)
+);
+"""
+
+
+def weather_cache_path() -> str:
+    return os.environ.get("PYCOUSTIC_WEATHER_CACHE") or DEFAULT_CACHE_PATH
+
+
+class WeatherCache:
+    """SQLite store of OpenWeather observations keyed by (country, postcode, units, timestamp).
+
+    Connections are opened per call so one cache object can be shared across
+    sessions and threads.
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        self.path = path or weather_cache_path()
+        self._init_lock = threading.Lock()
+        self._initialised = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialised:
+            with self._init_lock:
+                if not self._initialised:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    with sqlite3.connect(self.path, timeout=30) as conn:
+                        conn.execute("PRAGMA journal_mode=WAL")
+                        conn.executescript(_SCHEMA)
+                    self._initialised = True
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_latlon(self, country: str, postcode: str) -> tuple[float, float] | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT lat, lon FROM locations WHERE country = ? AND postcode = ?",
+                (country, postcode),
+            ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def put_latlon(self, country: str, postcode: str, lat: float, lon: float) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO locations (country, postcode, lat, lon) VALUES (?, ?, ?, ?)",
+                (country, postcode, float(lat), float(lon)),
+            )
+
+    def get_many(
+            self,
+            country: str,
+            postcode: str,
+            units: str,
+            timestamps: Iterable[int],
+    ) -> dict[int, dict[str, Any]]:
+        wanted = sorted(set(int(ts) for ts in timestamps))
+        if not wanted:
+            return {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT ts, payload FROM observations "
+                "WHERE country = ? AND postcode = ? AND units = ? AND ts BETWEEN ? AND ?",
+                (country, postcode, units, wanted[0], wanted[-1]),
+            ).fetchall()
+        wanted_set = set(wanted)
+        return {ts: json.loads(payload) for ts, payload in rows if ts in wanted_set}
+
+    def put_many(
+            self,
+            country: str,
+            postcode: str,
+            units: str,
+            observations: dict[int, dict[str, Any]],
+    ) -> None:
+        if not observations:
+            return
+        fetched_at = dt.datetime.now().isoformat(timespec="seconds")
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO observations (country, postcode, units, ts, payload, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (country, postcode, units, int(ts), json.dumps(payload, default=str), fetched_at)
+                    for ts, payload in observations.items()
+                ],
+            )
+
+    def stats(self) -> dict[str, int]:
+        with self._connect() as conn:
+            observations = conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+            locations = conn.execute("SELECT COUNT(*) FROM locations").fetchone()[0]
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {"observations": observations, "locations": locations, "bytes": size}
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM observations")
+            conn.execute("DELETE FROM locations")
+
+
+def history_timestamps(start, end, interval_hours: int) -> list[int]:
+    """Unix timestamps on a grid aligned to whole multiples of ``interval_hours``.
+
+    Aligning to a fixed grid (rather than to the survey start, as pycoustic does)
+    means overlapping surveys and finer intervals reuse already-cached hours.
+    """
+    step = pd.Timedelta(hours=int(interval_hours))
+    first = pd.Timestamp(start).floor(step)
+    last = pd.Timestamp(end)
+    stamps = []
+    current = first
+    while current <= last:
+        stamps.append(int(current.to_pydatetime().timestamp()))
+        current += step
+    return stamps
+
+
+def fetch_latlon(
+        api_key: str,
+        country: str,
+        postcode: str,
+        timeout: float = 30,
+        session: requests.Session | None = None,
+        base_url: str = GEO_URL,
+) -> tuple[float, float]:
+    getter = session or requests
+    resp = getter.get(base_url, params={"zip": f"{postcode},{country}", "appid": api_key}, timeout=timeout)
+    resp.raise_for_status()
+    payload = resp.json()
+    return payload["lat"], payload["lon"]
+
+
+def fetch_observation(
+        ts: int,
+        *,
+        lat: float,
+        lon: float,
+        api_key: str,
+        units: str,
+        timeout: float = 30,
+        session: requests.Session | None = None,
+        base_url: str = TIMEMACHINE_URL,
+) -> dict[str, Any]:
+    getter = session or requests
+    resp = getter.get(
+        base_url,
+        params={"lat": lat, "lon": lon, "units": units, "dt": int(ts), "appid": api_key},
+        timeout=timeout,
+    )
+    resp.raise_for_status()
+    observation = dict(resp.json()["data"][0])
+    observation.pop("weather", None)
+    return observation
+
+
+class WeatherFetchError(RuntimeError):
+    """Raised when a concurrent fetch fails; ``observations`` holds what was fetched before the failure."""
+
+    def __init__(self, message: str, observations: dict[int, dict[str, Any]]) -> None:
+        super().__init__(message)
+        self.observations = observations
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls at least ``1 / max_per_s`` seconds apart."""
+
+    def __init__(self, max_per_s: float | None) -> None:
+        self._interval = 1.0 / max_per_s if max_per_s and max_per_s > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self) -> None:
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _pooled_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_observations_concurrently(
+        timestamps: Iterable[int],
+        *,
+        lat: float,
+        lon: float,
+        api_key: str,
+        units: str,
+        timeout: float = 30,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_requests_per_s: float | None = DEFAULT_MAX_REQUESTS_PER_S,
+        progress: Callable[[int, int], None] | None = None,
+        base_url: str = TIMEMACHINE_URL,
+        session: requests.Session | None = None,
+        limiter: RateLimiter | None = None,
+) -> dict[int, dict[str, Any]]:
+    """Fetch one observation per timestamp on a thread pool sharing a pooled HTTP session.
+
+    ``session`` and ``limiter`` let a caller share its own pooled session and rate
+    limit with other requests; otherwise both are created for this call.
+    ``progress(done, total)`` is called from the calling thread as requests complete.
+    On the first failure, or if ``progress`` raises, pending requests are cancelled
+    and WeatherFetchError is raised carrying the observations fetched so far.
+    """
+    pending = list(timestamps)
+    total = len(pending)
+    results: dict[int, dict[str, Any]] = {}
+    if not pending:
+        return results
+
+    limiter = limiter or RateLimiter(max_requests_per_s)
+    workers = max(1, min(int(max_workers), total))
+
+    with contextlib.nullcontext(session) if session is not None else _pooled_session(workers) as session:
+        def _fetch(ts: int) -> dict[str, Any]:
+            limiter.acquire()
+            return fetch_observation(
+                ts, lat=lat, lon=lon, api_key=api_key, units=units,
+                timeout=timeout, session=session, base_url=base_url,
+            )
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="weather-fetch") as pool:
+            futures = {pool.submit(_fetch, ts): ts for ts in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                ts = futures[future]
+                try:
+                    results[ts] = future.result()
+                except Exception as exc:
+                    for other in futures:
+                        other.cancel()
+                    raise WeatherFetchError(
+                        f"Weather request for {dt.datetime.fromtimestamp(ts)} failed: {exc}",
+                        results,
+                    ) from exc
+                if progress is not None:
+                    try:
+                        progress(done, total)
+                    except Exception as exc:
+                        # A progress callback raising (e.g. on cancellation) stops the fetch,
+                        # keeping what has been fetched so it can still be cached.
+                        for other in futures:
+                            other.cancel()
+                        raise WeatherFetchError(
+                            f"Weather fetch stopped after {done} of {total} readings", results
+                        ) from exc
+
+    return results
+
+
+def observations_to_dataframe(observations: dict[int, dict[str, Any]]) -> pd.DataFrame:
+    """Build the same table shape as ``WeatherHistory.compute_weather_history``."""
+    if not observations:
+        return pd.DataFrame()
+    df = pd.DataFrame([observations[ts] for ts in sorted(observations)])
+    for col in ["dt", "sunrise", "sunset"]:
+        if col in df.columns:
+            df[col] = df[col].apply(
+                lambda value: dt.datetime.fromtimestamp(int(value)) if pd.notna(value) else pd.NaT
+            )
+    return df
+
+
+def load_weather_history(
+        *,
+        start,
+        end,
+        interval_hours: int,
+        api_key: str,
+        country: str,
+        postcode: str,
+        units: str,
+        timeout: float = 30,
+        cache: WeatherCache | None = None,
+        offline: bool = False,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_requests_per_s: float | None = DEFAULT_MAX_REQUESTS_PER_S,
+        progress: Callable[[int, int], None] | None = None,
+        geo_url: str = GEO_URL,
+        timemachine_url: str = TIMEMACHINE_URL,
+) -> tuple[pd.DataFrame, dict[str, int]]:
+    """Return weather history for the survey span, fetching only timestamps missing from ``cache``.
+
+    :return: (weather table, {"cached": n, "fetched": n, "missing": n})
+    """
+    timestamps = history_timestamps(start, end, interval_hours)
+    cached = cache.get_many(country, postcode, units, timestamps) if cache is not None else {}
+    missing = [ts for ts in timestamps if ts not in cached]
+
+    fetched: dict[int, dict[str, Any]] = {}
+    if missing and not offline:
+        # One pooled session and rate limit for the geocode and observation requests alike.
+        limiter = RateLimiter(max_requests_per_s)
+        with _pooled_session(min(int(max_workers), len(missing))) as session:
+            latlon = cache.get_latlon(country, postcode) if cache is not None else None
+            if latlon is None:
+                limiter.acquire()
+                latlon = fetch_latlon(api_key, country, postcode, timeout=timeout, session=session, base_url=geo_url)
+                if cache is not None:
+                    cache.put_latlon(country, postcode, *latlon)
+            lat, lon = latlon
+
+            try:
+                fetched = fetch_observations_concurrently(
+                    missing,
+                    lat=lat,
+                    lon=lon,
+                    api_key=api_key,
+                    units=units,
+                    timeout=timeout,
+                    max_workers=max_workers,
+                    progress=progress,
+                    base_url=timemachine_url,
+                    session=session,
+                    limiter=limiter,
+                )
+            except WeatherFetchError as exc:
+                if cache is not None:
+                    cache.put_many(country, postcode, units, exc.observations)
+                raise
+        if cache is not None:
+            cache.put_many(country, postcode, units, fetched)
+
+    observations = {**cached, **fetched}
+    summary = {
+        "cached": len(cached),
+        "fetched": len(fetched),
+        "missing": len(timestamps) - len(observations),
+    }
+    return observations_to_dataframe(observations), summary
@@ -0,0 +1,139 @@
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from leq_index import indexed_arrays
+from log_arrays import LogArrays
+
+DEFAULT_EXCLUSION = {
+    "enabled": False,
+    "max_wind_speed": 5.0,
+    "max_wind_gust": None,
+    "max_rain": 0.0,
+}
+
+
+def align_weather(index: pd.Index, weather_df: pd.DataFrame, cols: list[str], tolerance: pd.Timedelta) -> pd.DataFrame:
+    """As-of join of weather readings onto ``index``: each timestamp takes the latest reading at or before it.
+
+    Readings older than ``tolerance`` are treated as missing.
+    """
+    present = [col for col in cols if col in weather_df.columns]
+    left = pd.DataFrame({"_ts": pd.DatetimeIndex(index).astype("datetime64[ns]")})
+    left["_pos"] = np.arange(len(left))
+    left = left.sort_values("_ts", kind="stable")
+
+    right = weather_df[["dt", *present]].dropna(subset=["dt"])
+    right = right.assign(dt=pd.to_datetime(right["dt"]).astype("datetime64[ns]")).sort_values("dt", kind="stable")
+
+    merged = pd.merge_asof(left, right, left_on="_ts", right_on="dt", direction="backward", tolerance=tolerance)
+    merged = merged.sort_values("_pos", kind="stable")
+    return merged[present].set_axis(index, axis=0)
+
+
+def exclusion_mask(
+        index: pd.Index,
+        weather_df: pd.DataFrame | None,
+        *,
+        max_wind_speed: float | None,
+        max_rain: float | None,
+        tolerance: pd.Timedelta,
+        max_wind_gust: float | None = None,
+) -> np.ndarray:
+    """Boolean array, True where the aligned weather breaches a threshold and the row should be excluded."""
+    mask = np.zeros(len(index), dtype=bool)
+    if weather_df is None or weather_df.empty or "dt" not in weather_df.columns or len(index) == 0:
+        return mask
+
+    aligned = align_weather(index, weather_df, ["wind_speed", "wind_gust", "rain"], tolerance)
+    if max_wind_speed is not None and "wind_speed" in aligned.columns:
+        mask |= (pd.to_numeric(aligned["wind_speed"], errors="coerce") > max_wind_speed).to_numpy()
+    if max_wind_gust is not None and "wind_gust" in aligned.columns:
+        mask |= (pd.to_numeric(aligned["wind_gust"], errors="coerce") > max_wind_gust).to_numpy()
+    if max_rain is not None and "rain" in aligned.columns:
+        mask |= (pd.to_numeric(aligned["rain"], errors="coerce").fillna(0.0) > max_rain).to_numpy()
+    return mask
+
+
+class WeatherExcludedLog:
+    """Read-through view of a pycoustic Log that hides rows flagged by a weather exclusion mask.
+
+    Only the accessors used by the Survey summary methods are filtered; the wrapped
+    Log's stored frames are never modified, and masks are cached per index so each
+    survey method reuses them. Leq tables read the mask through ``masked_arrays``
+    rather than a filtered copy; pycoustic's own methods still get filtered frames.
+    """
+
+    def __init__(self, log: Any, weather_df: pd.DataFrame, settings: dict, tolerance: pd.Timedelta) -> None:
+        self._log = log
+        self._weather_df = weather_df
+        self._max_wind_speed = settings.get("max_wind_speed")
+        self._max_wind_gust = settings.get("max_wind_gust")
+        self._max_rain = settings.get("max_rain")
+        self._tolerance = tolerance
+        self._masks: dict[tuple, np.ndarray] = {}
+        self._masked_arrays: dict[tuple, LogArrays] = {}
+
+    def with_log(self, log: Any) -> "WeatherExcludedLog":
+        """The same exclusion over another view of the log, sharing the computed masks."""
+        view = WeatherExcludedLog.__new__(WeatherExcludedLog)
+        view.__dict__.update(self.__dict__)
+        view._log = log
+        return view
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._log, name)
+
+    @staticmethod
+    def _key(index: pd.Index) -> tuple:
+        return (len(index), index[0], index[-1], getattr(index, "freqstr", None)) if len(index) else (0,)
+
+    def _keep(self, data: pd.DataFrame) -> np.ndarray:
+        key = self._key(data.index)
+        if key not in self._masks:
+            self._masks[key] = ~exclusion_mask(
+                data.index,
+                self._weather_df,
+                max_wind_speed=self._max_wind_speed,
+                max_wind_gust=self._max_wind_gust,
+                max_rain=self._max_rain,
+                tolerance=self._tolerance,
+            )
+        return self._masks[key]
+
+    def masked_arrays(self) -> LogArrays | None:
+        """The wrapped log's arrays with an energy index over the kept rows only, or None if it has no index."""
+        arrays = indexed_arrays(self._log)
+        if arrays is None:
+            return None
+        antilogs = self._log.get_antilogs()
+        keep = self._keep(antilogs)
+        if keep.all():
+            return arrays
+        key = self._key(antilogs.index)
+        if key not in self._masked_arrays:
+            self._masked_arrays[key] = arrays.masked(antilogs, keep)
+        return self._masked_arrays[key]
+
+    def _filtered(self, data: pd.DataFrame) -> pd.DataFrame:
+        keep = self._keep(data)
+        return data if keep.all() else data.loc[keep]
+
+    def excluded_fraction(self) -> float:
+        keep = self._keep(self._log.get_data())
+        return float(1.0 - keep.mean()) if len(keep) else 0.0
+
+    def get_data(self) -> pd.DataFrame:
+        return self._filtered(self._log.get_data())
+
+    def get_antilogs(self) -> pd.DataFrame:
+        return self._filtered(self._log.get_antilogs())
+
+    def as_interval(self, *args, **kwargs) -> pd.DataFrame:
+        return self._filtered(self._log.as_interval(*args, **kwargs))
+
+    def get_nth_high_low(self, *args, data: pd.DataFrame | None = None, **kwargs) -> pd.DataFrame:
+        if data is None:
+            data = self.get_data()
+        return self._log.get_nth_high_low(*args, data=data, **kwargs)
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+# The app modules use flat imports (``from st_config import ...``), as under ``streamlit run``.
+sys.path.insert(0, os.path.join(ROOT, "src", "streamlitproject2"))
+# Benchmark scripts are imported the same way, for the synthetic log generator.
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+
+def pytest_addoption(parser):
+    parser.addoption("--perf", action="store_true", help="Run the performance budget tests.")
+    parser.addoption(
+        "--update-perf-baseline",
+        action="store_true",
+        help="Record this machine's measurements as the performance baseline instead of checking them.",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: performance budget tests, skipped unless --perf is given")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--perf") or config.getoption("--update-perf-baseline"):
+        return
+    skip = pytest.mark.skip(reason="performance budgets run only with --perf")
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skip)
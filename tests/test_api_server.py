@@ -0,0 +1,139 @@
+import json
+import socket
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api_server import start_server
+from log_store import SharedLogStore
+from st_config import TEMPLATE_COLUMNS
+
+
+def _log_csv(seed: int, days: int = 2) -> bytes:
+    rng = np.random.default_rng(seed)
+    times = pd.date_range("2024-01-01", periods=days * 24 * 60, freq="min")
+    values = rng.normal(50.0, 5.0, size=(len(times), len(TEMPLATE_COLUMNS) - 1)).round(1)
+    df = pd.DataFrame(values, columns=TEMPLATE_COLUMNS[1:])
+    df.insert(0, "Time", times.strftime("%Y/%m/%d %H:%M"))
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def _request(method: str, url: str, body: bytes | None = None) -> tuple[int, dict, dict]:
+    req = urllib.request.Request(url, data=body, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return resp.status, dict(resp.headers), json.loads(resp.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, dict(exc.headers), json.loads(exc.read())
+
+
+@pytest.fixture
+def server():
+    srv = start_server("127.0.0.1", 0, store=SharedLogStore(512 * 1024 * 1024), workers=4)
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _upload(server, seed: int) -> str:
+    status, _, payload = _request("POST", f"{server.url}/logs?name=log{seed}.csv", _log_csv(seed))
+    assert status == 201
+    return payload["id"]
+
+
+def test_upload_is_parsed_once_per_content(server):
+    first = _upload(server, 1)
+    second = _upload(server, 1)
+
+    assert first == second
+    _, _, health = _request("GET", f"{server.url}/health")
+    assert health["uploads"] == 1
+    assert health["log_store"]["misses"] == 1
+
+
+def test_broadband_summary_is_cached(server):
+    log_id = _upload(server, 1)
+    body = json.dumps({"logs": [{"id": log_id, "name": "P1"}], "params": {"lmax_n": 5, "lmax_t": "2min"}}).encode()
+
+    status, headers, payload = _request("POST", f"{server.url}/survey/broadband_summary", body)
+    assert status == 200
+    assert headers["X-Cache"] == "miss"
+    result = payload["result"]
+    assert len(result["columns"][0]) == len(result["column_names"]) == 3
+    assert {label[0] for label in result["index"]} == {"P1"}
+
+    status, headers, again = _request("POST", f"{server.url}/survey/broadband_summary", body)
+    assert status == 200
+    assert headers["X-Cache"] == "hit"
+    assert again == payload
+
+
+def test_concurrent_requests_across_logs(server):
+    ids = [_upload(server, seed) for seed in range(3)]
+
+    def _leq(periods):
+        body = json.dumps(
+            {
+                "logs": [{"id": log_id, "name": f"P{i}"} for i, log_id in enumerate(ids)],
+                "times": periods,
+            }
+        ).encode()
+        return _request("POST", f"{server.url}/survey/leq_spectra", body)
+
+    periods = [
+        {"day": [7, 0], "evening": [23, 0], "night": [23, 0]},
+        {"day": [6, 0], "evening": [19, 0], "night": [22, 0]},
+    ] * 3
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        responses = list(pool.map(_leq, periods))
+
+    assert all(status == 200 for status, _, _ in responses)
+    assert responses[0][2] == responses[2][2]
+    assert responses[0][2] != responses[1][2]
+
+
+def test_errors_are_reported_as_json(server):
+    status, _, payload = _request("POST", f"{server.url}/survey/not_a_table", b"{}")
+    assert status == 404
+    assert "error" in payload
+
+    body = json.dumps({"logs": [{"id": "missing"}]}).encode()
+    status, _, payload = _request("POST", f"{server.url}/survey/leq_spectra", body)
+    assert status == 404
+
+    status, _, payload = _request("POST", f"{server.url}/logs?name=bad.csv", b"not,a,log\n1,2,3\n")
+    assert status == 422
+
+
+def test_removing_a_log_releases_it(server):
+    log_id = _upload(server, 1)
+    status, _, _ = _request("DELETE", f"{server.url}/logs/{log_id}")
+    assert status == 200
+
+    _, _, health = _request("GET", f"{server.url}/health")
+    assert health["uploads"] == 0
+    assert health["log_store"]["pinned_bytes"] == 0
+
+
+def test_idle_connections_are_closed_and_do_not_starve_requests():
+    srv = start_server("127.0.0.1", 0, store=SharedLogStore(64 * 1024 * 1024), workers=2, idle_timeout=0.5)
+    host, port = srv.server_address[:2]
+    try:
+        idle = [socket.create_connection((host, port), timeout=10) for _ in range(4)]
+        started = time.perf_counter()
+
+        status, _, health = _request("GET", f"{srv.url}/health")
+
+        assert status == 200 and health["status"] == "ok"
+        assert time.perf_counter() - started < 10
+        for sock in idle:
+            assert sock.recv(1) == b""
+            sock.close()
+    finally:
+        srv.shutdown()
+        srv.server_close()
@@ -0,0 +1,69 @@
+import json
+import os
+
+import batch
+from synthetic import write_survey
+
+
+def _site(tmp_path):
+    site = tmp_path / "site"
+    write_survey(str(site), logs=2, duration="2D", rate_s=300)
+    return str(site)
+
+
+def test_cli_writes_every_table(tmp_path):
+    site = _site(tmp_path)
+    output = str(tmp_path / "out")
+
+    assert batch.main([site, "-o", output, "-j", "2"]) == 0
+
+    for file_name in list(batch.TABLE_FILES.values()) + [batch.COMBINED_FILE]:
+        assert os.path.getsize(os.path.join(output, "site", file_name)) > 0, file_name
+    with open(os.path.join(output, batch.SUMMARY_FILE), encoding="utf-8") as summary:
+        (result,) = json.load(summary)["sites"]
+    assert result["errors"] == []
+    assert set(result["files"]) == set(batch.TABLE_FILES.values()) | {batch.COMBINED_FILE}
+
+
+def test_failed_tables_are_site_errors(tmp_path, monkeypatch):
+    site = _site(tmp_path)
+    calls = batch.summary_table_calls
+
+    def _broken_calls(**kwargs):
+        result = calls(**kwargs)
+        method, table_kwargs = result["modal_df"]
+        result["modal_df"] = (method, {**table_kwargs, "unsupported": True})
+        return result
+
+    monkeypatch.setattr(batch, "summary_table_calls", _broken_calls)
+    settings = batch.settings_from_args(batch.build_parser().parse_args([site, "-o", str(tmp_path)]))
+
+    result = batch.process_site("site", site, settings, str(tmp_path / "out"))
+
+    assert [error.split(":")[0] for error in result["errors"]] == ["modal.csv"]
+    assert "modal.csv" not in result["files"]
+    assert not os.path.exists(tmp_path / "out" / "modal.csv")
+
+
+def test_files_parse_as_separate_tasks_and_match_a_serial_run(tmp_path, monkeypatch):
+    site = _site(tmp_path)
+    with open(os.path.join(site, "broken.csv"), "w", encoding="utf-8") as out:
+        out.write("not,a,log\n")
+    settings = batch.settings_from_args(batch.build_parser().parse_args([site, "-o", str(tmp_path)]))
+    tasks = []
+
+    class _Pool(batch.ProcessPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            tasks.append(fn.__name__)
+            return super().submit(fn, *args, **kwargs)
+
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", _Pool)
+    (result,) = batch.run_batch({"site": site}, str(tmp_path / "pool"), settings, workers=2, log=lambda _: None)
+    serial = batch.process_site("site", site, settings, str(tmp_path / "serial"))
+
+    assert tasks == ["parse_log"] * 3 + ["compute_site"]
+    assert result["logs"] == serial["logs"]
+    assert [error.split(":")[0] for error in result["errors"]] == ["broken.csv"]
+    for file_name in result["files"]:
+        with open(result["files"][file_name]["path"], "rb") as pooled, open(serial["files"][file_name]["path"], "rb") as local:
+            assert pooled.read() == local.read(), file_name
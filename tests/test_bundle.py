@@ -0,0 +1,80 @@
+import datetime as dt
+import io
+
+import pandas as pd
+import pycoustic as pc
+import pytest
+
+from st_config import (
+    BUNDLE_TABLE_KEYS,
+    build_bundle_zip,
+    compute_summary_tables,
+    default_times,
+    parse_log_file,
+    read_bundle_zip,
+    summary_table_calls,
+)
+from synthetic import write_survey
+
+
+@pytest.fixture(scope="module")
+def tables(tmp_path_factory):
+    paths = write_survey(str(tmp_path_factory.mktemp("bundle")), logs=2, duration="2D", rate_s=300)
+    survey = pc.Survey()
+    for idx, path in enumerate(paths):
+        survey.add_log(data=parse_log_file(path)[0][1], name=f"P{idx + 1}")
+    calls = summary_table_calls(
+        lmax_n=5,
+        lmax_t="2min",
+        modal_param=("L90", "A"),
+        day_t="60min",
+        evening_t="60min",
+        night_t="15min",
+        averaging="log",
+    )
+    errors = {}
+    tables = compute_summary_tables(None, survey, default_times, calls, errors=errors)
+    assert all(df is not None for df in tables.values()), errors
+
+    peaks, _ = survey.peak_picker(log_name="P1", pivot_col=("Lmax", "A"), k=3)
+    peaks = peaks.rename_axis("Timestamp")
+    peaks["Log"] = "P1"
+    tables["peak_picker_df"] = peaks
+    assert set(tables) == set(BUNDLE_TABLE_KEYS)
+    return tables
+
+
+def test_every_table_round_trips(tables):
+    resampled = {"P1 15min": tables["broadband_df"].iloc[:, :2]}
+    parameters = {"lmax_n": 5, "logs": ["P1", "P2"]}
+
+    loaded, loaded_resampled, manifest = read_bundle_zip(io.BytesIO(build_bundle_zip(tables, parameters, resampled)))
+
+    assert set(loaded) == set(BUNDLE_TABLE_KEYS)
+    for key, df in tables.items():
+        pd.testing.assert_frame_equal(loaded[key], df, obj=key)
+    pd.testing.assert_frame_equal(loaded_resampled["P1 15min"], resampled["P1 15min"])
+    assert manifest["parameters"] == parameters
+
+
+def test_time_labels_keep_their_types():
+    columns = pd.MultiIndex.from_tuples(
+        [
+            (pd.Timestamp("2024-01-01 07:00"), dt.date(2024, 1, 1), "A"),
+            (pd.Timestamp("2024-01-02 07:00"), dt.date(2024, 1, 2), 63.0),
+        ],
+        names=["start", "date", pd.Timedelta("15min")],
+    )
+    df = pd.DataFrame([[1.0, 2.0], [3.0, 4.0]], columns=columns)
+
+    loaded, _, _ = read_bundle_zip(io.BytesIO(build_bundle_zip({"table": df}, {})))
+
+    pd.testing.assert_frame_equal(loaded["table"], df)
+    assert isinstance(loaded["table"].columns[0][1], dt.date)
+
+
+def test_unsupported_labels_are_refused():
+    df = pd.DataFrame({frozenset({"a"}): [1.0]})
+
+    with pytest.raises(TypeError, match="column label"):
+        build_bundle_zip({"table": df}, {})
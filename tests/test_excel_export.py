@@ -0,0 +1,63 @@
+import datetime as dt
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import st_config
+from st_config import _excel_sheet_name, _export_frames_to_excel
+
+openpyxl = pytest.importorskip("openpyxl")
+
+
+def _sheets(data: bytes) -> dict[str, list[tuple]]:
+    workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True)
+    return {sheet.title: list(sheet.iter_rows(values_only=True)) for sheet in workbook.worksheets}
+
+
+def test_workbook_reads_back():
+    columns = pd.MultiIndex.from_tuples([("Daytime", "Leq", "A"), ("Night-time", "Lmax", 63.0)])
+    index = pd.to_datetime(["2024-01-01 07:00", "2024-01-02 07:00"]).rename("Start")
+    table = pd.DataFrame([[50.5, np.nan], [48.0, 70.0]], index=index, columns=columns)
+
+    sheets = _sheets(_export_frames_to_excel({"Broadband": table, "Counts": pd.Series([3, 4], name="n"), "Empty": None}))
+
+    assert list(sheets) == ["Broadband", "Counts"]
+    assert sheets["Broadband"] == [
+        (None, "Daytime", "Night-time"),
+        (None, "Leq", "Lmax"),
+        ("Start", "A", 63),
+        (dt.datetime(2024, 1, 1, 7), 50.5, None),
+        (dt.datetime(2024, 1, 2, 7), 48, 70),
+    ]
+    assert sheets["Counts"] == [(None, "n"), (0, 3), (1, 4)]
+
+
+def test_long_frames_continue_on_numbered_sheets(monkeypatch):
+    monkeypatch.setattr(st_config, "EXCEL_MAX_ROWS", 10)
+    frame = pd.DataFrame({"Leq A": np.arange(25.0)})
+
+    sheets = _sheets(_export_frames_to_excel({"Position 1 with a long log name": frame}))
+
+    assert [len(name) <= 31 for name in sheets] == [True] * 3
+    assert [name[-8:] for name in sheets] == ["(1 of 3)", "(2 of 3)", "(3 of 3)"]
+    rows = [row for sheet in sheets.values() for row in sheet[1:]]
+    assert all(sheet[0] == (None, "Leq A") and len(sheet) <= 10 for sheet in sheets.values())
+    assert [value for _, value in rows] == list(range(25))
+
+
+def test_colliding_sheet_names_keep_their_part_labels():
+    used = set()
+    names = [_excel_sheet_name("Position 1 with a long log name", used, " (1 of 2)") for _ in range(3)]
+
+    assert len(set(names)) == 3
+    assert all(len(name) <= 31 and "(1 of 2)" in name for name in names)
+    assert names[1].endswith(" (1 of 2) (1)")
+
+
+def test_too_wide_frames_are_refused(monkeypatch):
+    monkeypatch.setattr(st_config, "EXCEL_MAX_COLUMNS", 3)
+
+    with pytest.raises(ValueError, match="holds at most 3"):
+        _export_frames_to_excel({"Wide": pd.DataFrame(np.zeros((1, 3)))})
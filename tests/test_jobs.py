@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from jobs import JobCancelled, JobRunner, job_executor
+
+TIMEOUT = 10
+
+
+@pytest.fixture
+def runner():
+    executor = job_executor(max_workers=1)
+    yield JobRunner(executor)
+    executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _wait(job) -> None:
+    for _ in range(TIMEOUT * 100):
+        if job.finished:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"{job.name} did not finish")
+
+
+def test_progress_is_visible_while_running_and_result_handed_off(runner):
+    reported, release = threading.Event(), threading.Event()
+
+    def work(ctx, values, scale=1):
+        with ctx.stage("sum"):
+            ctx.progress(0.5, "halfway")
+            reported.set()
+            release.wait(TIMEOUT)
+        return sum(values) * scale
+
+    job = runner.submit("sum", ("key",), work, [1, 2, 3], scale=2)
+    assert reported.wait(TIMEOUT)
+    assert (job.status, job.progress, job.text) == ("running", 0.5, "halfway")
+
+    release.set()
+    _wait(job)
+    assert (job.status, job.result, job.progress) == ("done", 12, 1.0)
+    assert set(job.stages) == {"sum"}
+    assert runner.get("sum", ("key",)) is job
+    assert runner.get("sum", ("other",)) is None
+
+
+def test_cancelling_a_running_job_stops_it_at_the_next_check(runner):
+    started = threading.Event()
+    steps = []
+
+    def work(ctx):
+        started.set()
+        while True:
+            steps.append(len(steps))
+            ctx.progress(0.1)
+            time.sleep(0.01)
+
+    job = runner.submit("loop", None, work)
+    assert started.wait(TIMEOUT)
+    job.cancel()
+    _wait(job)
+
+    assert job.status == "cancelled"
+    assert job.result is None
+    assert len(steps) < TIMEOUT * 100
+
+
+def test_submitting_to_a_slot_cancels_the_job_it_replaces(runner):
+    release = threading.Event()
+
+    def blocking(ctx):
+        release.wait(TIMEOUT)
+        ctx.check()
+
+    first = runner.submit("slot", 1, blocking)
+    queued = runner.submit("queued", 1, lambda ctx: "never")
+    second = runner.submit("slot", 2, lambda ctx: "second")
+    queued.cancel()
+    release.set()
+    _wait(first)
+    _wait(second)
+
+    assert first.status == "cancelled"
+    assert queued.status == "cancelled" and queued.result is None
+    assert (second.status, second.result) == ("done", "second")
+    assert runner.get("slot") is second
+
+
+def test_failed_job_keeps_the_error_and_traceback(runner):
+    def work(ctx):
+        raise ValueError("bad input")
+
+    job = runner.submit("fail", None, work)
+    _wait(job)
+
+    assert job.status == "failed"
+    assert isinstance(job.error, ValueError)
+    assert "bad input" in job.traceback
+    assert job.result is None
+
+
+def test_cancelled_exception_raised_by_the_job_counts_as_cancelled(runner):
+    def work(ctx):
+        raise JobCancelled()
+
+    job = runner.submit("stop", None, work)
+    _wait(job)
+
+    assert job.status == "cancelled"
+    assert job.error is None
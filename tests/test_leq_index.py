@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pycoustic as pc
+import pytest
+
+from leq_index import range_leq, survey_table
+from log_arrays import set_survey_periods
+from log_store import session_view
+from st_config import parse_log_file
+from synthetic import write_survey
+
+TIMES = {"day": (7, 0), "evening": (19, 0), "night": (23, 0)}
+
+
+@pytest.fixture
+def log(tmp_path):
+    (path,) = write_survey(str(tmp_path), logs=1, duration="2D", rate_s=60)
+    # Gaps in the A-weighted Leq must be skipped, as pandas' mean does.
+    df = pd.read_csv(path, dtype=str)
+    df.loc[100:400, "Leq A"] = ""
+    df.loc[600:2000:3, "Leq A"] = ""
+    df.to_csv(path, index=False)
+    ((_, parsed),) = parse_log_file(path)
+    return parsed
+
+
+def _surveys(log):
+    expected = pc.Survey()
+    expected.add_log(data=session_view(log), name="P1")
+    expected.set_periods(TIMES)
+    indexed = pc.Survey()
+    indexed.add_log(data=session_view(log), name="P1")
+    set_survey_periods(indexed, TIMES)
+    return expected, indexed
+
+
+@pytest.mark.parametrize(
+    "method, kwargs",
+    [
+        ("leq_spectra", {}),
+        ("broadband_summary", {"lmax_n": 5, "lmax_t": "2min"}),
+        ("broadband_summary", {"leq_cols": [("Leq", "A"), ("Leq", 63.0)]}),
+    ],
+)
+def test_indexed_tables_match_pycoustic(log, method, kwargs):
+    expected, indexed = _surveys(log)
+
+    pd.testing.assert_frame_equal(survey_table(indexed, method, **kwargs), getattr(expected, method)(**kwargs))
+
+
+def test_range_leq_matches_energy_mean(log):
+    start, end = log.get_data().index[50], log.get_data().index[700]
+    antilogs = log.get_antilogs().loc[start:end, ("Leq", "A")]
+
+    leq = range_leq(log, start, end)
+
+    assert leq[("Leq", "A")] == round(10 * np.log10(antilogs.mean()), 1)
+    assert leq.index.get_level_values(0).unique().tolist() == ["Leq"]
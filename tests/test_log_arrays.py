@@ -0,0 +1,64 @@
+import pandas as pd
+import pycoustic as pc
+import pytest
+
+from log_arrays import NIGHT_IDX_COLUMN, NIGHT_IDX_LABEL, apply_periods, attach_arrays
+from log_store import session_view
+from st_config import parse_log_file
+from synthetic import write_survey
+
+TIMES = [
+    {"day": (7, 0), "evening": (19, 0), "night": (23, 0)},
+    {"day": (6, 30), "evening": (22, 0), "night": (22, 0)},
+    {"day": (8, 0), "evening": (20, 0), "night": (2, 0)},
+]
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    (path,) = write_survey(str(tmp_path), logs=1, duration="2D", rate_s=300)
+    return path
+
+
+@pytest.mark.parametrize("times", TIMES)
+def test_apply_periods_matches_pycoustic(log_path, times):
+    expected = pc.Log(log_path)
+    expected.set_periods(times)
+    ((_, log),) = parse_log_file(log_path)
+    view = session_view(log)
+
+    apply_periods(view, times)
+
+    pd.testing.assert_frame_equal(view.get_data(), expected.get_data())
+    pd.testing.assert_frame_equal(view.get_antilogs(), expected.get_antilogs())
+    for code, period in enumerate(("days", "evenings", "nights")):
+        pd.testing.assert_frame_equal(view.get_period(period=period), expected.get_period(period=period))
+        assert (view._arrays.periods(times)[0] == code).sum() == len(expected.get_period(period=period, night_idx=False))
+
+
+def test_night_index_names_match_pycoustic():
+    from pycoustic.log import NIGHT_IDX_COLUMN as column, NIGHT_IDX_LABEL as label
+
+    assert (NIGHT_IDX_LABEL, NIGHT_IDX_COLUMN) == (label, column)
+
+
+def test_views_share_arrays_but_not_night_index(log_path):
+    ((_, log),) = parse_log_file(log_path)
+    original = log.get_data()[("Night idx", "")].copy()
+    view = session_view(log)
+
+    apply_periods(view, TIMES[2])
+
+    assert view._arrays is log._arrays
+    pd.testing.assert_series_equal(log.get_data()[("Night idx", "")], original)
+
+
+def test_to_frame_round_trips_measurements(log_path):
+    ((_, log),) = parse_log_file(log_path)
+    arrays = attach_arrays(log)
+    data = log.get_data().drop(columns="Night idx", level=0)
+
+    pd.testing.assert_frame_equal(arrays.to_frame(), data, check_names=False, check_freq=False)
+    freqs, matrix = arrays.band_matrix("Leq")
+    assert freqs.tolist() == sorted(freqs.tolist())
+    assert matrix.shape == (len(freqs), len(data))
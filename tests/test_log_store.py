@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pycoustic as pc
+import pytest
+
+from log_store import LogBudgetError, SharedLogStore, log_nbytes, session_view
+from memory import session_report
+from st_config import parse_log_file
+from synthetic import write_survey
+
+MB = 1024 * 1024
+
+
+class _Log:
+    def __init__(self, megabytes: int) -> None:
+        self.frame = pd.DataFrame({"a": np.zeros(megabytes * MB // 8)})
+
+    def get_data(self) -> pd.DataFrame:
+        return self.frame
+
+
+def _parse(megabytes: int, calls: list | None = None):
+    def parse():
+        if calls is not None:
+            calls.append(megabytes)
+        return ((None, _Log(megabytes)),)
+    return parse
+
+
+def test_references_pin_entries_until_every_holder_releases():
+    store = SharedLogStore(max_bytes=3 * MB)
+    calls = []
+    store.acquire("a", "k", _parse(2, calls))
+    store.acquire("a", "k", _parse(2, calls))
+    store.acquire("b", "k", _parse(2, calls))
+
+    assert calls == [2]
+    store.release("a", "k")
+    store.release_holder("b")
+    assert store.stats()["pinned_bytes"] > 0
+
+    store.release("a", "k")
+    assert store.stats()["pinned_bytes"] == 0
+    # Unreferenced entries stay cached until the budget needs their space.
+    assert store.stats()["entries"] == 1
+    store.acquire("c", "other", _parse(2))
+    assert store.stats()["entries"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    store = SharedLogStore(max_bytes=int(2.5 * MB))
+    for key in ("old", "new"):
+        store.acquire("s", key, _parse(1))
+        store.release("s", key)
+    store.acquire("s", "old", _parse(1))
+    store.release("s", "old")
+
+    store.acquire("s", "third", _parse(1))
+    store.release("s", "third")
+
+    calls = []
+    store.acquire("t", "old", _parse(1, calls))
+    assert calls == []
+    store.acquire("t", "new", _parse(1, calls))
+    assert calls == [1]
+    assert store.stats()["evictions"] == 2
+
+
+def test_budgets_refuse_logs_that_do_not_fit():
+    store = SharedLogStore(max_bytes=3 * MB, max_session_bytes=int(1.5 * MB))
+    store.acquire("a", "first", _parse(1))
+
+    with pytest.raises(LogBudgetError, match="per-session"):
+        store.acquire("a", "second", _parse(1))
+    store.acquire("b", "second", _parse(1))
+    with pytest.raises(LogBudgetError, match="shared"):
+        store.acquire("c", "third", _parse(1))
+
+
+def test_views_share_data_and_keep_their_own_night_index(tmp_path):
+    (path,) = write_survey(str(tmp_path), logs=1, duration="1D", rate_s=300)
+    ((_, log),) = parse_log_file(path)
+    night_idx = log.get_data()[("Night idx", "")].copy()
+    first, second = session_view(log), session_view(log)
+
+    survey = pc.Survey()
+    survey.add_log(data=first, name="P1")
+    survey.set_periods({"day": (8, 0), "evening": (20, 0), "night": (2, 0)})
+    second.set_periods({"day": (6, 0), "evening": (19, 0), "night": (22, 0)})
+
+    for view in (first, second):
+        for attr in ("_master", "_antilogs"):
+            shared = getattr(log, attr)[("Leq", "A")].to_numpy()
+            assert np.shares_memory(getattr(view, attr)[("Leq", "A")].to_numpy(), shared)
+    pd.testing.assert_series_equal(log.get_data()[("Night idx", "")], night_idx)
+    assert not first.get_data()[("Night idx", "")].equals(second.get_data()[("Night idx", "")])
+    assert log_nbytes(first) >= log.get_data().memory_usage(deep=True).sum()
+
+
+def test_session_reports_count_only_what_a_view_adds(tmp_path):
+    (path,) = write_survey(str(tmp_path), logs=1, duration="1D", rate_s=300)
+    store = SharedLogStore(max_bytes=64 * MB)
+    ((_, log),) = store.acquire("a", "k", lambda: parse_log_file(path))
+    view = session_view(log)
+    view.set_periods({"day": (6, 0), "evening": (19, 0), "night": (22, 0)})
+
+    report = session_report(
+        {"logs": {"P1": view}}, table_keys=[], cache_keys=[], shared_logs=["P1"], shared_data=store.held_logs("a")
+    )
+
+    assert store.held_logs("b") == []
+    assert 0 < report["total"] < log_nbytes(log) / 10
+
+
+def test_failed_parse_does_not_keep_its_lock():
+    store = SharedLogStore(max_bytes=3 * MB)
+
+    def fail():
+        raise ValueError("not a log")
+
+    with pytest.raises(ValueError):
+        store.acquire("a", "bad", fail)
+    assert store._parse_locks == {}
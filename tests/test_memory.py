@@ -0,0 +1,86 @@
+import gc
+
+import numpy as np
+import pandas as pd
+
+from memory import MemoryRegistry, deep_size, session_report
+from stage_timer import StageTimer
+
+
+class _Holder:
+    def __init__(self, frame):
+        self.frame = frame
+
+
+def test_deep_size_counts_shared_objects_once():
+    frame = pd.DataFrame({"a": np.zeros(10_000)})
+    single = deep_size(frame)
+
+    assert single >= 80_000
+    assert deep_size([frame, frame, _Holder(frame)]) < 2 * single
+
+
+def test_session_report_sizes_each_section():
+    frame = pd.DataFrame({"a": np.zeros(10_000)})
+    log = _Holder(frame)
+    state = {
+        "logs": {"P1": log},
+        "pending_uploads": [{"data": b"x" * 500}],
+        "leq_df": pd.DataFrame({"b": np.ones(100)}),
+        "weather_masked_logs": {"P1": _Holder(log)},
+    }
+
+    report = session_report(state, table_keys=["leq_df", "counts"], cache_keys=["weather_masked_logs"], shared_logs=["P1"])
+
+    assert report["logs"]["P1"]["shared"]
+    assert report["pending_uploads"] == 500
+    assert list(report["tables"]) == ["leq_df"]
+    # The masked-log cache wraps the loaded log, so it adds only its own wrapper.
+    assert report["caches"]["weather_masked_logs"] < 10_000
+    assert report["total"] == (
+        report["logs"]["P1"]["bytes"] + 500 + report["tables"]["leq_df"] + report["caches"]["weather_masked_logs"]
+    )
+
+
+def test_shared_log_data_counts_only_session_overhead():
+    stored = _Holder(pd.DataFrame({"a": np.zeros(10_000), "b": np.ones(10_000)}))
+    view = _Holder(stored.frame.copy(deep=False))
+    view.frame["b"] = np.arange(10_000.0)
+
+    alone = session_report({"logs": {"P1": view}}, table_keys=[], cache_keys=[])
+    report = session_report(
+        {"logs": {"P1": view}}, table_keys=[], cache_keys=[], shared_logs=["P1"], shared_data=[stored]
+    )
+
+    assert alone["logs"]["P1"]["bytes"] >= 160_000
+    # Only the replaced column belongs to the session; the rest is counted by the store.
+    assert 80_000 <= report["total"] < 100_000
+
+
+def test_registry_drops_sessions_with_their_owner():
+    registry = MemoryRegistry()
+    owner = _Holder(None)
+    registry.publish("abc", {"total": 1024, "logs": {}}, owner=owner)
+    assert registry.totals()["bytes"] == 1024
+
+    del owner
+    gc.collect()
+    assert registry.totals() == {"sessions": 0, "bytes": 0, "largest": []}
+
+
+def test_stage_peaks_include_nested_allocations():
+    timer = StageTimer()
+    timer.begin_rerun(enabled=True, trace_memory=True)
+    try:
+        with timer.stage("outer"):
+            with timer.stage("inner"):
+                block = np.ones(2_000_000)
+                del block
+            small = np.ones(1_000)
+            del small
+    finally:
+        timer.set_trace_memory(False)
+
+    peaks = timer.peak_memory()
+    assert peaks["inner"] >= 16_000_000
+    assert peaks["outer"] >= peaks["inner"]
@@ -0,0 +1,228 @@
+"""Time and peak-memory budgets for representative workloads, against a stored baseline.
+
+Skipped by default; run on the machine the baseline was recorded on with
+
+    python -m pytest tests/test_performance.py --perf
+
+and re-record it after an intended change (or on new hardware) with
+``--update-perf-baseline``. Each workload runs in a fresh interpreter: its
+setup (parsing inputs, building the survey) is excluded, then the measured step
+is timed and its resident-memory high-water mark is taken above the
+post-setup level. Peak memory is measured on Linux only. Summary tables are
+checked to be present, so a table that fails (and comes back as None) cannot
+make a workload look fast.
+
+The stored baseline was recorded on Python 3.11.7, the only interpreter
+available where it was taken, although the project requires 3.12 or later;
+re-record it on the target interpreter before relying on its budgets.
+"""
+import datetime as dt
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pycoustic as pc
+import pytest
+
+from log_arrays import set_survey_periods
+from st_config import (
+    _combined_sections,
+    compute_summary_tables,
+    default_times,
+    parse_log_file,
+    summary_table_calls,
+    write_csv_sections,
+)
+from synthetic import write_survey
+
+pytestmark = pytest.mark.perf
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "perf_baseline.json")
+TIME_TOLERANCE = float(os.environ.get("PYCOUSTIC_PERF_TIME_TOLERANCE", 1.5))
+MEMORY_TOLERANCE = float(os.environ.get("PYCOUSTIC_PERF_MEMORY_TOLERANCE", 1.25))
+# Budgets below this are dominated by noise, so they are checked against the floor instead.
+MIN_BUDGET_S = 0.25
+MIN_BUDGET_BYTES = 32 * 1024 * 1024
+
+SURVEY_LOGS = 20
+PEAK_K = 100
+CALLS = summary_table_calls(
+    lmax_n=10,
+    lmax_t="2min",
+    modal_param=("L90", "A"),
+    day_t="60min",
+    evening_t="60min",
+    night_t="15min",
+    averaging="log",
+)
+
+
+def _status_kb(field: str) -> int | None:
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def _parse(paths: list[str]) -> dict:
+    logs = {}
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for prof_name, log in parse_log_file(path):
+            logs[stem if prof_name is None else f"{stem} - {prof_name}"] = log
+    return logs
+
+
+def _survey(logs: dict) -> pc.Survey:
+    survey = pc.Survey()
+    for name, log in logs.items():
+        survey.add_log(data=log, name=name)
+    return survey
+
+
+def _setup_peak_picker(paths):
+    survey = _survey(_parse(paths))
+    set_survey_periods(survey, default_times)
+    return survey
+
+
+def _run_peak_picker(survey):
+    survey.peak_picker(log_name=next(iter(survey._logs)), pivot_col=("Lmax", "A"), k=PEAK_K)
+
+
+def _summary_tables(survey: pc.Survey) -> dict:
+    errors = {}
+    tables = compute_summary_tables(None, survey, default_times, CALLS, errors=errors)
+    return {"tables": tables, "errors": errors}
+
+
+def _check_tables(output: dict) -> None:
+    missing = [key for key, df in output["tables"].items() if df is None]
+    assert not missing, f"Summary tables failed: {output['errors']}"
+
+
+def _setup_combined_csv(paths):
+    output = _summary_tables(_survey(_parse(paths)))
+    _check_tables(output)
+    return output["tables"]
+
+
+def _run_combined_csv(tables):
+    sections = _combined_sections(
+        tables["broadband_df"],
+        tables["leq_df"],
+        tables["lmax_df"],
+        tables["modal_df"],
+        tables["counts"],
+        day_start=default_times["day"],
+        evening_start=default_times["evening"],
+        night_start=default_times["night"],
+        lmax_n=10,
+        lmax_t=2,
+        modal_param=("L90", "A"),
+        day_t="60min",
+        evening_t="60min",
+        night_t="15min",
+    )
+    with write_csv_sections(sections) as buffer:
+        buffer.read()
+
+
+# name: (input set, setup(paths) -> state, run(state) -> output, check(output) or None)
+# Summary tables are checked after the timed call: computing them first would warm
+# the period caches the workload measures.
+WORKLOADS = {
+    "import_7d_1s": ("week_1s", lambda paths: paths, _parse, None),
+    "summary_tables_20_logs": ("survey_20", lambda paths: _survey(_parse(paths)), _summary_tables, _check_tables),
+    "peak_picker_k100_7d_1s": ("week_1s", _setup_peak_picker, _run_peak_picker, None),
+    "combined_csv_20_logs": ("survey_20", _setup_combined_csv, _run_combined_csv, None),
+}
+
+
+def _measure(name: str, paths: list[str]) -> dict:
+    _, setup, run, check = WORKLOADS[name]
+    state = setup(paths)
+    gc.collect()
+    baseline_rss = _status_kb("VmRSS")
+    tracks_peak = _reset_peak_rss() and baseline_rss is not None
+    started = time.perf_counter()
+    output = run(state)
+    seconds = time.perf_counter() - started
+    peak = _status_kb("VmHWM") if tracks_peak else None
+    if check is not None:
+        check(output)
+    return {"seconds": seconds, "peak_bytes": None if peak is None else max(peak - baseline_rss, 0)}
+
+
+@pytest.fixture(scope="session")
+def inputs(tmp_path_factory) -> dict[str, list[str]]:
+    root = tmp_path_factory.mktemp("perf")
+    return {
+        "week_1s": write_survey(str(root / "week_1s"), logs=1, duration="7D", rate_s=1),
+        "survey_20": write_survey(str(root / "survey_20"), logs=SURVEY_LOGS, duration="7D", rate_s=60),
+    }
+
+
+@pytest.fixture(scope="session")
+def baseline(request):
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as source:
+            recorded = json.load(source)
+    else:
+        recorded = {"results": {}}
+    yield recorded
+    if request.config.getoption("--update-perf-baseline"):
+        recorded.update(
+            created=dt.datetime.now().isoformat(timespec="seconds"),
+            python=platform.python_version(),
+            platform=platform.platform(),
+        )
+        with open(BASELINE_PATH, "w", encoding="utf-8") as out:
+            json.dump(recorded, out, indent=2, sort_keys=True)
+            out.write("\n")
+
+
+@pytest.mark.parametrize("name", list(WORKLOADS))
+def test_workload_within_budget(name, inputs, baseline, request):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        measured = pool.submit(_measure, name, inputs[WORKLOADS[name][0]]).result()
+
+    if request.config.getoption("--update-perf-baseline"):
+        baseline["results"][name] = {
+            "seconds": round(measured["seconds"], 4),
+            "peak_bytes": measured["peak_bytes"],
+        }
+        return
+
+    expected = baseline["results"].get(name)
+    if expected is None:
+        pytest.skip(f"No baseline for {name}; record one with --update-perf-baseline.")
+
+    time_budget = max(expected["seconds"], MIN_BUDGET_S) * TIME_TOLERANCE
+    assert measured["seconds"] <= time_budget, (
+        f"{name} took {measured['seconds']:.3f} s; budget {time_budget:.3f} s "
+        f"({TIME_TOLERANCE}x the {expected['seconds']:.3f} s baseline)"
+    )
+    if measured["peak_bytes"] is not None and expected.get("peak_bytes") is not None:
+        memory_budget = max(expected["peak_bytes"], MIN_BUDGET_BYTES) * MEMORY_TOLERANCE
+        assert measured["peak_bytes"] <= memory_budget, (
+            f"{name} peaked at {measured['peak_bytes'] / 1024 ** 2:.1f} MB; budget {memory_budget / 1024 ** 2:.1f} MB "
+            f"({MEMORY_TOLERANCE}x the {expected['peak_bytes'] / 1024 ** 2:.1f} MB baseline)"
+        )
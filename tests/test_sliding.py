@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sliding import evaluation_times, sliding_leq, sliding_ln, window_rows
+from st_config import parse_log_file
+from synthetic import write_survey
+
+WINDOW_NS = int(pd.Timedelta("5min").value)
+
+
+@pytest.fixture
+def arrays(tmp_path):
+    (path,) = write_survey(str(tmp_path), logs=1, duration="6h", rate_s=10, seed=3)
+    ((_, log),) = parse_log_file(path)
+    return log._arrays
+
+
+def test_sliding_leq_matches_rolling_energy_mean(arrays):
+    times = evaluation_times(arrays, WINDOW_NS, max_points=len(arrays))
+    starts, ends = window_rows(arrays.timestamps, times, WINDOW_NS)
+    values = arrays.column(("Leq", "A"))
+    rolling = pd.Series(10 ** (values / 10), index=pd.DatetimeIndex(arrays.timestamps.view("datetime64[ns]")))
+    expected = 10 * np.log10(rolling.rolling("5min").mean().to_numpy()[ends - 1])
+
+    np.testing.assert_allclose(sliding_leq(arrays, ("Leq", "A"), starts, ends), expected, atol=1e-9)
+    assert times[0] - arrays.timestamps[0] == WINDOW_NS - 10 * 10 ** 9
+
+
+def test_sliding_ln_matches_percentiles_of_each_window(arrays):
+    times = evaluation_times(arrays, WINDOW_NS, max_points=200)
+    starts, ends = window_rows(arrays.timestamps, times, WINDOW_NS)
+    values = arrays.column(("Leq", "A")).copy()
+    values[::7] = np.nan
+
+    result = sliding_ln(values, starts, ends, [10, 90])
+
+    assert len(times) <= 200
+    for n in (10, 90):
+        expected = [np.nanpercentile(values[start:end], 100 - n, method="inverted_cdf") for start, end in zip(starts, ends)]
+        np.testing.assert_allclose(result[n], expected, atol=1e-9)
@@ -0,0 +1,42 @@
+import json
+import time
+
+from stage_timer import StageTimer
+
+
+def test_disabled_timer_records_nothing():
+    timer = StageTimer()
+    timer.begin_rerun()
+    with timer.stage("build_survey"):
+        pass
+
+    assert timer.records == []
+    assert timer.end_rerun() is None
+
+
+def test_nested_stages_report_self_time():
+    timer = StageTimer()
+    timer.begin_rerun("Analysis", enabled=True)
+    with timer.stage("page"):
+        with timer.stage("survey.leq_spectra"):
+            time.sleep(0.02)
+    timer.record("job:summary_tables.modal", 5.0)
+
+    rows = {row["name"]: row for row in timer.breakdown()}
+    assert rows["survey.leq_spectra"]["depth"] == 1
+    assert rows["page"]["self_s"] < rows["survey.leq_spectra"]["seconds"]
+    assert timer.slowest(1)[0]["name"] == "job:summary_tables.modal"
+
+
+def test_stages_between_reruns_carry_into_the_next():
+    timer = StageTimer(history=2)
+    for label in ("first", "second", "third"):
+        timer.begin_rerun(label, enabled=True)
+        timer.end_rerun()
+        with timer.stage(f"export:{label}"):
+            pass
+
+    timer.begin_rerun("fourth")
+    assert [row["name"] for row in timer.breakdown()] == ["export:third"]
+    assert timer.breakdown()[0]["offset_s"] < 0
+    assert [rerun["label"] for rerun in json.loads(timer.to_json())["reruns"]] == ["second", "third"]
@@ -0,0 +1,19 @@
+from st_config import TEMPLATE_COLUMNS, parse_log_file
+from synthetic import log_columns, log_frame, write_survey
+
+
+def test_default_layout_matches_template():
+    assert log_columns() == TEMPLATE_COLUMNS
+    assert log_frame(duration="1h").columns.tolist() == TEMPLATE_COLUMNS
+
+
+def test_sub_minute_logs_parse_at_their_rate(tmp_path):
+    (path,) = write_survey(str(tmp_path), logs=1, duration="10min", rate_s=1, bands=12)
+
+    ((profile, log),) = parse_log_file(path)
+    data = log.get_data()
+
+    assert profile is None
+    assert len(data) == 600
+    assert (data.index[1] - data.index[0]).total_seconds() == 1
+    assert len([col for col in data.columns if col[0] == "Leq" and col[1] != "A"]) == 12
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "trace-{pid}.jsonl"
+    tracer = tracing.configure(str(path), max_bytes=2048, backups=2)
+    yield tracer
+    tracing.configure(None)
+
+
+def _spans(tracer) -> list[dict]:
+    tracer.close()
+    with open(tracer.path, encoding="utf-8") as trace:
+        return [json.loads(line) for line in trace]
+
+
+def test_spans_are_written_as_json_lines(trace_file):
+    with tracing.span("survey.leq_spectra", session="abc", logs=2) as trace:
+        trace["cache"] = "miss"
+    with pytest.raises(ValueError):
+        with tracing.span("resample", session="abc"):
+            raise ValueError("bad interval")
+
+    first, second = _spans(trace_file)
+    assert first["span"] == "survey.leq_spectra"
+    assert first["session"] == "abc"
+    assert first["logs"] == 2 and first["cache"] == "miss"
+    assert first["status"] == "ok" and first["duration_ms"] >= 0
+    assert second["status"] == "error"
+    assert second["error"] == "ValueError: bad interval"
+
+
+def test_trace_file_rotates(trace_file, tmp_path):
+    for idx in range(100):
+        with tracing.span("import", session="abc", file=f"log{idx}.csv"):
+            pass
+    trace_file.close()
+
+    files = sorted(path.name for path in tmp_path.iterdir())
+    assert len(files) == 3
+    assert all(path.stat().st_size <= 2048 for path in tmp_path.iterdir())
+
+
+def test_disabled_tracing_is_a_no_op(tmp_path):
+    tracing.configure(None)
+    with tracing.span("export.workspace") as trace:
+        trace["bytes"] = 10
+
+    assert not tracing.tracing_enabled()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,284 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+from weather_history import (
+    RateLimiter,
+    WeatherCache,
+    WeatherFetchError,
+    fetch_observations_concurrently,
+    history_timestamps,
+    load_weather_history,
+)
+
+
+class _FakeOpenWeather:
+    """Local stand-in for the OpenWeather geocoding and One Call timemachine endpoints."""
+
+    def __init__(self, delay_s: float = 0.0, fail_on: set[int] | None = None) -> None:
+        self.delay_s = delay_s
+        self.fail_on = fail_on or set()
+        self.requests: list[int] = []
+        self.client_ports: set[int] = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _send(self, status: int, payload: dict) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                with fake._lock:
+                    fake.client_ports.add(self.client_address[1])
+                if url.path == "/geo/1.0/zip":
+                    self._send(200, {"zip": query["zip"][0], "lat": 51.5, "lon": -0.12})
+                    return
+
+                ts = int(query["dt"][0])
+                with fake._lock:
+                    fake.requests.append(ts)
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    time.sleep(fake.delay_s)
+                    if ts in fake.fail_on:
+                        self._send(500, {"cod": 500, "message": "Internal error"})
+                        return
+                    self._send(
+                        200,
+                        {
+                            "lat": 51.5,
+                            "lon": -0.12,
+                            "timezone": "Europe/London",
+                            "data": [
+                                {
+                                    "dt": ts,
+                                    "sunrise": ts - 3600,
+                                    "sunset": ts + 3600,
+                                    "temp": 10.0,
+                                    "wind_speed": 3.5,
+                                    "weather": [{"id": 800, "main": "Clear"}],
+                                }
+                            ],
+                        },
+                    )
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.geo_url = f"{self.base}/geo/1.0/zip"
+        self.timemachine_url = f"{self.base}/data/3.0/onecall/timemachine"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "_FakeOpenWeather":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _fetch_kwargs(server: _FakeOpenWeather) -> dict:
+    return dict(lat=51.5, lon=-0.12, api_key="test", units="metric", timeout=5, base_url=server.timemachine_url)
+
+
+def test_concurrent_fetch_returns_every_timestamp_without_weather_key():
+    timestamps = [1_700_000_000 + 3600 * i for i in range(12)]
+    with _FakeOpenWeather(delay_s=0.05) as server:
+        results = fetch_observations_concurrently(
+            timestamps, max_workers=4, max_requests_per_s=None, **_fetch_kwargs(server)
+        )
+
+    assert sorted(results) == timestamps
+    assert all("weather" not in obs for obs in results.values())
+    assert server.max_in_flight > 1
+    assert server.max_in_flight <= 4
+
+
+def test_concurrent_fetch_respects_rate_ceiling():
+    timestamps = [1_700_000_000 + 3600 * i for i in range(10)]
+    with _FakeOpenWeather() as server:
+        started = time.monotonic()
+        fetch_observations_concurrently(
+            timestamps, max_workers=8, max_requests_per_s=20, **_fetch_kwargs(server)
+        )
+        elapsed = time.monotonic() - started
+
+    # Ten requests spaced 50 ms apart cannot finish in under ~450 ms.
+    assert elapsed >= 0.4
+
+
+def test_concurrent_fetch_reports_progress():
+    timestamps = [1_700_000_000 + 3600 * i for i in range(6)]
+    seen: list[tuple[int, int]] = []
+    with _FakeOpenWeather() as server:
+        fetch_observations_concurrently(
+            timestamps,
+            max_workers=3,
+            max_requests_per_s=None,
+            progress=lambda done, total: seen.append((done, total)),
+            **_fetch_kwargs(server),
+        )
+
+    assert seen == [(i, 6) for i in range(1, 7)]
+
+
+def test_concurrent_fetch_failure_keeps_partial_results():
+    timestamps = [1_700_000_000 + 3600 * i for i in range(6)]
+    with _FakeOpenWeather(fail_on={timestamps[-1]}) as server:
+        with pytest.raises(WeatherFetchError) as excinfo:
+            fetch_observations_concurrently(
+                timestamps, max_workers=1, max_requests_per_s=None, **_fetch_kwargs(server)
+            )
+
+    assert timestamps[-1] not in excinfo.value.observations
+    assert set(excinfo.value.observations) <= set(timestamps[:-1])
+
+
+def test_rate_limiter_without_ceiling_does_not_block():
+    limiter = RateLimiter(None)
+    started = time.monotonic()
+    for _ in range(100):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.1
+
+
+def test_load_weather_history_fetches_only_missing_hours(tmp_path):
+    cache = WeatherCache(str(tmp_path / "weather.sqlite3"))
+    common = dict(
+        interval_hours=1,
+        api_key="test",
+        country="GB",
+        postcode="WC1",
+        units="metric",
+        timeout=5,
+        cache=cache,
+        max_requests_per_s=None,
+    )
+
+    with _FakeOpenWeather() as server:
+        urls = dict(geo_url=server.geo_url, timemachine_url=server.timemachine_url)
+        first_df, first = load_weather_history(
+            start="2024-01-01 00:00", end="2024-01-01 05:00", **common, **urls
+        )
+        second_df, second = load_weather_history(
+            start="2024-01-01 00:00", end="2024-01-01 05:00", **common, **urls
+        )
+        extended_df, extended = load_weather_history(
+            start="2024-01-01 00:00", end="2024-01-01 08:00", **common, **urls
+        )
+
+    assert first == {"cached": 0, "fetched": 6, "missing": 0}
+    assert second == {"cached": 6, "fetched": 0, "missing": 0}
+    assert extended == {"cached": 6, "fetched": 3, "missing": 0}
+    assert len(server.requests) == 9
+    assert len(extended_df) == 9
+    assert pd.api.types.is_datetime64_any_dtype(first_df["dt"])
+    pd.testing.assert_frame_equal(first_df, second_df)
+
+
+def test_geocode_shares_the_observation_session(tmp_path):
+    with _FakeOpenWeather() as server:
+        _, summary = load_weather_history(
+            start="2024-01-01 00:00",
+            end="2024-01-01 03:00",
+            interval_hours=1,
+            api_key="test",
+            country="GB",
+            postcode="WC1",
+            units="metric",
+            cache=WeatherCache(str(tmp_path / "weather.sqlite3")),
+            max_workers=1,
+            geo_url=server.geo_url,
+            timemachine_url=server.timemachine_url,
+        )
+
+    assert summary["fetched"] == 4
+    # One pooled connection carried the geocode lookup and every observation.
+    assert len(server.client_ports) == 1
+
+
+def test_load_weather_history_offline_serves_cache_only(tmp_path):
+    cache = WeatherCache(str(tmp_path / "weather.sqlite3"))
+    with _FakeOpenWeather() as server:
+        load_weather_history(
+            start="2024-01-01 00:00",
+            end="2024-01-01 02:00",
+            interval_hours=1,
+            api_key="test",
+            country="GB",
+            postcode="WC1",
+            units="metric",
+            cache=cache,
+            geo_url=server.geo_url,
+            timemachine_url=server.timemachine_url,
+        )
+
+    df, summary = load_weather_history(
+        start="2024-01-01 00:00",
+        end="2024-01-01 04:00",
+        interval_hours=1,
+        api_key="",
+        country="GB",
+        postcode="WC1",
+        units="metric",
+        cache=cache,
+        offline=True,
+    )
+
+    assert summary == {"cached": 3, "fetched": 0, "missing": 2}
+    assert len(df) == 3
+
+
+def test_history_timestamps_align_to_interval_grid():
+    coarse = history_timestamps("2024-01-01 05:17", "2024-01-02 00:00", 6)
+    fine = history_timestamps("2024-01-01 05:17", "2024-01-02 00:00", 1)
+
+    # 6 h grid floors 05:17 to 00:00; every 6 h point inside the hourly span is reused.
+    assert len(coarse) == 5
+    assert {ts for ts in coarse if ts >= fine[0]} <= set(fine)
+
+
+def test_progress_callback_raising_stops_fetch_with_partial_results():
+    timestamps = [1_700_000_000 + 3600 * i for i in range(20)]
+
+    def _stop_after_three(done: int, total: int) -> None:
+        if done >= 3:
+            raise RuntimeError("cancelled")
+
+    with _FakeOpenWeather(delay_s=0.02) as server:
+        with pytest.raises(WeatherFetchError) as excinfo:
+            fetch_observations_concurrently(
+                timestamps,
+                max_workers=2,
+                max_requests_per_s=None,
+                progress=_stop_after_three,
+                **_fetch_kwargs(server),
+            )
+
+    assert len(excinfo.value.observations) == 3
+    assert len(server.requests) < len(timestamps)
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pycoustic as pc
+import pytest
+
+from leq_index import survey_table
+from log_arrays import set_survey_periods
+from st_config import parse_log_file
+from synthetic import write_survey
+from weather_masks import WeatherExcludedLog, align_weather, exclusion_mask
+
+HOUR = pd.Timedelta(hours=1)
+TIMES = {"day": (7, 0), "evening": (19, 0), "night": (23, 0)}
+
+
+def _weather(hours: int = 72, start: str = "2024-01-01") -> pd.DataFrame:
+    dt = pd.date_range(start, periods=hours // 3, freq="3h")
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "dt": dt,
+        "wind_speed": rng.uniform(0, 10, len(dt)).round(1),
+        "wind_gust": rng.uniform(5, 20, len(dt)).round(1),
+        "rain": np.where(np.arange(len(dt)) % 5 == 0, 1.0, 0.0),
+    })
+
+
+def test_align_takes_latest_reading_within_tolerance():
+    weather = pd.DataFrame({"dt": pd.to_datetime(["2024-01-01 00:00", "2024-01-01 06:00"]), "wind_speed": [1.0, 2.0]})
+    index = pd.to_datetime(["2024-01-01 07:00", "2024-01-01 00:30", "2024-01-01 02:00", "2023-12-31 23:00"])
+
+    aligned = align_weather(index, weather, ["wind_speed", "rain"], tolerance=HOUR)
+
+    assert list(aligned.columns) == ["wind_speed"]
+    assert aligned.index.equals(index)
+    np.testing.assert_array_equal(aligned["wind_speed"].to_numpy(), [2.0, 1.0, np.nan, np.nan])
+
+
+def test_gust_threshold_is_optional():
+    weather = pd.DataFrame({
+        "dt": pd.to_datetime(["2024-01-01 00:00", "2024-01-01 01:00"]),
+        "wind_speed": [1.0, 1.0],
+        "wind_gust": [3.0, 12.0],
+    })
+    index = pd.date_range("2024-01-01", periods=4, freq="30min")
+    kwargs = dict(max_wind_speed=5.0, max_rain=None, tolerance=HOUR)
+
+    assert not exclusion_mask(index, weather, **kwargs).any()
+    assert exclusion_mask(index, weather, max_wind_gust=10.0, **kwargs).tolist() == [False, False, True, True]
+
+
+@pytest.fixture
+def logs(tmp_path):
+    paths = write_survey(str(tmp_path), logs=2, duration="3D", rate_s=300)
+    return [parse_log_file(path)[0][1] for path in paths]
+
+
+@pytest.mark.parametrize("settings", [
+    {"max_wind_speed": 5.0, "max_rain": 0.0},
+    {"max_wind_speed": None, "max_wind_gust": 12.0, "max_rain": None},
+])
+def test_excluded_log_tables_match_pycoustic_on_filtered_rows(logs, settings):
+    weather = _weather()
+    survey = pc.Survey()
+    for idx, log in enumerate(logs):
+        survey.add_log(data=WeatherExcludedLog(log, weather, settings, tolerance=3 * HOUR), name=f"P{idx + 1}")
+    set_survey_periods(survey, TIMES)
+
+    wrapped = survey._logs["P1"]
+    keep = ~exclusion_mask(logs[0].get_data().index, weather, tolerance=3 * HOUR, **settings)
+    assert 0 < wrapped.excluded_fraction() < 1
+    pd.testing.assert_frame_equal(wrapped.get_data(), logs[0].get_data()[keep])
+    assert len(logs[0].get_data()) == len(keep)
+
+    assert wrapped.masked_arrays() is not None
+    pd.testing.assert_frame_equal(survey_table(survey, "leq_spectra"), survey.leq_spectra())
+    pd.testing.assert_frame_equal(
+        survey_table(survey, "broadband_summary", lmax_n=5, lmax_t="10min"),
+        survey.broadband_summary(lmax_n=5, lmax_t="10min"),
+    )
+
+
+def test_masked_arrays_are_shared_by_session_views(logs):
+    excluded = WeatherExcludedLog(logs[0], _weather(), {"max_wind_speed": 5.0}, tolerance=3 * HOUR)
+
+    masked = excluded.masked_arrays()
+
+    assert excluded.with_log(logs[0]).masked_arrays() is masked
+    assert masked.timestamps is logs[0]._arrays.timestamps
+    assert logs[0]._arrays._kept is None
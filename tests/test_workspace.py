@@ -0,0 +1,248 @@
+import contextlib
+import gc
+import hashlib
+import io
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+
+import tracing
+
+from st_config import (
+    PreparedExports,
+    RESAMPLE_CACHE_ENTRIES,
+    _build_survey,
+    _prepare_export,
+    _log_to_frame,
+    _parse_log_bytes,
+    build_combined_csv_export,
+    build_workspace_snapshot,
+    combined_csv_export_key,
+    compute_summary_tables,
+    get_resampled_log,
+    import_uploads,
+    get_log_store,
+    init_app_state,
+    publish_imports,
+    publish_table,
+    restore_workspace_snapshot,
+    session_table_calls,
+    set_weather_df,
+    table_is_current,
+    table_signature,
+)
+from jobs import JobCancelled
+from log_store import session_view
+from synthetic import write_survey
+
+TIMES = {"day": (6, 30), "evening": (20, 0), "night": (22, 0)}
+EXCLUSION = {"enabled": True, "max_wind_speed": 4.0, "max_wind_gust": None, "max_rain": 0.0}
+
+
+def _new_session():
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    return init_app_state()
+
+
+@pytest.fixture
+def ss():
+    yield _new_session()
+    _new_session()
+
+
+def _load(ss, paths: list[str]) -> dict[str, str]:
+    hashes = {}
+    for path in paths:
+        with open(path, "rb") as source:
+            data = source.read()
+        name = os.path.splitext(os.path.basename(path))[0]
+        hashes[name] = hashlib.sha256(data).hexdigest()
+        ((_, log),) = ss["log_lease"].acquire(hashes[name], lambda: _parse_log_bytes(data, os.path.basename(path)))
+        ss["logs"][name] = session_view(log)
+        ss["log_sources"][name] = (hashes[name], None)
+    return hashes
+
+
+def test_workspace_round_trip(ss, tmp_path):
+    hashes = _load(ss, write_survey(str(tmp_path), logs=2, duration="2D", rate_s=300))
+    names = list(ss["logs"])
+    ss["times"] = TIMES
+    ss["lmax_n"] = 5
+    ss["modal_params"] = [("L90", "A"), "30min", "60min", "15min"]
+    ss["analysis_selected_logs"] = names[:1]
+    ss["weather_exclusion"] = EXCLUSION
+    weather = pd.DataFrame({
+        "dt": pd.date_range("2024-01-01", periods=24, freq="2h"),
+        "wind_speed": np.tile([1.0, 6.0], 12),
+        "rain": 0.0,
+    })
+    set_weather_df(weather, interval_hours=2)
+
+    calls = session_table_calls()
+    errors = {}
+    tables = compute_summary_tables(None, _build_survey(log_names=names, detached=True), TIMES, calls, errors=errors)
+    assert all(df is not None for df in tables.values()), errors
+    for key, (method, kwargs) in calls.items():
+        publish_table(key, tables[key], table_signature(method, names, **kwargs))
+    assert table_signature("modal", names)[3] is not None
+    frames = {name: _log_to_frame(log) for name, log in ss["logs"].items()}
+
+    snapshot = build_workspace_snapshot()
+    ss["log_lease"].release_all()
+    get_log_store().clear_unreferenced()
+
+    ss = _new_session()
+    assert restore_workspace_snapshot(io.BytesIO(snapshot)) == 2
+
+    assert list(ss["logs"]) == names
+    for name, log in ss["logs"].items():
+        pd.testing.assert_frame_equal(_log_to_frame(log), frames[name], check_freq=False)
+        assert ss["log_sources"][name] == (hashes[name], None)
+    assert ss["times"] == TIMES
+    assert ss["lmax_n"] == 5
+    assert ss["modal_params"] == [("L90", "A"), "30min", "60min", "15min"]
+    assert ss["analysis_selected_logs"] == names[:1]
+    assert ss["weather_exclusion"] == EXCLUSION
+    pd.testing.assert_frame_equal(ss["weather_df"], weather, check_freq=False)
+
+    # Restored tables are current for the restored settings, weather exclusion included.
+    for key, (method, kwargs) in session_table_calls().items():
+        assert table_is_current(key, table_signature(method, names, **kwargs)), key
+        pd.testing.assert_frame_equal(ss[key], tables[key], check_freq=False)
+
+    # Rebuilt logs are not filed under the uploads' hashes, so re-uploading a file parses it.
+    parses = []
+    for name, file_hash in hashes.items():
+        ss["log_lease"].acquire(file_hash, lambda: parses.append(name) or ())
+    assert parses == names
+
+
+def test_prepared_exports_keep_one_file_per_download():
+    prepared = PreparedExports()
+    prepared.store("csv", ("v1",), b"first")
+    (_, first), = prepared.values()
+    prepared.store("csv", ("v2",), b"second")
+    _, second = prepared["csv"]
+
+    assert not os.path.exists(first)
+    with open(second, "rb") as data:
+        assert data.read() == b"second"
+
+    del prepared
+    gc.collect()
+    assert not os.path.exists(second)
+
+
+def test_resample_cache_evicts_least_recently_used(ss, tmp_path):
+    _load(ss, write_survey(str(tmp_path), logs=1, duration="1D", rate_s=300))
+    (name,) = ss["logs"]
+    intervals = [f"{minutes}min" for minutes in range(5, 5 * (RESAMPLE_CACHE_ENTRIES + 2), 5)]
+
+    first = get_resampled_log(name, intervals[0])
+    get_resampled_log(name, intervals[1])
+    for t in intervals[2:]:
+        get_resampled_log(name, t)
+        get_resampled_log(name, intervals[0])
+
+    cache = ss["resample_cache"]
+    assert len(cache) == RESAMPLE_CACHE_ENTRIES
+    assert get_resampled_log(name, intervals[0]) is first
+    assert all(key[1] != intervals[1] for key in cache)
+
+
+def test_export_span_reports_whether_the_cache_held_the_file(ss, tmp_path):
+    tracer = tracing.configure(str(tmp_path / "trace.jsonl"))
+    try:
+        publish_table("leq_df", pd.DataFrame({"Leq": [50.0, 51.5]}), ("test", tmp_path.name))
+        for _ in range(2):
+            _prepare_export("all_tables_csv", combined_csv_export_key(), build_combined_csv_export)
+        _prepare_export("notes", ("v1",), lambda: b"notes")
+    finally:
+        tracer.close()
+        tracing.configure(None)
+
+    with open(tracer.path, encoding="utf-8") as trace:
+        spans = [json.loads(line) for line in trace]
+    assert [(span["span"], span["cache"]) for span in spans] == [
+        ("export.all_tables_csv", "miss"),
+        ("export.all_tables_csv", "hit"),
+        ("export.notes", "miss"),
+    ]
+    assert set(ss["prepared_exports"]) == {"all_tables_csv", "notes"}
+
+
+def test_pages_share_one_signature_per_table(ss):
+    ss["l90_averaging"] = "arithmetic"
+    ss["counts_include_all"] = True
+
+    calls = session_table_calls()
+
+    for key in ("modal_df", "counts"):
+        method, kwargs = calls[key]
+        assert kwargs["averaging"] == "arithmetic" and kwargs["include_all"] is True
+        assert table_signature(method, ["P1"], **kwargs) == table_signature(method, ["P1"], **session_table_calls()[key][1])
+
+
+def _staged(paths: list[str]) -> list[dict]:
+    items = []
+    for idx, path in enumerate(paths):
+        with open(path, "rb") as source:
+            data = source.read()
+        items.append({
+            "id": f"upload-{idx}",
+            "original_name": os.path.basename(path),
+            "hash": hashlib.sha256(data).hexdigest(),
+            "data": data,
+            "custom_name": "P1",
+            "size": len(data),
+        })
+    return items
+
+
+def test_uploads_import_in_a_job_and_publish_under_unique_names(ss, tmp_path):
+    broken = tmp_path / "broken.csv"
+    broken.write_text("not,a,log\n")
+    ss["pending_uploads"] = _staged(write_survey(str(tmp_path), logs=2, duration="1D", rate_s=300) + [str(broken)])
+
+    job = ss["jobs"].submit("import_logs", None, import_uploads, ss["log_lease"], list(ss["pending_uploads"]))
+    for _ in range(1000):
+        if job.finished:
+            break
+        time.sleep(0.01)
+    assert job.status == "done", job.traceback
+
+    assert publish_imports(job.result) == 2
+    assert list(ss["logs"]) == ["P1", "P1-1"]
+    assert [item["id"] for item in ss["pending_uploads"]] == ["upload-2"]
+    (error,) = ss["import_errors"]
+    assert error.startswith("Failed to create log from broken.csv")
+    assert ss["log_sources"]["P1"] == (job.result["results"][0]["key"], None)
+    assert set(job.result["tmp_paths"]) <= set(ss["tmp_paths"])
+
+
+def test_cancelled_import_releases_the_logs_it_acquired(ss, tmp_path):
+    class _Ctx:
+        calls = 0
+
+        def progress(self, fraction, text=None):
+            self.calls += 1
+            if self.calls > 1:
+                raise JobCancelled()
+
+        def check(self):
+            pass
+
+        def stage(self, name):
+            return contextlib.nullcontext()
+
+    lease = ss["log_lease"]
+    with pytest.raises(JobCancelled):
+        import_uploads(_Ctx(), lease, _staged(write_survey(str(tmp_path), logs=2, duration="1D", rate_s=300)))
+
+    assert lease.store.stats(lease.holder)["session_bytes"] == 0